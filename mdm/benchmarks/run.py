@@ -0,0 +1,309 @@
+"""
+Load test and micro-benchmark suite for the device API.
+
+Seeds a number of devices, then measures requests per second and p50/p99
+latency of the main device endpoints, plus WebSocket broadcast fan-out
+latency to many subscribers. Results are written as JSON so runs can be
+compared; with `--baseline` the run fails when a scenario regresses by more
+than `--max-regression`.
+
+By default the app is driven in-process (ASGI transport) against the
+database configured through DBSettings, e.g. the Postgres service of
+docker-compose. Use `--base-url` to load a running server instead. The
+fan-out benchmark always runs in-process against stand-in sockets.
+
+    python -m benchmarks.run --devices 10000 --requests 2000 --output results.json
+    python -m benchmarks.run --baseline results.json --max-regression 0.2
+"""
+import argparse
+import asyncio
+import contextlib
+import itertools
+import json
+import platform
+import random
+import sys
+import time
+from typing import Awaitable, Callable
+
+import httpx
+
+API_PREFIX = "/api/v1/devices"
+SEED_BATCH_SIZE = 10000
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float) -> dict[str, float]:
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+async def run_scenario(
+        request: Callable[[int], Awaitable[httpx.Response]],
+        requests: int,
+        concurrency: int
+) -> dict[str, float]:
+    """
+    Issues `requests` calls of `request(i)` from `concurrency` concurrent
+    workers and summarizes the latency of the successful ones.
+    """
+    counter = itertools.count()
+    latencies: list[float] = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        while (index := next(counter)) < requests:
+            started = time.perf_counter()
+            try:
+                response = await request(index)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+def device_payload(index: int) -> dict[str, str]:
+    return {
+        "device_name": f"bench-{index}",
+        "device_type": ("android", "windows")[index % 2],
+        "status": ("active", "inactive", "offline")[index % 3],
+    }
+
+
+async def seed_devices(client: httpx.AsyncClient, count: int) -> list[int]:
+    device_ids: list[int] = []
+    for start in range(0, count, SEED_BATCH_SIZE):
+        batch = [device_payload(index) for index in range(start, min(count, start + SEED_BATCH_SIZE))]
+        response = await client.post(f"{API_PREFIX}/batch", json=batch)
+        response.raise_for_status()
+        device_ids.extend(result["id"] for result in response.json()["results"] if result["id"] is not None)
+    return device_ids
+
+
+async def run_http_benchmarks(client: httpx.AsyncClient, args: argparse.Namespace) -> dict[str, dict]:
+    started = time.perf_counter()
+    device_ids = await seed_devices(client, args.devices)
+    print(f"Seeded {len(device_ids)} devices in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    rng = random.Random(args.seed)
+    # Deletes consume their own ids so they never hit a missing device.
+    delete_ids = device_ids[-min(args.requests, len(device_ids) // 2):]
+    live_ids = device_ids[:len(device_ids) - len(delete_ids)]
+
+    scenarios = {
+        "create": lambda i: client.post(f"{API_PREFIX}/", json=device_payload(i)),
+        "list": lambda i: client.get(f"{API_PREFIX}/", params={"limit": 100}),
+        "list_filtered": lambda i: client.get(
+            f"{API_PREFIX}/", params={"limit": 100, "device_type": "android", "status": "active"}
+        ),
+        "get": lambda i: client.get(f"{API_PREFIX}/{rng.choice(live_ids)}"),
+        "update": lambda i: client.put(
+            f"{API_PREFIX}/{rng.choice(live_ids)}", json={"status": ("active", "inactive")[i % 2]}
+        ),
+        "command": lambda i: client.post(f"{API_PREFIX}/{rng.choice(live_ids)}/command", json={"command": "reboot"}),
+        "delete": lambda i: client.delete(f"{API_PREFIX}/{delete_ids[i % len(delete_ids)]}"),
+    }
+
+    results = {}
+    for name, request in scenarios.items():
+        if args.only and name not in args.only:
+            continue
+        requests = min(args.requests, len(delete_ids)) if name == "delete" else args.requests
+        results[name] = await run_scenario(request, requests, args.concurrency)
+        print(f"{name:>14}: {results[name]}", file=sys.stderr)
+    return results
+
+
+class FanoutProbe:
+    """
+    Counts deliveries of the current broadcast and signals once every
+    subscriber has received it.
+    """
+
+    def __init__(self):
+        self.remaining = 0
+        self.delivered = asyncio.Event()
+
+    def expect(self, deliveries: int) -> None:
+        self.remaining = deliveries
+        self.delivered.clear()
+
+    def record(self) -> None:
+        self.remaining -= 1
+        if self.remaining == 0:
+            self.delivered.set()
+
+
+class StandInWebSocket:
+    """
+    Minimal socket stand-in that reports each message to a FanoutProbe.
+    """
+
+    def __init__(self, probe: FanoutProbe):
+        self._probe = probe
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message: str):
+        self._probe.record()
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+async def run_fanout_benchmark(subscribers: int, changes: int) -> dict[str, float]:
+    """
+    Measures how long it takes for one change to reach every subscriber, and
+    how long the publishing side is blocked by a broadcast.
+    """
+    from mdm.device.services.subscriptions import DeviceChange
+    from mdm.device.services.websockets_service import (
+        OverflowPolicy,
+        WebSocketBroadcaster,
+    )
+
+    broadcaster = WebSocketBroadcaster(max_queue_size=16, overflow_policy=OverflowPolicy.drop_oldest, send_timeout=5)
+    probe = FanoutProbe()
+    sockets = [StandInWebSocket(probe) for _ in range(subscribers)]
+    for websocket in sockets:
+        await broadcaster.connect(websocket)
+
+    fanout_latencies: list[float] = []
+    publish_latencies: list[float] = []
+    for device_id in range(changes):
+        probe.expect(subscribers)
+        started = time.perf_counter()
+        broadcaster.publish([DeviceChange(device_id, "updated", "android", "active")])
+        publish_latencies.append(time.perf_counter() - started)
+        await probe.delivered.wait()
+        fanout_latencies.append(time.perf_counter() - started)
+
+    for websocket in sockets:
+        await broadcaster.disconnect(websocket)
+
+    return {
+        **summarize(fanout_latencies, 0, sum(fanout_latencies)),
+        "subscribers": subscribers,
+        "publish_p99_ms": round(percentile(publish_latencies, 0.99) * 1000, 3),
+    }
+
+
+def compare(results: dict[str, dict], baseline: dict[str, dict], max_regression: float) -> list[str]:
+    """
+    Returns a description of every scenario whose throughput dropped or whose
+    p99 latency grew by more than `max_regression` relative to the baseline.
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if previous["rps"] and current["rps"] < previous["rps"] * (1 - max_regression):
+            regressions.append(f"{name}: rps {current['rps']} < baseline {previous['rps']}")
+        if previous["p99_ms"] and current["p99_ms"] > previous["p99_ms"] * (1 + max_regression):
+            regressions.append(f"{name}: p99 {current['p99_ms']}ms > baseline {previous['p99_ms']}ms")
+    return regressions
+
+
+@contextlib.asynccontextmanager
+async def open_client(base_url: str | None):
+    if base_url:
+        async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+            yield client
+        return
+
+    from mdm.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            yield client
+
+
+async def run(args: argparse.Namespace) -> dict:
+    results: dict[str, dict] = {}
+    if not args.skip_http:
+        async with open_client(args.base_url) as client:
+            results.update(await run_http_benchmarks(client, args))
+    if args.subscribers:
+        results["websocket_fanout"] = await run_fanout_benchmark(args.subscribers, args.fanout_changes)
+        print(f"{'websocket_fanout':>14}: {results['websocket_fanout']}", file=sys.stderr)
+
+    return {
+        "meta": {
+            "devices": args.devices,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "subscribers": args.subscribers,
+            "target": args.base_url or "in-process",
+            "python": platform.python_version(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "results": results,
+    }
+
+
+def positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--devices", type=positive_int, default=10000, help="devices to seed before measuring")
+    parser.add_argument("--requests", type=positive_int, default=1000, help="requests per scenario")
+    parser.add_argument("--concurrency", type=positive_int, default=32, help="concurrent client workers")
+    parser.add_argument("--subscribers", type=int, default=1000, help="WebSocket subscribers for fan-out, 0 to skip")
+    parser.add_argument("--fanout-changes", type=int, default=50, help="changes broadcast in the fan-out benchmark")
+    parser.add_argument("--only", nargs="*", help="run only these HTTP scenarios")
+    parser.add_argument("--skip-http", action="store_true", help="run only the fan-out benchmark")
+    parser.add_argument("--base-url", help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for picking device ids")
+    parser.add_argument("--output", default="benchmark-results.json", help="where to write the JSON results")
+    parser.add_argument("--baseline", help="previous results file to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="tolerated relative regression")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+    with open(args.output, "w") as output:
+        json.dump(report, output, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+        regressions = compare(report["results"], baseline, args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
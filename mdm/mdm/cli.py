@@ -0,0 +1,95 @@
+import argparse
+import asyncio
+import sys
+
+from fastapi import HTTPException
+
+from mdm.database.database import sessionmanager
+from mdm.device.models.device_request import (
+    ExportFormat,
+    ImportDevicesResponseModel,
+    ImportFormat,
+)
+from mdm.device.services.export_service import ensure_export_format, export_devices
+from mdm.device.services.import_service import import_devices
+
+_READ_SIZE = 1024 * 1024
+
+
+async def export(export_format: ExportFormat, output: str) -> None:
+    """
+    Writes a device snapshot to `output`, or to stdout for "-".
+    """
+    stream = sys.stdout.buffer if output == "-" else open(output, "wb")
+    try:
+        async for chunk in export_devices(export_format):
+            stream.write(chunk)
+    finally:
+        if stream is not sys.stdout.buffer:
+            stream.close()
+        await sessionmanager.close()
+
+
+async def _read_chunks(path: str):
+    stream = sys.stdin.buffer if path == "-" else open(path, "rb")
+    try:
+        while chunk := stream.read(_READ_SIZE):
+            yield chunk
+    finally:
+        if stream is not sys.stdin.buffer:
+            stream.close()
+
+
+def _report_progress(summary: ImportDevicesResponseModel) -> None:
+    print(
+        f"{summary.received} rows read, {summary.created} created, "
+        f"{summary.updated} updated, {summary.rejected} rejected",
+        file=sys.stderr,
+    )
+
+
+async def import_file(import_format: ImportFormat, path: str) -> None:
+    """
+    Imports devices from `path`, or from stdin for "-", printing progress to
+    stderr and the final summary with the rejected rows as JSON to stdout.
+    """
+    try:
+        summary = await import_devices(_read_chunks(path), import_format, on_progress=_report_progress)
+    finally:
+        await sessionmanager.close()
+    print(summary.model_dump_json(indent=2))
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="mdm", description="Fleet maintenance commands.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="Export a snapshot of every device.")
+    export_parser.add_argument(
+        "--format", type=ExportFormat, choices=list(ExportFormat), default=ExportFormat.csv
+    )
+    export_parser.add_argument("--output", "-o", default="-", help="Output file, or - for stdout.")
+
+    import_parser = commands.add_parser("import", help="Create or update devices from a file.")
+    import_parser.add_argument("path", help="CSV or NDJSON file, or - for stdin.")
+    import_parser.add_argument(
+        "--format", type=ImportFormat, choices=list(ImportFormat),
+        help="Defaults to ndjson for .ndjson/.jsonl files and to csv otherwise.",
+    )
+
+    args = parser.parse_args(argv)
+    if args.command == "export":
+        try:
+            ensure_export_format(args.format)
+        except HTTPException as e:
+            parser.error(e.detail)
+        asyncio.run(export(args.format, args.output))
+    elif args.command == "import":
+        import_format = args.format
+        if import_format is None:
+            import_format = ImportFormat.ndjson if args.path.endswith((".ndjson", ".jsonl")) else ImportFormat.csv
+        asyncio.run(import_file(import_format, args.path))
+
+
+if __name__ == "__main__":
+    main()
@@ -1 +1,2 @@
+from .database import DBReadSessionDep as DBReadSessionDep
 from .database import DBSessionDep as DBSessionDep
@@ -10,23 +10,41 @@ from sqlalchemy.ext.asyncio import (
 )
 from sqlalchemy.orm import declarative_base
 
+from mdm.rate_limit import create_admission_controller
 from mdm.settings import db_settings
 
 Base = declarative_base()
 
 
 class DatabaseSessionManager:
-    def __init__(self, host: str, engine_kwargs: dict[str, Any] = None):
+    """
+    Owns the primary engine and, when a replica is configured, a second engine
+    for reads. Sessions acquire a pooled connection only when their first
+    statement runs and give it back on commit, rollback or close, so a request
+    that never queries never holds a connection.
+    """
+
+    def __init__(self, host: str, engine_kwargs: dict[str, Any] = None, read_host: str | None = None):
+        engine_kwargs = engine_kwargs or {}
         self._engine = create_async_engine(host, **engine_kwargs)
         self._sessionmaker = async_sessionmaker(autocommit=False, bind=self._engine)
+        self._read_engine = create_async_engine(read_host, **engine_kwargs) if read_host else None
+        self._read_sessionmaker = (
+            async_sessionmaker(autocommit=False, bind=self._read_engine)
+            if self._read_engine is not None else self._sessionmaker
+        )
 
     async def close(self):
         if self._engine is None:
             raise Exception("DatabaseSessionManager is not initialized")
         await self._engine.dispose()
+        if self._read_engine is not None:
+            await self._read_engine.dispose()
 
         self._engine = None
         self._sessionmaker = None
+        self._read_engine = None
+        self._read_sessionmaker = None
 
     @contextlib.asynccontextmanager
     async def connect(self) -> AsyncIterator[AsyncConnection]:
@@ -54,23 +72,44 @@ class DatabaseSessionManager:
         finally:
             await session.close()
 
+    @contextlib.asynccontextmanager
+    async def read_session(self) -> AsyncIterator[AsyncSession]:
+        """
+        Session bound to the read replica, or to the primary when no replica is
+        configured. Reads may lag behind writes by the replication delay.
+        """
+        if self._read_sessionmaker is None:
+            raise Exception("DatabaseSessionManager is not initialized")
+
+        session = self._read_sessionmaker()
+        try:
+            yield session
+        finally:
+            await session.close()
+
 
 sessionmanager = DatabaseSessionManager(
     db_settings.connection_string(),
-    {
-        "echo": db_settings.echo_sql,
-        "pool_size": 10,
-        "max_overflow": 20,
-        "pool_timeout": 30,
-        "pool_recycle": 1800,
-    },
+    db_settings.engine_kwargs(),
+    read_host=db_settings.replica_connection_string(),
 )
 
 
+# Without a replica, reads share the primary pool and therefore its slots.
+db_admission = create_admission_controller("primary")
+read_admission = create_admission_controller("replica") if sessionmanager._read_engine is not None else db_admission
+
+
 async def get_db_session():
-    async with sessionmanager.session() as session:
+    async with db_admission.slot(), sessionmanager.session() as session:
+        yield session
+
+
+async def get_db_read_session():
+    async with read_admission.slot(), sessionmanager.read_session() as session:
         yield session
 
 
 T = TypeVar("T", bound=Base)
-DBSessionDep = Annotated[AsyncSession, Depends(get_db_session)]
\ No newline at end of file
+DBSessionDep = Annotated[AsyncSession, Depends(get_db_session)]
+DBReadSessionDep = Annotated[AsyncSession, Depends(get_db_read_session)]
\ No newline at end of file
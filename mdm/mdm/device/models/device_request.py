@@ -1,8 +1,28 @@
-from typing import Optional
+import datetime
+from enum import StrEnum
+from typing import Literal, Optional
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 
 from mdm.device.schemas.device import DeviceType, Status
+from mdm.device.schemas.device_command import CommandStatus
+
+
+class SearchMode(StrEnum):
+    prefix = "prefix"
+    substring = "substring"
+    fuzzy = "fuzzy"
+
+
+class ExportFormat(StrEnum):
+    csv = "csv"
+    arrow = "arrow"
+    parquet = "parquet"
+
+
+class ImportFormat(StrEnum):
+    csv = "csv"
+    ndjson = "ndjson"
 
 
 class DeviceRequestModel(BaseModel):
@@ -10,6 +30,9 @@ class DeviceRequestModel(BaseModel):
     device_type: DeviceType
     status: Status
 
+class DeviceImportRowModel(DeviceRequestModel):
+    external_id: str = Field(min_length=1)
+
 class PutDeviceRequestModel(BaseModel):
     device_name: Optional[str] = None
     device_type: Optional[DeviceType] = None
@@ -21,10 +44,13 @@ class DeviceGetModel(BaseModel):
     device_name: str
     device_type: DeviceType
     status: Status
+    # Carried for ETags but never part of the response body.
+    version: int = Field(default=1, exclude=True)
 
 
 class GetDevicesResponseModel(BaseModel):
     devices: list[DeviceGetModel]
+    next_cursor: Optional[str] = None
 
 class GetDeviceResponseModel(BaseModel):
     device: DeviceGetModel
@@ -32,5 +58,151 @@ class GetDeviceResponseModel(BaseModel):
 class PutDeviceResponseModel(BaseModel):
     device: DeviceGetModel
 
+class BulkCreateDeviceResultModel(BaseModel):
+    index: int
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+class BulkCreateDevicesResponseModel(BaseModel):
+    created: int
+    failed: int
+    results: list[BulkCreateDeviceResultModel]
+
+class DeviceStatsEntryModel(BaseModel):
+    device_type: DeviceType
+    status: Status
+    count: int
+
+class DeviceStatsResponseModel(BaseModel):
+    total: int
+    counts: list[DeviceStatsEntryModel]
+
+class HeartbeatStatsResponseModel(BaseModel):
+    buffer_depth: int
+    received_total: int
+    coalesced_total: int
+    flushed_total: int
+    flush_failures_total: int
+    last_flush_size: int
+    last_flush_duration_seconds: float
+
+class DeviceCacheStatsResponseModel(BaseModel):
+    size: int
+    max_size: int
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int
+
+class WebSocketSubscribeModel(BaseModel):
+    action: Literal["subscribe"]
+    device_ids: Optional[list[int]] = None
+    device_types: Optional[list[DeviceType]] = None
+    statuses: Optional[list[Status]] = None
+    change_types: Optional[list[str]] = None
+    batch_ms: int = Field(default=0, ge=0, le=60000)
+    # Replay logged changes after this sequence number before live delivery.
+    since: Optional[int] = Field(default=None, ge=0)
+
+class WebSocketStatsResponseModel(BaseModel):
+    clients: int
+    subscription_groups: int
+    queue_depth_total: int
+    queue_depth_max: int
+    messages_sent_total: int
+    messages_dropped_total: int
+    clients_evicted_total: int
+    clients_rejected_total: int
+    send_latency_seconds_total: float
+    send_latency_seconds_max: float
+
 class CommandRequestModel(BaseModel):
-    command: str
\ No newline at end of file
+    command: str
+
+class CommandQueuedResponseModel(BaseModel):
+    command_id: int
+    status: CommandStatus
+
+class CommandStatusResponseModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    id: int
+    device_id: int
+    command: str
+    status: CommandStatus
+    attempts: int
+    error: Optional[str] = None
+    created_at: datetime.datetime
+    started_at: Optional[datetime.datetime] = None
+    finished_at: Optional[datetime.datetime] = None
+
+class BulkCommandRequestModel(BaseModel):
+    command: str
+    device_ids: Optional[list[int]] = None
+    device_type: Optional[DeviceType] = None
+    status: Optional[Status] = None
+    group: Optional[str] = None
+
+class BulkCommandResponseModel(BaseModel):
+    queued: int
+    command_ids: list[int]
+
+class BulkDeleteDevicesRequestModel(BaseModel):
+    device_ids: Optional[list[int]] = None
+    device_type: Optional[DeviceType] = None
+    status: Optional[Status] = None
+    group: Optional[str] = None
+
+class BulkUpdateDevicesRequestModel(BulkDeleteDevicesRequestModel):
+    update: PutDeviceRequestModel
+
+class BulkDevicesResponseModel(BaseModel):
+    affected: int
+    device_ids: list[int]
+
+class DeviceChangeModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    seq: int
+    device_id: int
+    change_type: str
+    device_type: Optional[DeviceType] = None
+    status: Optional[Status] = None
+    changed_at: datetime.datetime
+
+class GetChangesResponseModel(BaseModel):
+    changes: list[DeviceChangeModel]
+    next_since: int
+
+class GroupRequestModel(BaseModel):
+    # Group names appear in URLs, so they are limited to URL-safe characters.
+    name: str = Field(min_length=1, max_length=64, pattern=r"^[A-Za-z0-9._-]+$")
+
+class GroupModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    id: int
+    name: str
+    created_at: datetime.datetime
+
+class GetGroupsResponseModel(BaseModel):
+    groups: list[GroupModel]
+
+class GroupMembersRequestModel(BaseModel):
+    device_ids: list[int]
+
+class GroupMembersResponseModel(BaseModel):
+    changed: int
+    device_ids: list[int]
+
+class ImportRejectModel(BaseModel):
+    row: int
+    error: str
+
+class ImportDevicesResponseModel(BaseModel):
+    received: int = 0
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    # Rows replaced by a later row with the same external_id in the same batch.
+    duplicates: int = 0
+    rejected: int = 0
+    # At most `devices_import_max_rejects` entries; `rejected` counts them all.
+    rejects: list[ImportRejectModel] = []
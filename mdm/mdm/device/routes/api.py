@@ -1,29 +1,92 @@
-import asyncio
+import datetime
+from typing import Any
 
-from mdm.device.services.websockets_service import connect_websocket, handle_websocket_messages, notify_device_change
-from mdm.logging_config import logger
+from mdm.device.services.websockets_service import (
+    broadcaster,
+    connect_websocket,
+    handle_websocket_messages,
+    notify_device_change,
+)
 
-from fastapi import APIRouter, Response, status, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status, WebSocket, WebSocketDisconnect
+# get_devices takes a `status` query parameter that shadows the module.
+from fastapi import status as http_status
+from fastapi.responses import StreamingResponse
 
-from mdm.database import DBSessionDep
+from mdm.database import DBReadSessionDep, DBSessionDep
+from mdm.database.database import read_admission, sessionmanager
 from mdm.device.models.device_request import (
+    BulkCommandRequestModel,
+    BulkCommandResponseModel,
+    BulkCreateDevicesResponseModel,
+    BulkDeleteDevicesRequestModel,
+    BulkDevicesResponseModel,
+    BulkUpdateDevicesRequestModel,
+    CommandQueuedResponseModel,
+    CommandStatusResponseModel,
+    DeviceChangeModel,
     DeviceGetModel,
     DeviceRequestModel,
     GetDeviceResponseModel,
+    DeviceCacheStatsResponseModel,
+    DeviceStatsResponseModel,
+    ExportFormat,
+    GetChangesResponseModel,
     GetDevicesResponseModel,
+    GetGroupsResponseModel,
+    GroupMembersRequestModel,
+    GroupMembersResponseModel,
+    GroupModel,
+    GroupRequestModel,
+    HeartbeatStatsResponseModel,
+    ImportDevicesResponseModel,
+    ImportFormat,
+    WebSocketStatsResponseModel,
     PutDeviceResponseModel, CommandRequestModel, PutDeviceRequestModel,
+    SearchMode,
 )
 from mdm.device.services.device_service import (
     add_device,
+    add_devices_bulk,
     delete_device_by_id,
-    find_device_by_id,
+    delete_devices_bulk,
     get_all_devices,
+    get_device_cached,
+    get_device_stats,
+    search_devices,
+    stream_all_devices,
     update_device,
+    update_devices_bulk,
 )
+from mdm.device.schemas.device_command import CommandStatus
+from mdm.device.services.cache_service import device_cache
+from mdm.device.services.change_feed import get_changes, get_log_version
+from mdm.device.services.export_service import EXPORT_MEDIA_TYPES, ensure_export_format, export_devices
+from mdm.device.services.etags import device_etag, etag_matches, if_match_version, list_etag
+from mdm.device.services.group_service import (
+    add_group_members,
+    create_group,
+    delete_group,
+    get_group_version,
+    get_groups,
+    remove_group_members,
+)
+from mdm.device.services.command_service import (
+    COMMAND_HANDLERS,
+    enqueue_bulk_command,
+    enqueue_command,
+    get_command,
+)
+from mdm.device.services.heartbeat_service import heartbeat_buffer
+from mdm.device.services.import_service import import_devices
+from mdm.device.services.pagination import decode_id_cursor, decode_search_cursor, encode_cursor
+from mdm.rate_limit import rate_limiter
+from mdm.responses import FastJSONResponse, dumps
+from mdm.settings import device_settings
 
-connected_clients: list[WebSocket] = []
-
-router = APIRouter(prefix="/api/v1/devices", tags=["Devices"])
+# Every route is rate limited per client; DB-bound routes are also subject to
+# admission control through their session dependency.
+router = APIRouter(prefix="/api/v1/devices", tags=["Devices"], dependencies=[Depends(rate_limiter)])
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
 async def create_device_entry(
@@ -34,36 +97,355 @@ async def create_device_entry(
     await add_device(db_session, device_request)
 
 
-@router.get("/")
-async def get_devices(
+# Items are validated one by one in add_devices_bulk so that a bad item is
+# reported by index instead of failing the batch; the request body schema is
+# declared here so the API docs still show the item model and the size cap.
+@router.post(
+    "/batch",
+    status_code=status.HTTP_201_CREATED,
+    openapi_extra={"requestBody": {"content": {"application/json": {"schema": {
+        "items": {"$ref": "#/components/schemas/DeviceRequestModel"},
+        "maxItems": device_settings.devices_max_batch_size,
+    }}}}},
+)
+async def create_device_entries(
         db_session: DBSessionDep,
+        device_requests: list[Any]
+) -> BulkCreateDevicesResponseModel:
+    """
+    Handles a request to add many device entries at once. Each item has the same
+    shape as the body of `create_device_entry`; items that fail validation or are
+    rejected by the database are reported per index without aborting the batch.
+    """
+    if len(device_requests) > device_settings.devices_max_batch_size:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"A batch may contain at most {device_settings.devices_max_batch_size} devices."
+        )
+    return await add_devices_bulk(db_session, device_requests)
+
+
+async def _stream_devices_ndjson(filters: dict[str, Any], after_id: int | None):
+    # The request-scoped session is already closed once the response body is
+    # being sent, so the stream owns a session, and an admission slot, for its
+    # whole lifetime.
+    async with read_admission.slot(), sessionmanager.read_session() as session:
+        async for device in stream_all_devices(session, filters, after_id):
+            yield dumps(device._asdict()) + b"\n"
+
+
+async def _search_devices_page(
+        db_session: DBReadSessionDep,
+        search: str,
+        match: SearchMode,
+        query_filters: dict[str, Any],
+        limit: int,
+        after: tuple[str | float, int] | None
+) -> FastJSONResponse:
+    found_devices = await search_devices(db_session, search, match, query_filters, limit + 1, after)
+    next_cursor = None
+    if len(found_devices) > limit:
+        found_devices = found_devices[:limit]
+        last = found_devices[-1]
+        next_cursor = encode_cursor({"mode": match, "rank": last.rank, "id": last.id})
+
+    return FastJSONResponse({
+        "devices": [
+            {"id": device.id, "device_name": device.device_name,
+             "device_type": device.device_type, "status": device.status}
+            for device in found_devices
+        ],
+        "next_cursor": next_cursor,
+    })
+
+
+@router.get("/", response_model=GetDevicesResponseModel)
+async def get_devices(
+        db_session: DBReadSessionDep,
         device_type: str | None = None,
-        status: str | None = None
-) -> GetDevicesResponseModel:
+        status: str | None = None,
+        limit: int = Query(
+            device_settings.devices_page_size,
+            ge=1,
+            le=device_settings.devices_max_page_size
+        ),
+        cursor: str | None = None,
+        stream: bool = False,
+        search: str | None = Query(None, min_length=1),
+        match: SearchMode = SearchMode.substring,
+        updated_since: datetime.datetime | None = None,
+        seen_before: datetime.datetime | None = None,
+        group: str | None = None,
+        if_none_match: str | None = Header(None)
+):
     """
     Retrieves a list of devices based on optional device type and status filters.
+
+    Results are ordered by id and paginated by key: pass the returned
+    `next_cursor` as `cursor` to fetch the following page. With `stream=true`
+    every matching device is sent as newline-delimited JSON instead, read from
+    a server-side cursor so memory use does not depend on the fleet size.
+
+    With `search`, only devices whose name matches case-insensitively are
+    returned, as a `prefix`, `substring` or `fuzzy` (trigram similarity)
+    `match`. Prefix results are ordered by name, the others by relevance.
+
+    `updated_since` keeps devices whose name, type or status changed at or
+    after the given time, `seen_before` devices last seen before it, so sync
+    jobs can fetch only what changed since their previous run.
+
+    `group` keeps only the members of the named group, and combines with the
+    other filters, e.g. every offline android device in a rollout ring.
+
+    Listings are read from the replica when one is configured.
+
+    Paginated responses carry a weak ETag that changes whenever any device is
+    created, updated or deleted; a matching `If-None-Match` is answered with
+    304 without reading or serializing the page. Listings filtered by
+    `seen_before` have no ETag, as check-ins change them without a new tag.
     """
-    query_filters = {}
+    query_filters: dict[str, Any] = {}
     if device_type:
         query_filters["device_type"] = device_type
     if status:
         query_filters["status"] = status
+    if updated_since:
+        query_filters["updated_since"] = updated_since
+    if seen_before:
+        query_filters["seen_before"] = seen_before
+    if group:
+        query_filters["group"] = group
+
+    if stream:
+        if search is not None:
+            raise HTTPException(
+                status_code=http_status.HTTP_400_BAD_REQUEST,
+                detail="search cannot be combined with stream."
+            )
+        return StreamingResponse(
+            _stream_devices_ndjson(query_filters, decode_id_cursor(cursor)),
+            media_type="application/x-ndjson"
+        )
+
+    # Cursors are validated before any query runs.
+    if search is not None:
+        search_after = decode_search_cursor(cursor, match)
+    else:
+        after_id = decode_id_cursor(cursor)
+
+    # Heartbeats move devices out of a seen_before listing without going
+    # through the change log, so such listings carry no ETag.
+    etag = None
+    if not seen_before:
+        # Read the log head before the page, so the tag is never newer than the body.
+        etag_params = {"filters": query_filters, "limit": limit, "cursor": cursor, "search": search, "match": match}
+        if group:
+            # Membership changes do not go through the change log.
+            etag_params["group_version"] = await get_group_version(db_session, group)
+        head_seq, etag_params["unsettled_changes"] = await get_log_version(db_session)
+        etag = list_etag(head_seq, etag_params)
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=http_status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
 
-    found_devices = await get_all_devices(db_session, query_filters)
-    device_list = [DeviceGetModel(**device.__dict__) for device in found_devices]
-    return GetDevicesResponseModel(devices=device_list)
+    if search is not None:
+        response = await _search_devices_page(db_session, search, match, query_filters, limit, search_after)
+        if etag:
+            response.headers["ETag"] = etag
+        return response
 
-@router.get("/{device_id}")
+    found_devices = await get_all_devices(db_session, query_filters, limit + 1, after_id)
+    next_cursor = None
+    if len(found_devices) > limit:
+        found_devices = found_devices[:limit]
+        next_cursor = encode_cursor({"id": found_devices[-1].id})
+
+    # Rows are serialized as-is: the columns already match DeviceGetModel, so
+    # building and re-validating a model per device would only cost CPU.
+    return FastJSONResponse({
+        "devices": [device._asdict() for device in found_devices],
+        "next_cursor": next_cursor,
+    }, headers={"ETag": etag} if etag else None)
+
+@router.get("/stats")
+async def get_devices_stats(db_session: DBReadSessionDep) -> DeviceStatsResponseModel:
+    """
+    Returns the number of devices per device_type and status. Served from
+    incrementally maintained counters, so the cost is independent of fleet size.
+    """
+    return await get_device_stats(db_session)
+
+@router.get("/export")
+async def export_device_snapshot(format: ExportFormat = ExportFormat.csv):
+    """
+    Streams a snapshot of every device as CSV, an Arrow IPC stream or Parquet.
+    Rows are read from the replica with COPY ... TO STDOUT and never become ORM
+    objects or models; columnar formats are encoded in record batches, so
+    memory use stays bounded for any fleet size. The same export is available
+    from the command line with `python -m mdm.cli export`.
+    """
+    ensure_export_format(format)
+    return StreamingResponse(
+        export_devices(format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="devices.{format}"'},
+    )
+
+@router.post("/import")
+async def import_device_file(request: Request, format: ImportFormat = ImportFormat.csv) -> ImportDevicesResponseModel:
+    """
+    Creates or updates devices from a CSV (with a header line) or NDJSON
+    request body, matched on `external_id`. The body is read as a stream and
+    merged in batches through a COPY-loaded staging table, so files of any size
+    can be imported. Invalid rows are reported by row number without aborting
+    the import. The same import is available from the command line with
+    `python -m mdm.cli import`.
+    """
+    return await import_devices(request.stream(), format)
+
+@router.get("/changes")
+async def get_device_changes(
+        db_session: DBReadSessionDep,
+        since: int = Query(0, ge=0),
+        limit: int = Query(
+            device_settings.devices_page_size,
+            ge=1,
+            le=device_settings.devices_max_page_size
+        )
+) -> GetChangesResponseModel:
+    """
+    Returns the device changes logged after the change with sequence number
+    `since`, in commit order; concurrent writers may commit out of `seq`
+    order, so `seq` is a resume point rather than a counter. Pass the
+    returned `next_since` as `since` to continue. Answers 410 when part of
+    the requested range has already been pruned.
+
+    A change is listed once every write transaction that started before it
+    has ended, so a long-running transaction delays it.
+    """
+    changes = await get_changes(db_session, since, limit)
+    return GetChangesResponseModel(
+        changes=[DeviceChangeModel.model_validate(change) for change in changes],
+        next_since=changes[-1].seq if changes else since,
+    )
+
+def _bulk_selectors(
+        bulk_request: BulkDeleteDevicesRequestModel | BulkCommandRequestModel
+) -> dict[str, Any]:
+    query_filters: dict[str, Any] = {}
+    if bulk_request.device_type:
+        query_filters["device_type"] = bulk_request.device_type
+    if bulk_request.status:
+        query_filters["status"] = bulk_request.status
+    if bulk_request.group:
+        query_filters["group"] = bulk_request.group
+    if not query_filters and bulk_request.device_ids is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Select target devices with device_ids, device_type, status or group."
+        )
+    return query_filters
+
+@router.post("/bulk/update")
+async def update_devices(
+        db_session: DBSessionDep,
+        bulk_request: BulkUpdateDevicesRequestModel
+) -> BulkDevicesResponseModel:
+    """
+    Applies the same change to every device matching the given id list and/or
+    `device_type`/`status`/`group` filters, in chunked set-based statements. Returns the
+    number and ids of the updated devices.
+    """
+    query_filters = _bulk_selectors(bulk_request)
+    if not bulk_request.update.model_dump(exclude_unset=True, exclude_none=True):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No fields to update.")
+    return await update_devices_bulk(
+        db_session, query_filters, bulk_request.device_ids, bulk_request.update
+    )
+
+@router.post("/bulk/delete")
+async def delete_devices(
+        db_session: DBSessionDep,
+        bulk_request: BulkDeleteDevicesRequestModel
+) -> BulkDevicesResponseModel:
+    """
+    Deletes every device matching the given id list and/or `device_type`/`status`/`group`
+    filters, in chunked set-based statements. Returns the number and ids of the
+    deleted devices.
+    """
+    query_filters = _bulk_selectors(bulk_request)
+    return await delete_devices_bulk(db_session, query_filters, bulk_request.device_ids)
+
+@router.get("/groups")
+async def list_groups(db_session: DBReadSessionDep) -> GetGroupsResponseModel:
+    """
+    Returns every device group, ordered by name.
+    """
+    groups = await get_groups(db_session)
+    return GetGroupsResponseModel(groups=[GroupModel.model_validate(group) for group in groups])
+
+@router.post("/groups", status_code=status.HTTP_201_CREATED)
+async def create_device_group(db_session: DBSessionDep, group_request: GroupRequestModel) -> GroupModel:
+    """
+    Creates an empty device group, e.g. a site, department or rollout ring.
+    Answers 409 when the name is taken.
+    """
+    return GroupModel.model_validate(await create_group(db_session, group_request.name))
+
+@router.delete("/groups/{group_name}")
+async def delete_device_group(db_session: DBSessionDep, group_name: str):
+    """
+    Deletes a group and its memberships; the member devices are kept.
+    """
+    if await delete_group(db_session, group_name):
+        return Response(status_code=status.HTTP_200_OK)
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Group not found.")
+
+@router.post("/groups/{group_name}/add")
+async def add_devices_to_group(
+        db_session: DBSessionDep,
+        group_name: str,
+        members_request: GroupMembersRequestModel
+) -> GroupMembersResponseModel:
+    """
+    Adds the given devices to a group in one statement. Unknown devices and
+    existing members are skipped; the response lists the devices actually added.
+    """
+    added = await add_group_members(db_session, group_name, members_request.device_ids)
+    if added is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Group not found.")
+    return GroupMembersResponseModel(changed=len(added), device_ids=added)
+
+@router.post("/groups/{group_name}/remove")
+async def remove_devices_from_group(
+        db_session: DBSessionDep,
+        group_name: str,
+        members_request: GroupMembersRequestModel
+) -> GroupMembersResponseModel:
+    """
+    Removes the given devices from a group in one statement; the response lists
+    the devices actually removed.
+    """
+    removed = await remove_group_members(db_session, group_name, members_request.device_ids)
+    if removed is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Group not found.")
+    return GroupMembersResponseModel(changed=len(removed), device_ids=removed)
+
+@router.get("/{device_id}", response_model=GetDeviceResponseModel | list)
 async def get_device(
         db_session: DBSessionDep,
-        device_id: int
-) -> GetDeviceResponseModel | list:
+        device_id: int,
+        response: Response,
+        if_none_match: str | None = Header(None)
+) -> GetDeviceResponseModel | list | Response:
     """
     Handles the retrieval of device details based on the provided device ID. This
     function interacts with the database to find the corresponding device record
     and returns the device details in a structured format. If the device is not
     found, an empty list is returned.
 
+    The response carries a weak ETag derived from the device version; a matching
+    `If-None-Match` is answered with 304 and no body.
+
     :param db_session: Database session dependency instance used to query the
         database.
     :type db_session: DBSessionDep
@@ -73,24 +455,33 @@ async def get_device(
 
     :return: An instance of GetDeviceResponseModel containing the device details
         if found, otherwise an empty list.
-    :rtype: GetDeviceResponseModel | list
+    :rtype: GetDeviceResponseModel | list | Response
     """
-    device = await find_device_by_id(db_session, device_id)
+    device = await get_device_cached(db_session, device_id)
     if device:
-        return GetDeviceResponseModel(device=DeviceGetModel(**device.__dict__))
+        etag = device_etag(device.version)
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        response.headers["ETag"] = etag
+        return GetDeviceResponseModel(device=device)
     return []
 
 @router.put("/{device_id}")
 async def put_device(
         db_session: DBSessionDep,
         device_id: int,
-        device_request: PutDeviceRequestModel
+        device_request: PutDeviceRequestModel,
+        response: Response,
+        if_match: str | None = Header(None)
 ):
     """
     Handles HTTP PUT requests to update a device's information using its unique identifier.
-    This function retrieves the device by its ID, and if it exists, updates its attributes
-    based on the provided input data in the request body. Returns an updated device model
-    on success or an HTTP 400 response if the device cannot be found.
+    The attributes set in the request body are written with a single UPDATE ... RETURNING
+    statement; whether the device exists is decided from the affected row. Returns an
+    updated device model on success or an HTTP 400 response if the device cannot be found.
+
+    With `If-Match` set to an ETag from a previous GET, the update only applies if the
+    device has not changed since, and fails with 412 otherwise.
 
     :param db_session: An object representing the database session dependency for executing
         queries and managing database operations.
@@ -104,10 +495,10 @@ async def put_device(
         device data if the operation is successful. Otherwise, returns an HTTP 400 response.
     :rtype: PutDeviceResponseModel or fastapi.Response
     """
-    device = await find_device_by_id(db_session, device_id)
+    device = await update_device(db_session, device_id, device_request, if_match_version(if_match))
     if device:
-        await update_device(db_session, device, device_request)
-        return Response(status_code=status.HTTP_200_OK)
+        response.headers["ETag"] = device_etag(device.version)
+        return PutDeviceResponseModel(device=device)
     return Response(status_code=status.HTTP_400_BAD_REQUEST)
 
 @router.delete("/{device_id}")
@@ -116,10 +507,9 @@ async def delete_device(
         device_id: int,
 ):
     """
-    Deletes a device based on the provided device ID. The function attempts to find an existing
-    device with the given ID in the database session. If a matching device is found, it deletes
-    the device and returns a successful response. If no matching device is found, it returns
-    a response indicating a bad request.
+    Deletes a device based on the provided device ID with a single DELETE ... RETURNING
+    statement. If a matching device was deleted, returns a successful response. If no
+    matching device is found, it returns a response indicating a bad request.
 
     :param db_session: Database session dependency, used for accessing and modifying the database.
     :type db_session: DBSessionDep
@@ -129,26 +519,92 @@ async def delete_device(
         successfully, returns a 200 OK response. Otherwise, returns a 400 Bad Request response.
     :rtype: Response
     """
-    device = await find_device_by_id(db_session, device_id)
-    if device:
-        await delete_device_by_id(db_session, device)
+    if await delete_device_by_id(db_session, device_id):
         return Response(status_code=status.HTTP_200_OK)
     return Response(status_code=status.HTTP_400_BAD_REQUEST)
 
 
-@router.post("/{device_id}/command")
+@router.post("/{device_id}/heartbeat", status_code=status.HTTP_202_ACCEPTED)
+async def post_heartbeat(device_id: int) -> None:
+    """
+    Records a device check-in. The check-in is buffered and written to
+    `last_seen_at` by the heartbeat flusher, so this endpoint never waits on
+    the database.
+    """
+    heartbeat_buffer.record(device_id)
+
+
+@router.get("/heartbeats/stats")
+async def get_heartbeat_stats() -> HeartbeatStatsResponseModel:
+    """
+    Returns the heartbeat buffer depth, flush counters and last flush latency.
+    """
+    return HeartbeatStatsResponseModel(**heartbeat_buffer.stats())
+
+
+@router.get("/cache/stats")
+async def get_device_cache_stats() -> DeviceCacheStatsResponseModel:
+    """
+    Returns the size and hit/miss/eviction counters of the device cache.
+    """
+    return DeviceCacheStatsResponseModel(**device_cache.stats())
+
+
+@router.post("/{device_id}/command", status_code=status.HTTP_202_ACCEPTED)
 async def send_command(db_session: DBSessionDep, device_id:int, command_request: CommandRequestModel):
-    device = await find_device_by_id(db_session, device_id)
+    """
+    Queues a command for a device and returns its id right away. The command is
+    executed by a dispatch worker; poll `GET /commands/{command_id}` for its state.
+    Unknown commands and devices are rejected with 400.
+    """
+    if command_request.command not in COMMAND_HANDLERS:
+        return Response(status_code=status.HTTP_400_BAD_REQUEST)
+
+    device = await get_device_cached(db_session, device_id)
     if device:
-        match command_request.command:
-            case "reboot":
-
-                logger.info("Simulating reboot...")
-                # Add a delay (e.g., 5 seconds) before continuing:
-                await asyncio.sleep(5)
-                logger.info("Reboot simulation complete.")
-            case _:
-                return Response(status_code=status.HTTP_400_BAD_REQUEST)
+        command_id = await enqueue_command(db_session, device_id, command_request.command)
+        if command_id is not None:
+            return CommandQueuedResponseModel(command_id=command_id, status=CommandStatus.queued)
+    return Response(status_code=status.HTTP_400_BAD_REQUEST)
+
+
+@router.post("/commands", status_code=status.HTTP_202_ACCEPTED)
+async def send_bulk_command(
+        db_session: DBSessionDep,
+        command_request: BulkCommandRequestModel
+) -> BulkCommandResponseModel:
+    """
+    Queues a command for every device matching the given id list and/or
+    `device_type`/`status`/`group` filters. At least one selector is required.
+    """
+    if command_request.command not in COMMAND_HANDLERS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unknown command.")
+
+    query_filters = _bulk_selectors(command_request)
+    command_ids = await enqueue_bulk_command(
+        db_session, query_filters, command_request.device_ids, command_request.command
+    )
+    return BulkCommandResponseModel(queued=len(command_ids), command_ids=command_ids)
+
+
+@router.get("/commands/{command_id}")
+async def get_command_status(db_session: DBSessionDep, command_id: int) -> CommandStatusResponseModel:
+    """
+    Returns the current state of a queued command.
+    """
+    device_command = await get_command(db_session, command_id)
+    if device_command is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Command not found.")
+    return CommandStatusResponseModel.model_validate(device_command)
+
+
+@router.get("/ws/stats")
+async def get_websocket_stats() -> WebSocketStatsResponseModel:
+    """
+    Returns the connected client count, send queue depths, dropped message
+    counters and send latency of the WebSocket broadcaster.
+    """
+    return WebSocketStatsResponseModel(**broadcaster.stats())
 
 
 @router.websocket("/ws/devices")
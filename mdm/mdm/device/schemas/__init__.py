@@ -1,3 +1,9 @@
 from mdm.database.database import Base as Base
 
 from .device import Device as Device
+from .device_change_log import DeviceChangeLog as DeviceChangeLog
+from .device_change_log import DeviceChangeLogWatermark as DeviceChangeLogWatermark
+from .device_command import DeviceCommand as DeviceCommand
+from .device_group import DeviceGroup as DeviceGroup
+from .device_group import DeviceGroupMember as DeviceGroupMember
+from .device_stats import DeviceStats as DeviceStats
@@ -2,7 +2,7 @@ import datetime
 from enum import StrEnum
 from typing import Optional
 
-from sqlalchemy import DateTime, Index
+from sqlalchemy import DateTime, Index, func, text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from mdm.database.database import Base
@@ -20,29 +20,45 @@ class Status(StrEnum):
 class Device(Base):
     __tablename__ = "device"
     __table_args__ = (
-        Index("idx_device_status_device_type", "status", "device_type"),
+        # Carries the id so filtered targeting (e.g. joined with a group's
+        # members) is answered from the index alone, in id order.
+        Index("idx_device_status_device_type_id", "status", "device_type", "id"),
+        Index("idx_device_status_last_seen_at", "status", "last_seen_at"),
+        # Case-insensitive name lookups: prefix matches and name ordering use the
+        # btree, substring and fuzzy matches the trigram GIN index.
+        Index("idx_device_name_lower", text('lower(device_name) COLLATE "C"'), "id"),
+        Index("idx_device_name_trgm", text("lower(device_name) gin_trgm_ops"), postgresql_using="gin"),
     )
 
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True, index=True)
     device_name: Mapped[str] = mapped_column(unique=False, nullable=False)
+    # Natural key from the system a device was imported from; imports upsert on it.
+    external_id: Mapped[Optional[str]] = mapped_column(nullable=True, unique=True, index=True)
     device_type: Mapped[DeviceType] = mapped_column( nullable=False)
     status: Mapped[Status] = mapped_column(nullable=False)
-    created_at: Mapped[Optional[DateTime]] = mapped_column(
+    created_at: Mapped[datetime.datetime] = mapped_column(
         DateTime(timezone=True),
         nullable=False,
-        default=datetime.datetime.now(),
+        server_default=func.now(),
     )
-    last_seen_at: Mapped[Optional[DateTime]] = mapped_column(
+    # Written only by heartbeat ingestion, never as a side effect of other updates.
+    last_seen_at: Mapped[Optional[datetime.datetime]] = mapped_column(
         DateTime(timezone=True),
         nullable=True,
-        onupdate=datetime.datetime.now()
+        index=True,
     )
-    updated_at: Mapped[Optional[DateTime]] = mapped_column(
+    # Set by the database on insert and by a trigger whenever device_name,
+    # device_type or status changes, so it can drive incremental sync.
+    updated_at: Mapped[datetime.datetime] = mapped_column(
         DateTime(timezone=True),
-        nullable=True,
-        onupdate=datetime.datetime.now()
+        nullable=False,
+        server_default=func.now(),
+        index=True,
     )
+    # Bumped by a trigger whenever device_name, device_type or status changes;
+    # backs ETags and If-Match.
+    version: Mapped[int] = mapped_column(nullable=False, server_default=text("1"))
 
     def __str__(self) -> str:
         return (
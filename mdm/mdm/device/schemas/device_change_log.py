@@ -0,0 +1,60 @@
+import datetime
+from typing import Optional
+
+from sqlalchemy import BigInteger, DateTime, Index, func, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from mdm.database.database import Base
+from mdm.device.schemas.device import DeviceType, Status
+
+
+class DeviceChangeLog(Base):
+    """
+    Append-only log of device creations, updates and deletions. Rows are
+    written by statement-level triggers on `device` (see migration
+    e6c1f3a80b52). Writers do not coordinate, so `seq` order is not commit
+    order; each row also records the id of the transaction that wrote it, and
+    readers only return rows of transactions older than every running one,
+    ordered by (xid, seq). Such rows are final: no row sorting before them can
+    still appear.
+    """
+    __tablename__ = "device_change_log"
+    __table_args__ = (
+        Index("idx_device_change_log_xid_seq", "xid", "seq"),
+    )
+
+    seq: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    device_id: Mapped[int] = mapped_column(nullable=False)
+    change_type: Mapped[str] = mapped_column(nullable=False)
+    device_type: Mapped[Optional[DeviceType]] = mapped_column(nullable=True)
+    status: Mapped[Optional[Status]] = mapped_column(nullable=True)
+    changed_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+        index=True,
+    )
+    xid: Mapped[int] = mapped_column(
+        BigInteger,
+        nullable=False,
+        server_default=text("pg_current_xact_id()::text::bigint"),
+    )
+
+    def __repr__(self) -> str:
+        return (
+            f"DeviceChangeLog(seq={self.seq}, device_id={self.device_id}, "
+            f"change_type={self.change_type})"
+        )
+
+
+class DeviceChangeLogWatermark(Base):
+    """
+    Single row holding the (xid, seq) position of the last row removed by
+    retention pruning. A reader asking for changes after an older position
+    has missed some.
+    """
+    __tablename__ = "device_change_log_watermark"
+
+    id: Mapped[int] = mapped_column(primary_key=True, default=1)
+    pruned_through: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    pruned_through_xid: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
@@ -0,0 +1,51 @@
+import datetime
+from enum import StrEnum
+from typing import Optional
+
+from sqlalchemy import DateTime, ForeignKey, Index, func, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from mdm.database.database import Base
+
+
+class CommandStatus(StrEnum):
+    queued = "queued"
+    running = "running"
+    succeeded = "succeeded"
+    failed = "failed"
+
+
+class DeviceCommand(Base):
+    __tablename__ = "device_command"
+    __table_args__ = (
+        # Dispatch workers only ever scan queued commands in id order.
+        Index(
+            "idx_device_command_queued",
+            "id",
+            postgresql_where=text("status = 'queued'"),
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    device_id: Mapped[int] = mapped_column(
+        ForeignKey("device.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    command: Mapped[str] = mapped_column(nullable=False)
+    status: Mapped[CommandStatus] = mapped_column(nullable=False, default=CommandStatus.queued)
+    attempts: Mapped[int] = mapped_column(nullable=False, default=0)
+    error: Mapped[Optional[str]] = mapped_column(nullable=True)
+    created_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+    )
+    started_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    finished_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self) -> str:
+        return (
+            f"DeviceCommand(id={self.id}, device_id={self.device_id}, "
+            f"command={self.command}, status={self.status}, attempts={self.attempts})"
+        )
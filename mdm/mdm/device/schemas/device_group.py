@@ -0,0 +1,48 @@
+import datetime
+
+from sqlalchemy import DateTime, ForeignKey, Index, func, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from mdm.database.database import Base
+
+
+class DeviceGroup(Base):
+    """
+    A named set of devices, such as a site, a department or a rollout ring.
+    """
+    __tablename__ = "device_group"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    name: Mapped[str] = mapped_column(nullable=False, unique=True)
+    # Bumped whenever the membership changes; part of the ETag of listings
+    # filtered by the group.
+    version: Mapped[int] = mapped_column(nullable=False, server_default=text("1"))
+    created_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+    )
+
+    def __repr__(self) -> str:
+        return f"DeviceGroup(id={self.id}, name={self.name}, version={self.version})"
+
+
+class DeviceGroupMember(Base):
+    __tablename__ = "device_group_member"
+    __table_args__ = (
+        # The primary key serves "devices in a group" in device id order,
+        # this index the reverse lookup and cascades from deleted devices.
+        Index("idx_device_group_member_device_id", "device_id", "group_id"),
+    )
+
+    group_id: Mapped[int] = mapped_column(
+        ForeignKey("device_group.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    device_id: Mapped[int] = mapped_column(
+        ForeignKey("device.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+
+    def __repr__(self) -> str:
+        return f"DeviceGroupMember(group_id={self.group_id}, device_id={self.device_id})"
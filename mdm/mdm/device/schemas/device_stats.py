@@ -0,0 +1,23 @@
+from sqlalchemy.orm import Mapped, mapped_column
+
+from mdm.database.database import Base
+from mdm.device.schemas.device import DeviceType, Status
+
+
+class DeviceStats(Base):
+    """
+    Device counts per (device_type, status). The rows are maintained by
+    statement-level triggers on `device` (see migration 9a4f0c6e1d37), in the
+    same transaction as the change, so reading them never scans the fleet.
+    """
+    __tablename__ = "device_stats"
+
+    device_type: Mapped[DeviceType] = mapped_column(primary_key=True)
+    status: Mapped[Status] = mapped_column(primary_key=True)
+    device_count: Mapped[int] = mapped_column(nullable=False, default=0)
+
+    def __repr__(self) -> str:
+        return (
+            f"DeviceStats(device_type={self.device_type}, status={self.status}, "
+            f"device_count={self.device_count})"
+        )
@@ -0,0 +1,149 @@
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable
+
+from mdm.device.models.device_request import DeviceGetModel
+from mdm.metrics import CallbackMetric, registry
+from mdm.settings import device_settings
+
+InvalidationCallback = Callable[[int], None]
+
+
+class InvalidationBackend(ABC):
+    """
+    Interface for sharing cache invalidations between processes. Every worker
+    subscribes its local cache and publishes the ids of devices it changed.
+    """
+
+    @abstractmethod
+    async def publish(self, device_id: int) -> None:
+        ...
+
+    @abstractmethod
+    def subscribe(self, callback: InvalidationCallback) -> None:
+        ...
+
+
+class LocalInvalidationBackend(InvalidationBackend):
+    """
+    In-process backend: delivers invalidations to subscribers of this process only.
+    """
+
+    def __init__(self):
+        self._callbacks: list[InvalidationCallback] = []
+
+    async def publish(self, device_id: int) -> None:
+        for callback in self._callbacks:
+            callback(device_id)
+
+    def subscribe(self, callback: InvalidationCallback) -> None:
+        self._callbacks.append(callback)
+
+
+class DeviceCache:
+    """
+    LRU cache of serialized devices keyed by device id. Entries expire after
+    `ttl` seconds as a safety net; changes are normally applied through
+    `invalidate`, which is called wherever a device change is notified.
+
+    A load that races with an invalidation must not put the old device back:
+    callers read `generation(device_id)` before loading and pass it to `set`,
+    which drops the entry if the device was invalidated in the meantime.
+    Generations are kept in a fixed number of slots shared by device ids, so
+    a collision only costs a skipped `set`.
+    """
+
+    GENERATION_SLOTS = 4096
+
+    def __init__(self, max_size: int, ttl: float, backend: InvalidationBackend | None = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[int, tuple[float, DeviceGetModel]] = OrderedDict()
+        self._backend = backend
+        self._generations = [0] * self.GENERATION_SLOTS
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        if backend is not None:
+            backend.subscribe(self.discard)
+
+    def get(self, device_id: int) -> DeviceGetModel | None:
+        entry = self._entries.get(device_id)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, device = entry
+        if expires_at < time.monotonic():
+            del self._entries[device_id]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(device_id)
+        self.hits += 1
+        return device
+
+    def generation(self, device_id: int) -> int:
+        return self._generations[device_id % self.GENERATION_SLOTS]
+
+    def set(self, device_id: int, device: DeviceGetModel, generation: int | None = None) -> None:
+        if self.max_size <= 0:
+            return
+        if generation is not None and generation != self.generation(device_id):
+            return
+
+        self._entries[device_id] = (time.monotonic() + self.ttl, device)
+        self._entries.move_to_end(device_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def discard(self, device_id: int) -> None:
+        self._generations[device_id % self.GENERATION_SLOTS] += 1
+        if self._entries.pop(device_id, None) is not None:
+            self.invalidations += 1
+
+    async def invalidate(self, device_id: int) -> None:
+        """
+        Drops a device from this cache and from every cache sharing the backend.
+        """
+        self.discard(device_id)
+        if self._backend is not None:
+            await self._backend.publish(device_id)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+device_cache = DeviceCache(
+    max_size=device_settings.device_cache_max_size,
+    ttl=device_settings.device_cache_ttl,
+    backend=LocalInvalidationBackend(),
+)
+
+registry.register(CallbackMetric(
+    "mdm_device_cache_events_total",
+    "Device cache lookups and removals by outcome.",
+    lambda: [
+        ({"event": "hit"}, device_cache.hits),
+        ({"event": "miss"}, device_cache.misses),
+        ({"event": "eviction"}, device_cache.evictions),
+        ({"event": "invalidation"}, device_cache.invalidations),
+    ],
+    type_name="counter",
+))
+registry.callback("mdm_device_cache_size", "Devices held in the device cache.", lambda: len(device_cache._entries))
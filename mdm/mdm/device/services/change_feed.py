@@ -0,0 +1,336 @@
+import asyncio
+import datetime
+import time
+from typing import Callable, Sequence
+
+from fastapi import HTTPException, status
+from sqlalchemy import (
+    BigInteger,
+    ColumnElement,
+    Text,
+    cast,
+    delete,
+    func,
+    literal,
+    select,
+    tuple_,
+    update,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from mdm.database.database import sessionmanager
+from mdm.device.schemas import DeviceChangeLog, DeviceChangeLogWatermark
+from mdm.device.services.subscriptions import DeviceChange
+from mdm.logging_config import logger
+from mdm.metrics import registry
+from mdm.settings import device_settings
+
+ChangePublisher = Callable[[list[DeviceChange]], None]
+
+# (xid, seq) of a change log row. Rows are read in this order, which, unlike
+# seq order alone, no later commit can insert into behind a reader.
+LogPosition = tuple[int, int]
+
+
+def to_device_change(entry: DeviceChangeLog) -> DeviceChange:
+    return DeviceChange(
+        device_id=entry.device_id,
+        change_type=entry.change_type,
+        device_type=entry.device_type,
+        status=entry.status,
+        seq=entry.seq,
+    )
+
+
+def _settled() -> ColumnElement[bool]:
+    """
+    Condition on DeviceChangeLog matching rows of transactions older than
+    every running one. Those transactions have all ended, so no row can still
+    appear before a settled one in (xid, seq) order.
+    """
+    horizon = cast(cast(func.pg_snapshot_xmin(func.pg_current_snapshot()), Text), BigInteger)
+    return DeviceChangeLog.xid < horizon
+
+
+async def _get_pruned_position(db_session: AsyncSession) -> LogPosition:
+    row = (await db_session.execute(
+        select(DeviceChangeLogWatermark.pruned_through_xid, DeviceChangeLogWatermark.pruned_through)
+    )).first()
+    return (row.pruned_through_xid, row.pruned_through) if row is not None else (0, 0)
+
+
+async def resolve_since(db_session: AsyncSession, since: int) -> LogPosition:
+    """
+    Returns the log position of the change with sequence number `since`, as
+    handed out to clients. Any other number at or above the pruning watermark
+    resumes after the last settled change numbered up to it. Raises HTTP 410
+    when changes after `since` were already pruned, in which case the caller
+    has to reload the device list.
+    """
+    pruned = await _get_pruned_position(db_session)
+    if since == pruned[1]:
+        return pruned
+    xid = await db_session.scalar(select(DeviceChangeLog.xid).where(DeviceChangeLog.seq == since))
+    if xid is not None:
+        return xid, since
+    if since < pruned[1]:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail=f"Changes after {since} are no longer retained; reload the device list."
+        )
+    row = (await db_session.execute(
+        select(DeviceChangeLog.xid, DeviceChangeLog.seq)
+        .where(DeviceChangeLog.seq <= since, _settled())
+        .order_by(DeviceChangeLog.xid.desc(), DeviceChangeLog.seq.desc())
+        .limit(1)
+    )).first()
+    return max((row.xid, row.seq), pruned) if row is not None else pruned
+
+
+async def read_changes(db_session: AsyncSession, after: LogPosition, limit: int) -> Sequence[DeviceChangeLog]:
+    """
+    Returns up to `limit` settled changes logged after `after`, in log order.
+    """
+    result = await db_session.execute(
+        select(DeviceChangeLog)
+        .where(
+            tuple_(DeviceChangeLog.xid, DeviceChangeLog.seq) > tuple_(literal(after[0]), literal(after[1])),
+            _settled(),
+        )
+        .order_by(DeviceChangeLog.xid, DeviceChangeLog.seq)
+        .limit(limit)
+    )
+    return result.scalars().all()
+
+
+async def get_changes(db_session: AsyncSession, since: int, limit: int) -> Sequence[DeviceChangeLog]:
+    """
+    Returns up to `limit` logged changes after the change with sequence
+    number `since`, oldest first. A change is only returned once every
+    transaction that started writing before it has ended, so a client
+    resuming from the last `seq` it received never misses one.
+    """
+    return await read_changes(db_session, await resolve_since(db_session, since), limit)
+
+
+async def get_head(db_session: AsyncSession) -> LogPosition:
+    """
+    Returns the position of the last settled change.
+    """
+    row = (await db_session.execute(
+        select(DeviceChangeLog.xid, DeviceChangeLog.seq)
+        .where(_settled())
+        .order_by(DeviceChangeLog.xid.desc(), DeviceChangeLog.seq.desc())
+        .limit(1)
+    )).first()
+    return (row.xid, row.seq) if row is not None else await _get_pruned_position(db_session)
+
+
+async def get_log_version(db_session: AsyncSession) -> tuple[int, int]:
+    """
+    Returns the sequence number of the last settled change and the number of
+    committed changes not settled yet. Read in one statement, the pair
+    changes with every committed change, so it can tag device listings.
+    """
+    head_seq = (
+        select(DeviceChangeLog.seq)
+        .where(_settled())
+        .order_by(DeviceChangeLog.xid.desc(), DeviceChangeLog.seq.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    pruned_through = select(DeviceChangeLogWatermark.pruned_through).scalar_subquery()
+    unsettled = select(func.count()).select_from(DeviceChangeLog).where(~_settled()).scalar_subquery()
+    row = (await db_session.execute(select(func.coalesce(head_seq, pruned_through, 0), unsettled))).one()
+    return row[0], row[1]
+
+
+async def get_settle_lag(db_session: AsyncSession) -> float:
+    """
+    Returns how many seconds the oldest committed but unsettled change has
+    been waiting for older writing transactions to end, 0 when none waits.
+    """
+    lag = await db_session.scalar(
+        select(func.extract("epoch", func.now() - func.min(DeviceChangeLog.changed_at))).where(~_settled())
+    )
+    return float(lag or 0)
+
+
+class ChangeFeed:
+    """
+    Tails the change log and hands new entries to `publish` in log order, so
+    live WebSocket frames carry the `seq` a client resumes from.
+    The tail is read when woken by the event bus and at least every
+    `poll_interval`, which also picks up changes made outside the API. The
+    feed also prunes entries older than `retention` seconds.
+
+    A change is only delivered once every transaction on the server that
+    started writing before it has ended, so write transactions have to stay
+    short: one left open holds back the feed, `/changes` and listing ETags
+    for as long as it runs. The wait is exported as
+    `mdm_change_feed_settle_lag_seconds` and logged past `lag_warning`.
+    """
+
+    def __init__(
+            self,
+            publish: ChangePublisher,
+            poll_interval: float,
+            batch_size: int,
+            retention: float,
+            prune_interval: float,
+            lag_warning: float
+    ):
+        self.publish = publish
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.retention = retention
+        self.prune_interval = prune_interval
+        self.lag_warning = lag_warning
+        self.settle_lag = 0.0
+        self.position: LogPosition | None = None
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._last_prune = 0.0
+
+        self.delivered_total = 0
+        self.pruned_total = 0
+
+    @property
+    def seq(self) -> int | None:
+        return self.position[1] if self.position is not None else None
+
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    async def poll(self) -> int:
+        """
+        Publishes every change logged after the current position and returns
+        how many there were. The first poll only records the log head.
+        """
+        delivered = 0
+        async with sessionmanager.session() as session:
+            if self.position is None:
+                self.position = await get_head(session)
+                return 0
+            await self._check_settle_lag(session)
+            while True:
+                entries = await read_changes(session, self.position, self.batch_size)
+                if not entries:
+                    break
+                self.position = (entries[-1].xid, entries[-1].seq)
+                self.publish([to_device_change(entry) for entry in entries])
+                delivered += len(entries)
+                if len(entries) < self.batch_size:
+                    break
+        self.delivered_total += delivered
+        return delivered
+
+    async def _check_settle_lag(self, session: AsyncSession) -> None:
+        lagging = self.settle_lag > self.lag_warning
+        self.settle_lag = await get_settle_lag(session)
+        if self.settle_lag > self.lag_warning and not lagging:
+            logger.warning(
+                "Change log delivery has been held back for %.0f s by a long-running write transaction.",
+                self.settle_lag
+            )
+        elif lagging and self.settle_lag <= self.lag_warning:
+            logger.info("Change log delivery caught up.")
+
+    async def prune(self) -> int:
+        """
+        Deletes settled log entries up to the newest one older than the
+        retention period, advances the watermark and returns the number of
+        deleted entries. Entries are deleted in log order, so a few slightly
+        younger ones may go with them.
+        """
+        cutoff = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=self.retention)
+        async with sessionmanager.connect() as connection:
+            boundary = (await connection.execute(
+                select(DeviceChangeLog.xid, DeviceChangeLog.seq)
+                .where(DeviceChangeLog.changed_at < cutoff, _settled())
+                .order_by(DeviceChangeLog.changed_at.desc())
+                .limit(1)
+            )).first()
+            if boundary is None:
+                return 0
+            result = await connection.execute(
+                delete(DeviceChangeLog).where(tuple_(DeviceChangeLog.xid, DeviceChangeLog.seq) <= tuple_(*boundary))
+            )
+            await connection.execute(
+                update(DeviceChangeLogWatermark)
+                .where(
+                    tuple_(DeviceChangeLogWatermark.pruned_through_xid, DeviceChangeLogWatermark.pruned_through)
+                    < tuple_(*boundary)
+                )
+                .values(pruned_through_xid=boundary.xid, pruned_through=boundary.seq)
+            )
+        self.pruned_total += result.rowcount
+        if result.rowcount:
+            logger.info("Pruned %d change log entries through seq %d.", result.rowcount, boundary.seq)
+        return result.rowcount
+
+    async def run(self) -> None:
+        while True:
+            try:
+                async with asyncio.timeout(self.poll_interval):
+                    await self._wakeup.wait()
+            except TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                await self.poll()
+            except Exception as e:
+                logger.error("Failed to read the change log: %s", e)
+
+            if time.monotonic() - self._last_prune >= self.prune_interval:
+                self._last_prune = time.monotonic()
+                try:
+                    await self.prune()
+                except Exception as e:
+                    logger.error("Failed to prune the change log: %s", e)
+
+    async def start(self) -> None:
+        if self._task is None:
+            try:
+                await self.poll()
+            except Exception as e:
+                logger.error("Failed to read the change log head: %s", e)
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def create_change_feed(publish: ChangePublisher) -> ChangeFeed:
+    feed = ChangeFeed(
+        publish,
+        poll_interval=device_settings.change_feed_poll_interval,
+        batch_size=device_settings.change_feed_batch_size,
+        retention=device_settings.change_log_retention,
+        prune_interval=device_settings.change_log_prune_interval,
+        lag_warning=device_settings.change_feed_lag_warning,
+    )
+    registry.callback(
+        "mdm_change_feed_position",
+        "Sequence number of the last change log entry delivered by this worker.",
+        lambda: feed.seq or 0,
+    )
+    registry.callback(
+        "mdm_change_feed_settle_lag_seconds",
+        "Age of the oldest committed change held back by a still running older write transaction.",
+        lambda: feed.settle_lag,
+    )
+    registry.callback(
+        "mdm_change_feed_delivered_total",
+        "Change log entries delivered to WebSocket subscribers.",
+        lambda: feed.delivered_total,
+        type_name="counter",
+    )
+    return feed
@@ -0,0 +1,216 @@
+import asyncio
+import datetime
+from typing import Awaitable, Callable, Sequence
+
+from sqlalchemy import cast, func, insert, literal, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from mdm.database.database import sessionmanager
+from mdm.device.schemas import Device, DeviceCommand
+from mdm.device.schemas.device_command import CommandStatus
+from mdm.device.services.group_service import device_in_group
+from mdm.logging_config import logger
+from mdm.settings import device_settings
+
+CommandHandler = Callable[[int], Awaitable[None]]
+
+
+async def _simulate_reboot(device_id: int) -> None:
+    logger.info("Simulating reboot of device %s...", device_id)
+    # Add a delay (e.g., 5 seconds) before continuing:
+    await asyncio.sleep(5)
+    logger.info("Reboot simulation of device %s complete.", device_id)
+
+
+COMMAND_HANDLERS: dict[str, CommandHandler] = {
+    "reboot": _simulate_reboot,
+}
+
+
+async def enqueue_command(db_session: AsyncSession, device_id: int, command: str) -> int | None:
+    """
+    Persists a command for a device in the `queued` state, wakes the local
+    dispatcher and returns the command id, or None when the device does not
+    exist (anymore). The command is executed later by a dispatch worker.
+    """
+    device_command = DeviceCommand(device_id=device_id, command=command, status=CommandStatus.queued, attempts=0)
+    db_session.add(device_command)
+    try:
+        await db_session.flush()
+    except IntegrityError:
+        # The device was deleted after the caller looked it up.
+        await db_session.rollback()
+        return None
+    # Attributes are expired on commit, so read the id beforehand.
+    command_id = device_command.id
+    await db_session.commit()
+    command_dispatcher.wake()
+    return command_id
+
+
+async def enqueue_bulk_command(
+        db_session: AsyncSession,
+        filters: dict[str, str],
+        device_ids: list[int] | None,
+        command: str
+) -> Sequence[int]:
+    """
+    Queues the same command for every device matching the filters (and the id
+    list, when given) with one INSERT ... SELECT, and returns the command ids.
+    """
+    targets = select(
+        Device.id,
+        literal(command),
+        # Parameters in a SELECT list are typed as text, which has no implicit cast to the enum.
+        cast(literal(CommandStatus.queued.value), DeviceCommand.__table__.c.status.type),
+        literal(0),
+    ).order_by(Device.id)
+    for field_name, value in filters.items():
+        if field_name == "group":
+            targets = targets.where(device_in_group(value))
+            continue
+        targets = targets.where(getattr(Device, field_name) == value)
+    if device_ids is not None:
+        targets = targets.where(Device.id.in_(device_ids))
+
+    statement = insert(DeviceCommand).from_select(
+        ["device_id", "command", "status", "attempts"], targets
+    ).returning(DeviceCommand.id)
+    result = await db_session.execute(statement)
+    command_ids = result.scalars().all()
+    await db_session.commit()
+    command_dispatcher.wake()
+    return command_ids
+
+
+async def get_command(db_session: AsyncSession, command_id: int) -> DeviceCommand | None:
+    result = await db_session.execute(select(DeviceCommand).where(DeviceCommand.id == command_id))
+    return result.scalars().first()
+
+
+class CommandDispatcher:
+    """
+    Pool of worker tasks executing queued commands. Workers claim one command at
+    a time with SELECT ... FOR UPDATE SKIP LOCKED, so any number of workers in
+    any number of processes can share the queue without claiming twice. No
+    database connection is held while a command runs.
+    """
+
+    def __init__(self, workers: int, poll_interval: float, stale_after: float):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self._wakeup = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        try:
+            await self.requeue_stale()
+        except Exception as e:
+            logger.error("Failed to requeue stale commands: %s", e)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def requeue_stale(self) -> None:
+        """
+        Returns commands left `running` by a crashed worker to the queue.
+        """
+        stale_before = func.now() - datetime.timedelta(seconds=self.stale_after)
+        async with sessionmanager.connect() as connection:
+            await connection.execute(
+                update(DeviceCommand)
+                .where(DeviceCommand.status == CommandStatus.running, DeviceCommand.started_at < stale_before)
+                .values(status=CommandStatus.queued)
+            )
+
+    async def claim(self) -> tuple[int, int, str] | None:
+        """
+        Atomically moves the oldest unclaimed queued command to `running` and
+        returns its id, device id and command name.
+        """
+        claimable = (
+            select(DeviceCommand.id)
+            .where(DeviceCommand.status == CommandStatus.queued)
+            .order_by(DeviceCommand.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        statement = (
+            update(DeviceCommand)
+            .where(DeviceCommand.id == claimable)
+            .values(
+                status=CommandStatus.running,
+                started_at=func.now(),
+                attempts=DeviceCommand.attempts + 1,
+            )
+            .returning(DeviceCommand.id, DeviceCommand.device_id, DeviceCommand.command)
+        )
+        async with sessionmanager.connect() as connection:
+            row = (await connection.execute(statement)).first()
+        return tuple(row) if row is not None else None
+
+    async def finish(self, command_id: int, error: str | None) -> None:
+        async with sessionmanager.connect() as connection:
+            await connection.execute(
+                update(DeviceCommand)
+                .where(DeviceCommand.id == command_id)
+                .values(
+                    status=CommandStatus.failed if error else CommandStatus.succeeded,
+                    error=error,
+                    finished_at=func.now(),
+                )
+            )
+
+    async def run_one(self) -> bool:
+        """
+        Claims and executes a single command. Returns False when the queue is empty.
+        """
+        claimed = await self.claim()
+        if claimed is None:
+            return False
+
+        command_id, device_id, command = claimed
+        error = None
+        try:
+            handler = COMMAND_HANDLERS.get(command)
+            if handler is None:
+                raise ValueError(f"Unknown command '{command}'")
+            await handler(device_id)
+        except Exception as e:
+            logger.error("Command %s (%s) for device %s failed: %s", command_id, command, device_id, e)
+            error = str(e) or type(e).__name__
+        await self.finish(command_id, error)
+        return True
+
+    async def _work(self) -> None:
+        while True:
+            try:
+                if await self.run_one():
+                    continue
+            except Exception as e:
+                logger.error("Command worker error: %s", e)
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+
+command_dispatcher = CommandDispatcher(
+    workers=device_settings.command_workers,
+    poll_interval=device_settings.command_poll_interval,
+    stale_after=device_settings.command_stale_after,
+)
@@ -1,13 +1,49 @@
-from typing import Sequence
+from typing import Any, AsyncIterator, Sequence
 
 from fastapi import HTTPException, status
-from sqlalchemy import select
+from pydantic import ValidationError
+from sqlalchemy import (
+    ColumnElement,
+    Integer,
+    Row,
+    Select,
+    and_,
+    any_,
+    bindparam,
+    delete,
+    func,
+    insert,
+    literal,
+    or_,
+    select,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.exc import DataError, IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from mdm.device.models.device_request import DeviceRequestModel, PutDeviceRequestModel
-from mdm.device.schemas import Device
-from mdm.device.services.websockets_service import notify_device_change
+from mdm.device.models.device_request import (
+    BulkCreateDeviceResultModel,
+    BulkCreateDevicesResponseModel,
+    BulkDevicesResponseModel,
+    DeviceGetModel,
+    DeviceRequestModel,
+    DeviceStatsEntryModel,
+    DeviceStatsResponseModel,
+    PutDeviceRequestModel,
+    SearchMode,
+)
+from mdm.device.schemas import Device, DeviceStats
+from mdm.device.services.cache_service import device_cache
+from mdm.device.services.group_service import device_in_group
+from mdm.device.services.subscriptions import DeviceChange
+from mdm.device.services.websockets_service import (
+    notify_device_change,
+    notify_devices_change,
+)
 from mdm.logging_config import logger
+from mdm.settings import device_settings
 
 
 async def  add_device(db_session: AsyncSession, device_request) -> None:
@@ -17,61 +53,444 @@ async def  add_device(db_session: AsyncSession, device_request) -> None:
             db_session.add(new_device)
             await db_session.flush()
             await db_session.refresh(new_device)
-            logger.info(f"Device '{device_request.device_name}' added successfully.")
-            # Notify clients
-            await notify_device_change(device_id=new_device.id, change_type="created")
-
-
+            logger.info("Device '%s' added successfully.", device_request.device_name)
+            new_device_id = new_device.id
     except Exception as e:
-        logger.error(f"Failed to add device: {str(e)}")
+        logger.error("Failed to add device: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to add device. Please try again later."
         )
 
-async def get_all_devices(db_session: AsyncSession, filters: dict[str, str] | None) -> Sequence[Device] | None:
-    query = select(Device)
+    await device_cache.invalidate(new_device_id)
+    # Notify clients once the device is committed and visible to them
+    await notify_device_change(
+        device_id=new_device_id,
+        change_type="created",
+        device_type=device_request.device_type,
+        status=device_request.status
+    )
+
+def _rejection_message(error: IntegrityError | DataError) -> str:
+    """
+    Client-facing reason for a row the database rejected. The exception text
+    carries SQL and parameters, so it only goes to the log.
+    """
+    if isinstance(error, IntegrityError):
+        return "Rejected by the database: constraint violation."
+    return "Rejected by the database: invalid value."
+
+async def _insert_device_rows(
+        db_session: AsyncSession,
+        rows: list[tuple[int, dict[str, Any]]]
+) -> list[BulkCreateDeviceResultModel]:
+    """
+    Inserts a chunk of validated rows in one multi-row INSERT ... RETURNING id.
+    If the chunk is rejected by the database, each row is retried in its own
+    savepoint so a single bad row only fails itself. Other errors, such as a
+    lost connection, fail the request.
+    """
+    statement = insert(Device).returning(Device.id, sort_by_parameter_order=True)
+    try:
+        async with db_session.begin():
+            result = await db_session.execute(statement, [row for _, row in rows])
+            new_ids = result.scalars().all()
+        return [
+            BulkCreateDeviceResultModel(index=index, id=new_id)
+            for (index, _), new_id in zip(rows, new_ids)
+        ]
+    except (IntegrityError, DataError) as e:
+        logger.warning("Bulk insert of %d devices failed, retrying row by row: %s", len(rows), e)
+
+    results = []
+    async with db_session.begin():
+        for index, row in rows:
+            try:
+                async with db_session.begin_nested():
+                    result = await db_session.execute(insert(Device).returning(Device.id), row)
+                    results.append(BulkCreateDeviceResultModel(index=index, id=result.scalar_one()))
+            except (IntegrityError, DataError) as e:
+                logger.warning("Insert of device at index %d failed: %s", index, e)
+                results.append(BulkCreateDeviceResultModel(index=index, error=_rejection_message(e)))
+    return results
+
+async def add_devices_bulk(
+        db_session: AsyncSession,
+        device_requests: list[Any]
+) -> BulkCreateDevicesResponseModel:
+    """
+    Creates many devices at once. Items are validated individually, written in
+    chunks of `devices_insert_chunk_size` rows, each chunk committed on its own,
+    and a single change notification is sent for the whole batch. Invalid items
+    are reported in the result instead of failing the request.
+    """
+    results: list[BulkCreateDeviceResultModel] = []
+    valid_rows: list[tuple[int, dict[str, Any]]] = []
+    for index, item in enumerate(device_requests):
+        try:
+            device_request = DeviceRequestModel.model_validate(item)
+        except ValidationError as e:
+            results.append(BulkCreateDeviceResultModel(index=index, error=str(e)))
+            continue
+        valid_rows.append((index, device_request.model_dump()))
+
+    chunk_size = device_settings.devices_insert_chunk_size
+    for start in range(0, len(valid_rows), chunk_size):
+        results.extend(await _insert_device_rows(db_session, valid_rows[start:start + chunk_size]))
+
+    results.sort(key=lambda result: result.index)
+    rows_by_index = dict(valid_rows)
+    changes = [
+        DeviceChange(
+            result.id,
+            "created",
+            rows_by_index[result.index]["device_type"],
+            rows_by_index[result.index]["status"]
+        )
+        for result in results if result.id is not None
+    ]
+    logger.info("Bulk added %d of %d devices.", len(changes), len(device_requests))
+    await notify_devices_change(changes)
 
+    return BulkCreateDevicesResponseModel(
+        created=len(changes),
+        failed=len(results) - len(changes),
+        results=results
+    )
+
+# Filters that are not a plain column match: ranges on the indexed timestamps,
+# for incremental sync jobs, and group membership, read from the membership
+# primary key.
+_CUSTOM_FILTERS = {
+    "updated_since": lambda value: Device.updated_at >= value,
+    "seen_before": lambda value: Device.last_seen_at < value,
+    "group": device_in_group,
+}
+
+def _apply_filters(query: Select, filters: dict[str, Any] | None) -> Select:
     if filters:
         for field_name, value in filters.items():
+            if field_name in _CUSTOM_FILTERS:
+                query = query.where(_CUSTOM_FILTERS[field_name](value))
+                continue
             # Assuming exact matches on fields; adjust logic if needed (e.g., partial matching)
             query = query.where(getattr(Device, field_name) == value.lower())
+    return query
+
+# Columns of the public device representation, in DeviceGetModel field order.
+_DEVICE_COLUMNS = (Device.id, Device.device_name, Device.device_type, Device.status)
+
+async def get_all_devices(
+        db_session: AsyncSession,
+        filters: dict[str, Any] | None,
+        limit: int | None = None,
+        after_id: int | None = None
+) -> Sequence[Row]:
+    """
+    Returns devices ordered by id. When `after_id` is given only devices with a
+    greater id are returned, which lets callers page through the table by key
+    instead of by offset. Only the public columns are selected, as plain rows
+    that bypass the ORM identity map.
+    """
+    query = _apply_filters(select(*_DEVICE_COLUMNS), filters).order_by(Device.id)
+    if after_id is not None:
+        query = query.where(Device.id > after_id)
+    if limit is not None:
+        query = query.limit(limit)
 
     result = await db_session.execute(query)
-    return result.scalars().all()
+    return result.all()
+
+async def stream_all_devices(
+        db_session: AsyncSession,
+        filters: dict[str, Any] | None,
+        after_id: int | None = None
+) -> AsyncIterator[Row]:
+    """
+    Yields device rows ordered by id using a server-side cursor, so only one
+    chunk of rows is held in memory at a time.
+    """
+    query = _apply_filters(select(*_DEVICE_COLUMNS), filters).order_by(Device.id)
+    if after_id is not None:
+        query = query.where(Device.id > after_id)
+    query = query.execution_options(yield_per=device_settings.devices_stream_chunk_size)
+
+    result = await db_session.stream(query)
+    async for device in result:
+        yield device
+
+async def search_devices(
+        db_session: AsyncSession,
+        search: str,
+        mode: SearchMode,
+        filters: dict[str, Any] | None,
+        limit: int,
+        after: tuple[str | float, int] | None = None
+) -> Sequence[Row]:
+    """
+    Case-insensitive search on device_name. Each row carries a `rank` column:
+    prefix matches are ordered by name through the lowercase btree index,
+    substring and fuzzy matches by trigram similarity through the GIN index.
+    `after` is the (rank, id) of the last row of the previous page.
+    """
+    needle = search.lower()
+    rank: ColumnElement[Any]
+    if mode == SearchMode.prefix:
+        # The "C" collation lets the btree serve both the LIKE prefix and the ordering.
+        rank = func.lower(Device.device_name).collate("C")
+        # The explicit range keeps the index usable even under a generic plan,
+        # where the LIKE pattern is not known when the statement is planned.
+        condition = and_(
+            rank >= needle,
+            rank < needle + "\U0010ffff",
+            rank.startswith(needle, autoescape=True)
+        )
+        ordering = (rank.asc(), Device.id.asc())
+        keyset = tuple_(rank, Device.id) > tuple_(literal(after[0]), literal(after[1])) if after else None
+    else:
+        name = func.lower(Device.device_name)
+        rank = func.similarity(name, needle)
+        if mode == SearchMode.substring:
+            condition = name.contains(needle, autoescape=True)
+        else:
+            condition = name.op("%")(needle)
+        ordering = (rank.desc(), Device.id.asc())
+        keyset = or_(rank < after[0], and_(rank == after[0], Device.id > after[1])) if after else None
+
+    query = _apply_filters(select(*_DEVICE_COLUMNS, rank.label("rank")), filters).where(condition)
+    if keyset is not None:
+        query = query.where(keyset)
+    query = query.order_by(*ordering).limit(limit)
+
+    result = await db_session.execute(query)
+    return result.all()
 
 async def find_device_by_id(db_session: AsyncSession, device_id: int) -> Device | None:
     result = await db_session.execute(select(Device).where(Device.id == device_id))
     return result.scalars().first()
 
+async def get_device_cached(db_session: AsyncSession, device_id: int) -> DeviceGetModel | None:
+    """
+    Read-through lookup of a device: served from the in-process device cache
+    when possible, otherwise loaded with find_device_by_id and cached.
+    """
+    cached_device = device_cache.get(device_id)
+    if cached_device is not None:
+        return cached_device
+
+    # Read before the SELECT so an invalidation during the load is detected.
+    generation = device_cache.generation(device_id)
+    device = await find_device_by_id(db_session, device_id)
+    if device is None:
+        return None
 
+    device_model = DeviceGetModel.model_validate(device)
+    device_cache.set(device_id, device_model, generation)
+    return device_model
+
+
+async def get_device_stats(db_session: AsyncSession) -> DeviceStatsResponseModel:
+    """
+    Returns device counts by device_type and status from the trigger-maintained
+    device_stats table. The table holds one row per combination, so the cost
+    does not depend on the number of devices.
+    """
+    result = await db_session.execute(
+        select(DeviceStats)
+        .where(DeviceStats.device_count > 0)
+        .order_by(DeviceStats.device_type, DeviceStats.status)
+    )
+    counts = [
+        DeviceStatsEntryModel(device_type=row.device_type, status=row.status, count=row.device_count)
+        for row in result.scalars().all()
+    ]
+    return DeviceStatsResponseModel(total=sum(entry.count for entry in counts), counts=counts)
 
 async def update_device(
         db_session: AsyncSession,
-        device: Device,
-        device_request: PutDeviceRequestModel
-) -> Device:
+        device_id: int,
+        device_request: PutDeviceRequestModel,
+        expected_version: int | None = None
+) -> DeviceGetModel | None:
+    """
+    Applies the fields set in the request with a single
+    UPDATE ... WHERE id = :id RETURNING statement. Returns the updated device,
+    or None when no device has the given id. With `expected_version`, the
+    update only applies to that version of the device and raises HTTP 412
+    when the device has changed since.
+    """
     # Convert request to a dictionary, excluding any unset or special fields
-    updated_fields = device_request.model_dump(exclude_unset=True) \
-        if hasattr(device_request, 'dict') else dict(device_request)
-
-    # Update only the fields that match attributes on the device
-    for field_name, field_value in updated_fields.items():
-        # Skip the device ID or any fields you do not want to modify
-        if field_name != "id" and hasattr(device, field_name):
-            setattr(device, field_name, field_value)
+    updated_fields = device_request.model_dump(exclude_unset=True, exclude_none=True)
+    # An empty request still goes through the statement, as a no-op assignment,
+    # so it reports the current device and honours `expected_version`.
+    if not updated_fields:
+        updated_fields = {"device_name": Device.device_name}
 
+    statement = (
+        update(Device)
+        .where(Device.id == device_id)
+        .values(**updated_fields)
+        .returning(*_DEVICE_COLUMNS, Device.version)
+        .execution_options(synchronize_session=False)
+    )
+    if expected_version is not None:
+        statement = statement.where(Device.version == expected_version)
+    result = await db_session.execute(statement)
+    row = result.first()
+    if row is None and expected_version is not None:
+        # Only the failure path pays for telling a stale version from a missing device.
+        exists = await db_session.scalar(select(Device.id).where(Device.id == device_id))
+        await db_session.commit()
+        if exists is not None:
+            raise HTTPException(
+                status_code=status.HTTP_412_PRECONDITION_FAILED,
+                detail="The device was modified by another request."
+            )
+        return None
     await db_session.commit()
+    if row is None:
+        return None
 
+    device = DeviceGetModel.model_validate(row._mapping)
+    await device_cache.invalidate(device_id)
+    await notify_device_change(
+        device_id=device_id,
+        change_type="updated",
+        device_type=device.device_type,
+        status=device.status
+    )
     return device
 
-async def delete_device_by_id(db_session: AsyncSession, device: Device) -> None:
+async def delete_device_by_id(db_session: AsyncSession, device_id: int) -> bool:
+    """
+    Deletes a device with a single DELETE ... RETURNING statement. Returns
+    False when no device has the given id.
+    """
     try:
-        await db_session.delete(device)
+        statement = (
+            delete(Device)
+            .where(Device.id == device_id)
+            .returning(Device.device_type, Device.status)
+            .execution_options(synchronize_session=False)
+        )
+        result = await db_session.execute(statement)
+        row = result.first()
         await db_session.commit()
     except Exception as e:
-        logger.error(f"Failed to delete device: {str(e)}")
+        logger.error("Failed to delete device: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to delete device. Please try again later."
-        )
\ No newline at end of file
+        )
+    if row is None:
+        return False
+
+    await device_cache.invalidate(device_id)
+    await notify_device_change(
+        device_id=device_id,
+        change_type="deleted",
+        device_type=row.device_type,
+        status=row.status
+    )
+    return True
+
+
+def _bulk_targets(
+        filters: dict[str, str],
+        device_ids: list[int] | None,
+        after_id: int,
+        chunk_size: int
+) -> Select:
+    """
+    Selects the ids of the next chunk of matching devices, walking the table by key.
+    """
+    query = _apply_filters(select(Device.id), filters).where(Device.id > after_id)
+    if device_ids is not None:
+        # One array parameter instead of one parameter per id, which would hit
+        # the protocol's bind parameter limit on large id lists.
+        query = query.where(Device.id == any_(bindparam("device_ids", device_ids, type_=ARRAY(Integer))))
+    return query.order_by(Device.id).limit(chunk_size)
+
+async def _apply_in_chunks(
+        db_session: AsyncSession,
+        build_statement,
+        filters: dict[str, str],
+        device_ids: list[int] | None,
+        change_type: str
+) -> BulkDevicesResponseModel:
+    """
+    Runs a set-based UPDATE/DELETE over the matching devices one chunk of ids
+    at a time. Each chunk is its own short transaction, so row locks are held
+    briefly and a large change does not build up one huge transaction. One
+    aggregated change event is published per chunk.
+    """
+    chunk_size = device_settings.devices_bulk_chunk_size
+    affected_ids: list[int] = []
+    after_id = 0
+    while True:
+        targets = _bulk_targets(filters, device_ids, after_id, chunk_size)
+        statement = build_statement(Device.id.in_(targets.scalar_subquery())).returning(
+            Device.id, Device.device_type, Device.status
+        ).execution_options(synchronize_session=False)
+        result = await db_session.execute(statement)
+        rows = result.all()
+        await db_session.commit()
+        if not rows:
+            break
+
+        changes = [
+            DeviceChange(
+                device_id=row.id,
+                change_type=change_type,
+                device_type=row.device_type,
+                status=row.status
+            )
+            for row in rows
+        ]
+        for change in changes:
+            device_cache.discard(change.device_id)
+        await notify_devices_change(changes)
+
+        chunk_ids = sorted(row.id for row in rows)
+        affected_ids.extend(chunk_ids)
+        if len(rows) < chunk_size:
+            break
+        after_id = chunk_ids[-1]
+
+    logger.info("Bulk %s applied to %d devices.", change_type, len(affected_ids))
+    return BulkDevicesResponseModel(affected=len(affected_ids), device_ids=affected_ids)
+
+async def update_devices_bulk(
+        db_session: AsyncSession,
+        filters: dict[str, str],
+        device_ids: list[int] | None,
+        device_request: PutDeviceRequestModel
+) -> BulkDevicesResponseModel:
+    """
+    Applies the same field changes to every device matching the filters (and
+    the id list, when given).
+    """
+    updated_fields = device_request.model_dump(exclude_unset=True, exclude_none=True)
+    return await _apply_in_chunks(
+        db_session,
+        lambda condition: update(Device).where(condition).values(**updated_fields),
+        filters,
+        device_ids,
+        "updated"
+    )
+
+async def delete_devices_bulk(
+        db_session: AsyncSession,
+        filters: dict[str, str],
+        device_ids: list[int] | None
+) -> BulkDevicesResponseModel:
+    """
+    Deletes every device matching the filters (and the id list, when given).
+    """
+    return await _apply_in_chunks(
+        db_session,
+        lambda condition: delete(Device).where(condition),
+        filters,
+        device_ids,
+        "deleted"
+    )
@@ -0,0 +1,65 @@
+import hashlib
+import json
+from typing import Any
+
+from fastapi import HTTPException, status
+
+
+def device_etag(version: int) -> str:
+    """
+    Weak ETag of a single device, derived from its version counter. The
+    version is bumped by a trigger whenever a client-visible column changes.
+    """
+    return f'W/"{version}"'
+
+
+def list_etag(change_seq: int, params: dict[str, Any]) -> str:
+    """
+    Weak ETag of a device listing: the change log head (any create, update or
+    delete advances it) combined with the query that produced the listing.
+    """
+    digest = hashlib.blake2b(json.dumps(params, sort_keys=True, default=str).encode(), digest_size=8).hexdigest()
+    return f'W/"{change_seq}-{digest}"'
+
+
+def _opaque_tags(header: str) -> list[str]:
+    tags = []
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag:
+            tags.append(tag)
+    return tags
+
+
+def etag_matches(header: str | None, etag: str) -> bool:
+    """
+    If-None-Match comparison: weak, so `W/"1"` and `"1"` match.
+    """
+    if not header:
+        return False
+    tags = _opaque_tags(header)
+    return "*" in tags or _opaque_tags(etag)[0] in tags
+
+
+def if_match_version(header: str | None) -> int | None:
+    """
+    Returns the device version required by an If-Match header, or None when
+    any version is acceptable. Raises HTTP 412 for a tag this API never issued.
+    Tags are compared weakly, as device ETags are weak.
+    """
+    if header is None:
+        return None
+    tags = _opaque_tags(header)
+    if "*" in tags:
+        return None
+    if len(tags) == 1:
+        try:
+            return int(tags[0].strip('"'))
+        except ValueError:
+            pass
+    raise HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail="If-Match must carry a single device ETag."
+    )
@@ -0,0 +1,159 @@
+import asyncio
+import json
+from abc import ABC, abstractmethod
+from typing import Callable
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from mdm.database.database import sessionmanager
+from mdm.device.services.subscriptions import DeviceChange
+from mdm.logging_config import logger
+from mdm.settings import event_bus_settings
+
+ChangeHandler = Callable[[list[DeviceChange]], None]
+
+# Postgres rejects NOTIFY payloads of 8000 bytes or more.
+_MAX_PAYLOAD_SIZE = 7500
+
+
+class EventBus(ABC):
+    """
+    Carries device changes between workers. Every worker publishes the changes
+    it makes and receives the changes of all workers, including its own,
+    through the handler it was created with.
+    """
+
+    def __init__(self, handler: ChangeHandler):
+        self._handler = handler
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    @abstractmethod
+    async def publish(self, changes: list[DeviceChange]) -> None:
+        ...
+
+
+class LocalEventBus(EventBus):
+    """
+    In-process bus: changes are delivered straight to this worker's handler.
+    Suitable for a single worker and for tests.
+    """
+
+    async def publish(self, changes: list[DeviceChange]) -> None:
+        if changes:
+            self._handler(changes)
+
+
+def encode_payloads(changes: list[DeviceChange]) -> list[str]:
+    """
+    Encodes changes as compact JSON arrays split into NOTIFY-sized payloads.
+    """
+    payloads = []
+    parts: list[str] = []
+    size = 2
+    for change in changes:
+        part = json.dumps([change.device_id, change.change_type, change.device_type, change.status])
+        if parts and size + len(part) + 1 > _MAX_PAYLOAD_SIZE:
+            payloads.append("[" + ",".join(parts) + "]")
+            parts, size = [], 2
+        parts.append(part)
+        size += len(part) + 1
+    if parts:
+        payloads.append("[" + ",".join(parts) + "]")
+    return payloads
+
+
+def decode_payload(payload: str) -> list[DeviceChange]:
+    return [DeviceChange(*fields) for fields in json.loads(payload)]
+
+
+class PostgresEventBus(EventBus):
+    """
+    Bus built on Postgres LISTEN/NOTIFY. Each worker holds one connection from
+    the engine pool that LISTENs on the channel and fans changes out locally.
+    """
+
+    def __init__(self, handler: ChangeHandler, channel: str, reconnect_delay: float):
+        super().__init__(handler)
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self._connection: AsyncConnection | None = None
+        self._reconnect_task: asyncio.Task | None = None
+        self._stopping = False
+
+    async def start(self) -> None:
+        self._stopping = False
+        self._connection = await sessionmanager._engine.connect()
+        raw_connection = await self._connection.get_raw_connection()
+        driver_connection = raw_connection.driver_connection
+        assert driver_connection is not None
+        await driver_connection.add_listener(self.channel, self._on_notification)
+        driver_connection.add_termination_listener(self._on_termination)
+        logger.info("Listening for device changes on channel '%s'.", self.channel)
+
+    async def stop(self) -> None:
+        self._stopping = True
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
+        if self._connection is not None:
+            try:
+                await self._connection.close()
+            except Exception as e:
+                logger.warning("Failed to close event bus connection: %s", e)
+            self._connection = None
+
+    async def publish(self, changes: list[DeviceChange]) -> None:
+        payloads = encode_payloads(changes)
+        if not payloads:
+            return
+        async with sessionmanager.connect() as connection:
+            for payload in payloads:
+                await connection.execute(
+                    text("SELECT pg_notify(:channel, :payload)"),
+                    {"channel": self.channel, "payload": payload}
+                )
+
+    def _on_notification(self, connection, pid: int, channel: str, payload: str) -> None:
+        try:
+            changes = decode_payload(payload)
+        except (ValueError, TypeError) as e:
+            logger.error("Discarding malformed device change payload: %s", e)
+            return
+        self._handler(changes)
+
+    def _on_termination(self, connection) -> None:
+        if not self._stopping and self._reconnect_task is None:
+            logger.warning("Event bus connection lost, reconnecting.")
+            self._reconnect_task = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        while not self._stopping:
+            await asyncio.sleep(self.reconnect_delay)
+            try:
+                if self._connection is not None:
+                    await self._connection.invalidate()
+                await self.start()
+                break
+            except Exception as e:
+                logger.error("Event bus reconnect failed: %s", e)
+        self._reconnect_task = None
+
+
+def create_event_bus(handler: ChangeHandler) -> EventBus:
+    match event_bus_settings.event_bus_backend:
+        case "local":
+            return LocalEventBus(handler)
+        case "postgres":
+            return PostgresEventBus(
+                handler,
+                channel=event_bus_settings.event_bus_channel,
+                reconnect_delay=event_bus_settings.event_bus_reconnect_delay,
+            )
+        case backend:
+            raise ValueError(f"Unknown event bus backend: {backend}")
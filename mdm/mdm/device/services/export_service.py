@@ -0,0 +1,211 @@
+import asyncio
+import io
+from typing import AsyncIterator
+
+from fastapi import HTTPException, status
+from sqlalchemy import func, select
+
+from mdm.database.database import read_admission, sessionmanager
+from mdm.device.models.device_request import ExportFormat
+from mdm.logging_config import logger
+from mdm.settings import device_settings
+
+try:
+    import pyarrow
+    import pyarrow.csv
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover - pyarrow is optional
+    pyarrow = None
+
+EXPORT_COLUMNS = ("id", "device_name", "device_type", "status", "created_at", "last_seen_at", "updated_at")
+_TIMESTAMP_COLUMNS = ("created_at", "last_seen_at", "updated_at")
+
+EXPORT_MEDIA_TYPES = {
+    ExportFormat.csv: "text/csv",
+    ExportFormat.arrow: "application/vnd.apache.arrow.stream",
+    ExportFormat.parquet: "application/vnd.apache.parquet",
+}
+
+# Timestamps leave the database as epoch microseconds, so the columnar
+# conversion does not depend on the session time zone or text formatting.
+_COLUMNAR_QUERY = "SELECT id, device_name, device_type, status, {} FROM device".format(
+    ", ".join(f"(extract(epoch FROM {name}) * 1000000)::bigint AS {name}" for name in _TIMESTAMP_COLUMNS)
+)
+
+
+def ensure_export_format(export_format: ExportFormat) -> None:
+    """
+    Raises HTTP 400 for a columnar format when pyarrow is not installed, so the
+    error is reported before a streaming response starts.
+    """
+    if export_format != ExportFormat.csv and pyarrow is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{export_format} export requires pyarrow to be installed."
+        )
+
+
+async def _copy_csv(query: str | None, header: bool) -> AsyncIterator[bytes]:
+    """
+    Streams `COPY ... TO STDOUT (FORMAT csv)` output from the replica as it
+    arrives. A bounded queue sits between the copy and the consumer, so a slow
+    consumer throttles the copy instead of buffering the table in memory. The
+    copy holds a read admission slot until it ends and runs under
+    `devices_export_timeout_ms` instead of the pool-wide statement timeout.
+    """
+    chunks: asyncio.Queue[bytes | Exception | None] = asyncio.Queue(
+        maxsize=device_settings.devices_export_queue_size
+    )
+
+    async def copy() -> None:
+        try:
+            async with read_admission.slot(), sessionmanager.read_session() as session:
+                # Transaction-local, so the pooled connection gets its
+                # usual timeout back afterwards.
+                await session.execute(select(func.set_config(
+                    "statement_timeout", str(device_settings.devices_export_timeout_ms), True
+                )))
+                connection = await session.connection()
+                raw_connection = await connection.get_raw_connection()
+                driver_connection = raw_connection.driver_connection
+                assert driver_connection is not None
+                if query is None:
+                    await driver_connection.copy_from_table(
+                        "device", columns=EXPORT_COLUMNS, output=chunks.put, format="csv", header=header
+                    )
+                else:
+                    await driver_connection.copy_from_query(query, output=chunks.put, format="csv", header=header)
+        except Exception as e:
+            # Handed to the consumer, which is still reading; a cancelled copy
+            # has no consumer left and must not block on the queue.
+            await chunks.put(e)
+            return
+        await chunks.put(None)
+
+    task = asyncio.create_task(copy())
+    try:
+        while (chunk := await chunks.get()) is not None:
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+    finally:
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+
+def complete_rows(buffer: bytes | bytearray) -> int:
+    """
+    Returns the length of the longest prefix of `buffer` that ends at a CSV row
+    boundary: a newline preceded by an even number of quote characters.
+    Quoted fields may contain newlines, and escaped quotes come in pairs.
+    """
+    end = buffer.rfind(b"\n")
+    while end != -1:
+        if buffer.count(b'"', 0, end) % 2 == 0:
+            return end + 1
+        end = buffer.rfind(b"\n", 0, end)
+    return 0
+
+
+class _DrainableSink(io.RawIOBase):
+    """
+    Write-only file that keeps what was written until drained, so an Arrow or
+    Parquet writer can emit its output piece by piece.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: list[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class _ColumnarEncoder:
+    """
+    Converts CSV rows to Arrow record batches with pyarrow's vectorized CSV
+    parser and writes them as an Arrow IPC stream or as Parquet row groups.
+    """
+
+    def __init__(self, export_format: ExportFormat):
+        self.schema = pyarrow.schema([
+            ("id", pyarrow.int32()),
+            ("device_name", pyarrow.string()),
+            ("device_type", pyarrow.string()),
+            ("status", pyarrow.string()),
+            *((name, pyarrow.timestamp("us", tz="UTC")) for name in _TIMESTAMP_COLUMNS),
+        ])
+        self._read_options = pyarrow.csv.ReadOptions(column_names=list(EXPORT_COLUMNS))
+        self._convert_options = pyarrow.csv.ConvertOptions(column_types={
+            "id": pyarrow.int32(),
+            "device_name": pyarrow.string(),
+            "device_type": pyarrow.string(),
+            "status": pyarrow.string(),
+            **{name: pyarrow.int64() for name in _TIMESTAMP_COLUMNS},
+        })
+        self.rows_total = 0
+        self._sink = _DrainableSink()
+        if export_format == ExportFormat.parquet:
+            self._writer = pyarrow.parquet.ParquetWriter(pyarrow.PythonFile(self._sink, mode="w"), self.schema)
+        else:
+            self._writer = pyarrow.ipc.new_stream(pyarrow.PythonFile(self._sink, mode="w"), self.schema)
+
+    def encode(self, rows: bytes) -> bytes:
+        table = pyarrow.csv.read_csv(
+            pyarrow.BufferReader(rows), read_options=self._read_options, convert_options=self._convert_options
+        )
+        table = pyarrow.table(
+            [table[name].cast(self.schema.field(name).type) for name in EXPORT_COLUMNS], schema=self.schema
+        )
+        self._writer.write_table(table)
+        self.rows_total += table.num_rows
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        self._writer.close()
+        return self._sink.drain()
+
+
+async def export_devices(export_format: ExportFormat) -> AsyncIterator[bytes]:
+    """
+    Streams a snapshot of the device table. CSV is passed through from the
+    database unchanged; Arrow and Parquet are built in record batches of about
+    `devices_export_batch_bytes` of CSV input each, parsed off the event loop.
+    Memory use is bounded by the batch size, not by the number of devices.
+    """
+    if export_format == ExportFormat.csv:
+        async for chunk in _copy_csv(None, header=True):
+            yield chunk
+        return
+
+    encoder = _ColumnarEncoder(export_format)
+    buffer = bytearray()
+    async for chunk in _copy_csv(_COLUMNAR_QUERY, header=False):
+        buffer += chunk
+        if len(buffer) < device_settings.devices_export_batch_bytes:
+            continue
+        cut = complete_rows(buffer)
+        if cut:
+            rows = bytes(buffer[:cut])
+            del buffer[:cut]
+            yield await asyncio.to_thread(encoder.encode, rows)
+    if buffer:
+        yield await asyncio.to_thread(encoder.encode, bytes(buffer))
+    yield encoder.close()
+    logger.info("Exported %d devices as %s.", encoder.rows_total, export_format)
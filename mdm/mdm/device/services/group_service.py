@@ -0,0 +1,143 @@
+from typing import Sequence
+
+from fastapi import HTTPException, status
+from sqlalchemy import (
+    ColumnElement,
+    Integer,
+    any_,
+    bindparam,
+    cast,
+    delete,
+    select,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from mdm.device.schemas import Device, DeviceGroup, DeviceGroupMember
+from mdm.logging_config import logger
+
+
+def device_in_group(group_name: str) -> ColumnElement[bool]:
+    """
+    Condition on Device matching the members of the named group. The members
+    are read from the (group_id, device_id) primary key in device id order.
+    """
+    group_id = select(DeviceGroup.id).where(DeviceGroup.name == group_name).scalar_subquery()
+    return Device.id.in_(select(DeviceGroupMember.device_id).where(DeviceGroupMember.group_id == group_id))
+
+
+def _device_ids_param(device_ids: list[int]):
+    # One array parameter instead of one parameter per id.
+    return any_(bindparam("device_ids", device_ids, type_=ARRAY(Integer)))
+
+
+async def get_groups(db_session: AsyncSession) -> Sequence[DeviceGroup]:
+    result = await db_session.execute(select(DeviceGroup).order_by(DeviceGroup.name))
+    return result.scalars().all()
+
+
+async def get_group_version(db_session: AsyncSession, group_name: str) -> tuple[int, int] | None:
+    """
+    Returns the (id, version) pair of the named group. A group that is deleted
+    and created again starts over at version 1 but gets a new id, so the pair
+    never repeats.
+    """
+    row = (await db_session.execute(
+        select(DeviceGroup.id, DeviceGroup.version).where(DeviceGroup.name == group_name)
+    )).first()
+    return None if row is None else (row.id, row.version)
+
+
+async def create_group(db_session: AsyncSession, group_name: str) -> DeviceGroup:
+    """
+    Creates an empty group. Raises HTTP 409 when the name is already taken.
+    """
+    group = DeviceGroup(name=group_name)
+    db_session.add(group)
+    try:
+        await db_session.flush()
+        await db_session.refresh(group)
+        await db_session.commit()
+    except IntegrityError:
+        await db_session.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Group '{group_name}' already exists."
+        )
+    logger.info("Group '%s' created.", group_name)
+    return group
+
+
+async def delete_group(db_session: AsyncSession, group_name: str) -> bool:
+    """
+    Deletes a group and, by cascade, its memberships. The devices are kept.
+    Returns False when no group has the given name.
+    """
+    result = await db_session.execute(
+        delete(DeviceGroup).where(DeviceGroup.name == group_name).returning(DeviceGroup.id)
+    )
+    deleted = result.first() is not None
+    await db_session.commit()
+    return deleted
+
+
+async def _bump_group(db_session: AsyncSession, group_name: str) -> int | None:
+    # Bumping the version first also locks the group row, so concurrent
+    # membership changes of one group apply one after the other.
+    return await db_session.scalar(
+        update(DeviceGroup)
+        .where(DeviceGroup.name == group_name)
+        .values(version=DeviceGroup.version + 1)
+        .returning(DeviceGroup.id)
+    )
+
+
+async def add_group_members(db_session: AsyncSession, group_name: str, device_ids: list[int]) -> list[int] | None:
+    """
+    Adds the given devices to a group with one INSERT ... SELECT. Unknown
+    devices and existing members are skipped. Returns the ids of the devices
+    that were added, or None when no group has the given name.
+    """
+    group_id = await _bump_group(db_session, group_name)
+    if group_id is None:
+        await db_session.commit()
+        return None
+
+    # Parameters in a SELECT list are typed as text unless cast.
+    targets = select(cast(bindparam("group_id", group_id), Integer), Device.id).where(
+        Device.id == _device_ids_param(device_ids)
+    )
+    statement = (
+        insert(DeviceGroupMember)
+        .from_select(["group_id", "device_id"], targets)
+        .on_conflict_do_nothing()
+        .returning(DeviceGroupMember.device_id)
+    )
+    result = await db_session.execute(statement)
+    added = sorted(result.scalars().all())
+    await db_session.commit()
+    logger.info("Added %d devices to group '%s'.", len(added), group_name)
+    return added
+
+
+async def remove_group_members(db_session: AsyncSession, group_name: str, device_ids: list[int]) -> list[int] | None:
+    """
+    Removes the given devices from a group. Returns the ids of the devices
+    that were removed, or None when no group has the given name.
+    """
+    group_id = await _bump_group(db_session, group_name)
+    if group_id is None:
+        await db_session.commit()
+        return None
+
+    result = await db_session.execute(
+        delete(DeviceGroupMember)
+        .where(DeviceGroupMember.group_id == group_id, DeviceGroupMember.device_id == _device_ids_param(device_ids))
+        .returning(DeviceGroupMember.device_id)
+    )
+    removed = sorted(result.scalars().all())
+    await db_session.commit()
+    logger.info("Removed %d devices from group '%s'.", len(removed), group_name)
+    return removed
@@ -0,0 +1,212 @@
+import asyncio
+import datetime
+import time
+
+from sqlalchemy import DateTime, Integer, bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from mdm.database.database import sessionmanager
+from mdm.device.schemas.device import Status
+from mdm.device.services.subscriptions import DeviceChange
+from mdm.device.services.websockets_service import notify_devices_change
+from mdm.logging_config import logger
+from mdm.metrics import Histogram, registry
+from mdm.settings import device_settings
+
+# One set-based statement per flush: ids and timestamps are sent as two arrays
+# and joined back to the device table, so the cost is a single round-trip
+# regardless of how many devices checked in. Offline devices that check in are
+# active again; the status change goes through the change log like any other,
+# and only those devices are returned, read from the pre-update row joined as
+# `previous`.
+_FLUSH_STATEMENT = text(
+    """
+    WITH flushed AS (
+        UPDATE device
+        SET last_seen_at = beats.seen_at,
+            status = CASE WHEN device.status = 'offline' THEN 'active'::status ELSE device.status END
+        FROM unnest(CAST(:device_ids AS INTEGER[]), CAST(:seen_at AS TIMESTAMPTZ[]))
+            AS beats(id, seen_at)
+        JOIN device AS previous ON previous.id = beats.id
+        WHERE device.id = beats.id
+          AND (device.last_seen_at IS NULL OR device.last_seen_at < beats.seen_at)
+        RETURNING device.id, device.device_type, previous.status AS previous_status
+    )
+    SELECT id, device_type FROM flushed WHERE previous_status = 'offline'
+    """
+).bindparams(
+    bindparam("device_ids", type_=ARRAY(Integer)),
+    bindparam("seen_at", type_=ARRAY(DateTime(timezone=True))),
+)
+
+heartbeat_flush_duration = registry.register(Histogram(
+    "mdm_heartbeat_flush_duration_seconds",
+    "Time taken to write one heartbeat flush window.",
+))
+
+
+class HeartbeatBuffer:
+    """
+    Collects device check-ins in memory and writes them to `device.last_seen_at`
+    on a short interval. Repeated check-ins from the same device within one
+    flush window are coalesced into the latest timestamp. After a failed
+    flush the next attempt waits `flush_interval`, doubling on every further
+    failure up to `max_retry_delay`, even when the buffer is full.
+    """
+
+    def __init__(self, flush_interval: float, max_buffer_size: int, max_retry_delay: float | None = None):
+        self.flush_interval = flush_interval
+        self.max_buffer_size = max_buffer_size
+        self.max_retry_delay = max(flush_interval, max_retry_delay or flush_interval)
+        self._consecutive_failures = 0
+        self._pending: dict[int, datetime.datetime] = {}
+        self._flush_requested = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+        self.received_total = 0
+        self.coalesced_total = 0
+        self.flushed_total = 0
+        self.flush_failures_total = 0
+        self.last_flush_duration = 0.0
+        self.last_flush_size = 0
+
+    @property
+    def depth(self) -> int:
+        return len(self._pending)
+
+    def record(self, device_id: int, seen_at: datetime.datetime | None = None) -> None:
+        """
+        Buffers a check-in. This never touches the database.
+        """
+        seen_at = seen_at or datetime.datetime.now(datetime.timezone.utc)
+        self.received_total += 1
+
+        previous = self._pending.get(device_id)
+        if previous is not None:
+            self.coalesced_total += 1
+            if previous >= seen_at:
+                return
+        self._pending[device_id] = seen_at
+
+        if len(self._pending) >= self.max_buffer_size:
+            self._flush_requested.set()
+
+    async def flush(self) -> int:
+        """
+        Writes all buffered check-ins with one UPDATE and returns how many
+        devices were in the flushed window. Devices that came back online are
+        published as changes once the flush has committed.
+        """
+        if not self._pending:
+            return 0
+
+        pending, self._pending = self._pending, {}
+        # Sorting keeps row lock order stable across concurrent flushes.
+        device_ids = sorted(pending)
+        started = time.perf_counter()
+        try:
+            async with sessionmanager.connect() as connection:
+                reactivated = (await connection.execute(
+                    _FLUSH_STATEMENT,
+                    {"device_ids": device_ids, "seen_at": [pending[device_id] for device_id in device_ids]}
+                )).all()
+        except Exception:
+            self.flush_failures_total += 1
+            # Put the window back unless a newer check-in arrived meanwhile.
+            for device_id, seen_at in pending.items():
+                self._pending.setdefault(device_id, seen_at)
+            raise
+        finally:
+            self.last_flush_duration = time.perf_counter() - started
+            heartbeat_flush_duration.observe(self.last_flush_duration)
+
+        self.last_flush_size = len(device_ids)
+        self.flushed_total += len(device_ids)
+        if reactivated:
+            logger.info("Marked %d devices active.", len(reactivated))
+            await notify_devices_change([
+                DeviceChange(device_id=row.id, change_type="updated", device_type=row.device_type, status=Status.active)
+                for row in reactivated
+            ])
+        return len(device_ids)
+
+    def retry_delay(self) -> float:
+        """
+        Seconds to wait before the next flush attempt; 0 while flushes succeed.
+        """
+        if not self._consecutive_failures:
+            return 0.0
+        return min(self.flush_interval * 2 ** (self._consecutive_failures - 1), self.max_retry_delay)
+
+    async def run(self) -> None:
+        while True:
+            retry_delay = self.retry_delay()
+            if retry_delay:
+                # A full buffer keeps requesting flushes; don't hammer a failing database.
+                await asyncio.sleep(retry_delay)
+            else:
+                try:
+                    await asyncio.wait_for(self._flush_requested.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._flush_requested.clear()
+
+            try:
+                await self.flush()
+            except Exception as e:
+                self._consecutive_failures += 1
+                logger.error(
+                    "Failed to flush %d heartbeats, retrying in %.1fs: %s", self.depth, self.retry_delay(), e
+                )
+            else:
+                self._consecutive_failures = 0
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error("Failed to flush heartbeats on shutdown: %s", e)
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "buffer_depth": self.depth,
+            "received_total": self.received_total,
+            "coalesced_total": self.coalesced_total,
+            "flushed_total": self.flushed_total,
+            "flush_failures_total": self.flush_failures_total,
+            "last_flush_size": self.last_flush_size,
+            "last_flush_duration_seconds": self.last_flush_duration,
+        }
+
+
+heartbeat_buffer = HeartbeatBuffer(
+    flush_interval=device_settings.heartbeat_flush_interval,
+    max_buffer_size=device_settings.heartbeat_max_buffer_size,
+    max_retry_delay=device_settings.heartbeat_max_retry_delay,
+)
+
+registry.callback("mdm_heartbeat_buffer_depth", "Devices waiting in the heartbeat buffer.", lambda: heartbeat_buffer.depth)
+registry.callback(
+    "mdm_heartbeats_received_total",
+    "Heartbeats received.",
+    lambda: heartbeat_buffer.received_total,
+    type_name="counter",
+)
+registry.callback(
+    "mdm_heartbeats_coalesced_total",
+    "Heartbeats merged into an already buffered check-in.",
+    lambda: heartbeat_buffer.coalesced_total,
+    type_name="counter",
+)
@@ -0,0 +1,238 @@
+import csv
+import io
+import json
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Sequence
+
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import Row, text
+
+from mdm.database.database import db_admission, sessionmanager
+from mdm.device.models.device_request import (
+    DeviceImportRowModel,
+    ImportDevicesResponseModel,
+    ImportFormat,
+    ImportRejectModel,
+)
+from mdm.device.services.export_service import complete_rows
+from mdm.device.services.subscriptions import DeviceChange
+from mdm.device.services.websockets_service import notify_devices_change
+from mdm.logging_config import logger
+from mdm.settings import device_settings
+
+ImportProgress = Callable[[ImportDevicesResponseModel], None]
+
+IMPORT_COLUMNS = ("row_number", "external_id", "device_name", "device_type", "status")
+
+# Dropped at the end of each batch transaction, so a pooled connection never
+# carries it over to another import.
+_CREATE_STAGING_TABLE = text(
+    "CREATE TEMP TABLE device_import ("
+    "row_number integer, external_id text, device_name text, device_type devicetype, status status"
+    ") ON COMMIT DROP"
+)
+
+# The last row wins when a batch repeats an external id; ON CONFLICT cannot
+# touch the same device twice in one statement. Rows matching the stored
+# device are skipped, so they neither bump its version nor log a change.
+_MERGE_STAGING_TABLE = text("""
+    INSERT INTO device (external_id, device_name, device_type, status)
+    SELECT DISTINCT ON (external_id) external_id, device_name, device_type, status
+    FROM device_import
+    ORDER BY external_id, row_number DESC
+    ON CONFLICT (external_id) DO UPDATE
+    SET device_name = EXCLUDED.device_name, device_type = EXCLUDED.device_type, status = EXCLUDED.status
+    WHERE (device.device_name, device.device_type, device.status)
+        IS DISTINCT FROM (EXCLUDED.device_name, EXCLUDED.device_type, EXCLUDED.status)
+    RETURNING id, device_type, status, xmax = 0 AS inserted
+""")
+
+_row_batch_adapter = TypeAdapter(list[DeviceImportRowModel])
+
+
+def _is_valid_utf8(values: list[str]) -> bool:
+    try:
+        "".join(values).encode("utf-8")
+    except UnicodeEncodeError:
+        return False
+    return True
+
+
+async def _csv_rows(chunks: AsyncIterable[bytes]) -> AsyncIterator[tuple[int, Any]]:
+    """
+    Yields (row number, row) pairs from a CSV stream with a header line. The
+    stream is cut at row boundaries, so quoted fields may span chunks. Rows
+    that are not valid UTF-8 are reported instead of failing the import.
+    """
+    buffer = bytearray()
+    header: list[str] | None = None
+    row_number = 0
+
+    def parse(data: bytes):
+        nonlocal header, row_number
+        # Undecodable bytes become lone surrogates, caught per row below.
+        text = data.decode("utf-8-sig" if header is None else "utf-8", errors="surrogateescape")
+        for values in csv.reader(io.StringIO(text)):
+            if not values:
+                continue
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            row_number += 1
+            if not _is_valid_utf8(values):
+                yield row_number, "Row is not valid UTF-8."
+            elif len(values) != len(header):
+                yield row_number, f"Expected {len(header)} fields, got {len(values)}."
+            else:
+                yield row_number, dict(zip(header, values))
+
+    async for chunk in chunks:
+        buffer += chunk
+        cut = complete_rows(buffer)
+        if cut:
+            data = bytes(buffer[:cut])
+            del buffer[:cut]
+            for row in parse(data):
+                yield row
+    if buffer:
+        for row in parse(bytes(buffer)):
+            yield row
+
+
+async def _ndjson_rows(chunks: AsyncIterable[bytes]) -> AsyncIterator[tuple[int, Any]]:
+    """
+    Yields (row number, row) pairs from a newline-delimited JSON stream. Blank
+    lines are skipped but counted.
+    """
+    buffer = bytearray()
+    row_number = 0
+
+    def parse(data: bytes):
+        nonlocal row_number
+        for line in data.split(b"\n"):
+            row_number += 1
+            if not line.strip():
+                continue
+            try:
+                yield row_number, json.loads(line)
+            except ValueError as e:
+                yield row_number, f"Invalid JSON: {e}"
+
+    async for chunk in chunks:
+        buffer += chunk
+        cut = buffer.rfind(b"\n")
+        if cut != -1:
+            data = bytes(buffer[:cut])
+            del buffer[:cut + 1]
+            for row in parse(data):
+                yield row
+    if buffer:
+        for row in parse(bytes(buffer)):
+            yield row
+
+
+def validate_rows(rows: list[tuple[int, Any]]) -> tuple[list[tuple], list[ImportRejectModel]]:
+    """
+    Validates a batch of parsed rows against DeviceImportRowModel in one pass
+    and returns the staging records of the valid rows and a reject per invalid
+    row. Rows that could not be parsed arrive as an error string.
+    """
+    rejects = [ImportRejectModel(row=row_number, error=row) for row_number, row in rows if isinstance(row, str)]
+    rows = [(row_number, row) for row_number, row in rows if not isinstance(row, str)]
+    try:
+        devices = _row_batch_adapter.validate_python([row for _, row in rows])
+    except ValidationError as e:
+        errors: dict[int, list[str]] = {}
+        for error in e.errors(include_url=False):
+            index, *field = error["loc"]
+            errors.setdefault(int(index), []).append(f"{'.'.join(map(str, field)) or 'row'}: {error['msg']}")
+        rejects.extend(ImportRejectModel(row=rows[index][0], error="; ".join(messages)) for index, messages in errors.items())
+        rows = [row for index, row in enumerate(rows) if index not in errors]
+        devices = _row_batch_adapter.validate_python([row for _, row in rows])
+
+    rejects.sort(key=lambda reject: reject.row)
+    records = [
+        (row_number, device.external_id, device.device_name, device.device_type.value, device.status.value)
+        for (row_number, _), device in zip(rows, devices)
+    ]
+    return records, rejects
+
+
+async def _merge_batch(records: list[tuple]) -> Sequence[Row[Any]]:
+    """
+    Loads one batch into a temporary staging table with binary COPY and
+    merges it into `device` with a single INSERT ... ON CONFLICT statement,
+    all in one transaction, holding an admission slot like any request.
+    """
+    async with db_admission.slot(), sessionmanager.connect() as connection:
+        # The first statement goes through SQLAlchemy so the COPY below runs
+        # inside the transaction it opened.
+        await connection.execute(_CREATE_STAGING_TABLE)
+        raw_connection = await connection.get_raw_connection()
+        driver_connection = raw_connection.driver_connection
+        assert driver_connection is not None
+        await driver_connection.copy_records_to_table(
+            "device_import", records=records, columns=IMPORT_COLUMNS
+        )
+        result = await connection.execute(_MERGE_STAGING_TABLE)
+        return result.all()
+
+
+async def import_devices(
+        chunks: AsyncIterable[bytes],
+        import_format: ImportFormat,
+        on_progress: ImportProgress | None = None
+) -> ImportDevicesResponseModel:
+    """
+    Creates or updates devices from a CSV or NDJSON stream, matched on
+    `external_id`. Rows are validated and merged in batches of
+    `devices_import_batch_size`, each committed on its own, so memory use does
+    not depend on the size of the file. Within a batch the last row for an
+    external_id wins; the earlier ones are counted as duplicates. `on_progress` receives the running
+    totals after every batch. Each committed batch publishes one aggregated
+    change event.
+    """
+    summary = ImportDevicesResponseModel()
+    max_rejects = device_settings.devices_import_max_rejects
+
+    async def flush(batch: list[tuple[int, Any]]) -> None:
+        records, rejects = validate_rows(batch)
+        summary.received += len(batch)
+        summary.rejected += len(rejects)
+        summary.rejects.extend(rejects[:max(max_rejects - len(summary.rejects), 0)])
+        if records:
+            merged = await _merge_batch(records)
+            changes: list[DeviceChange] = []
+            last_created: DeviceChange | None = None
+            for row in merged:
+                if row.inserted:
+                    summary.created += 1
+                    last_created = DeviceChange(row.id, "created", row.device_type, row.status)
+                else:
+                    summary.updated += 1
+                    changes.append(DeviceChange(row.id, "updated", row.device_type, row.status))
+            distinct = len({record[1] for record in records})
+            summary.duplicates += len(records) - distinct
+            summary.unchanged += distinct - len(merged)
+            # Updated devices have to leave every worker's cache. Created
+            # devices are not cached anywhere and reach subscribers through
+            # the change log, so one of them is enough to wake the change feeds.
+            if last_created is not None:
+                changes.append(last_created)
+            await notify_devices_change(changes)
+        logger.info(
+            "Import progress: %d rows read, %d created, %d updated, %d rejected.",
+            summary.received, summary.created, summary.updated, summary.rejected
+        )
+        if on_progress is not None:
+            on_progress(summary)
+
+    rows = _csv_rows(chunks) if import_format == ImportFormat.csv else _ndjson_rows(chunks)
+    batch: list[tuple[int, Any]] = []
+    async for row in rows:
+        batch.append(row)
+        if len(batch) >= device_settings.devices_import_batch_size:
+            await flush(batch)
+            batch = []
+    if batch:
+        await flush(batch)
+    return summary
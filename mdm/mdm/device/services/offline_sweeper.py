@@ -0,0 +1,136 @@
+import asyncio
+import datetime
+import time
+
+from sqlalchemy import Update, func, select, update
+
+from mdm.database.database import sessionmanager
+from mdm.device.schemas import Device
+from mdm.device.schemas.device import Status
+from mdm.device.services.subscriptions import DeviceChange
+from mdm.device.services.websockets_service import notify_devices_change
+from mdm.logging_config import logger
+from mdm.metrics import Histogram, registry
+from mdm.settings import device_settings
+
+# Transaction-scoped advisory lock key, so only one worker per database sweeps
+# at a time; the others skip the round instead of queueing on row locks.
+_SWEEP_LOCK_KEY = 0x6D646D01
+
+offline_sweep_duration = registry.register(Histogram(
+    "mdm_offline_sweep_duration_seconds",
+    "Time taken by one offline detection sweep.",
+))
+
+
+def sweep_statement(cutoff: datetime.datetime) -> Update:
+    """
+    Marks every active device last seen before `cutoff` as offline. Served by
+    the (status, last_seen_at) index. Devices that never checked in are left alone.
+    """
+    return (
+        update(Device)
+        .where(Device.status == Status.active, Device.last_seen_at < cutoff)
+        .values(status=Status.offline)
+        .returning(Device.id, Device.device_type)
+        .execution_options(synchronize_session=False)
+    )
+
+
+class OfflineSweeper:
+    """
+    Periodically moves devices that stopped sending heartbeats to `offline`
+    with one set-based UPDATE per sweep.
+    """
+
+    def __init__(self, interval: float, offline_after: float):
+        self.interval = interval
+        self.offline_after = offline_after
+        self._task: asyncio.Task | None = None
+
+        self.sweeps_total = 0
+        self.skipped_total = 0
+        self.transitioned_total = 0
+        self.failures_total = 0
+        self.last_sweep_size = 0
+        self.last_sweep_duration = 0.0
+
+    async def sweep(self) -> int:
+        """
+        Runs one sweep and returns how many devices went offline. Returns 0
+        without touching any device when another worker is sweeping.
+        """
+        cutoff = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=self.offline_after)
+        started = time.perf_counter()
+        try:
+            async with sessionmanager.connect() as connection:
+                locked = await connection.scalar(select(func.pg_try_advisory_xact_lock(_SWEEP_LOCK_KEY)))
+                if not locked:
+                    self.skipped_total += 1
+                    return 0
+                rows = (await connection.execute(sweep_statement(cutoff))).all()
+        finally:
+            self.last_sweep_duration = time.perf_counter() - started
+            offline_sweep_duration.observe(self.last_sweep_duration)
+
+        self.sweeps_total += 1
+        self.last_sweep_size = len(rows)
+        self.transitioned_total += len(rows)
+        if rows:
+            logger.info("Marked %d devices offline.", len(rows))
+            await notify_devices_change([
+                DeviceChange(
+                    device_id=row.id,
+                    change_type="updated",
+                    device_type=row.device_type,
+                    status=Status.offline
+                )
+                for row in rows
+            ])
+        return len(rows)
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                self.failures_total += 1
+                logger.error("Offline sweep failed: %s", e)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+offline_sweeper = OfflineSweeper(
+    interval=device_settings.offline_sweep_interval,
+    offline_after=device_settings.offline_after,
+)
+
+registry.callback(
+    "mdm_offline_sweep_transitions_total",
+    "Devices moved to offline by the sweeper.",
+    lambda: offline_sweeper.transitioned_total,
+    type_name="counter",
+)
+registry.callback(
+    "mdm_offline_sweep_failures_total",
+    "Offline sweeps that raised an error.",
+    lambda: offline_sweeper.failures_total,
+    type_name="counter",
+)
+registry.callback(
+    "mdm_offline_sweep_last_size",
+    "Devices moved to offline by the most recent sweep.",
+    lambda: offline_sweeper.last_sweep_size,
+)
@@ -0,0 +1,73 @@
+import base64
+import binascii
+import json
+from typing import Any
+
+from fastapi import HTTPException, status
+
+
+def encode_cursor(payload: dict[str, Any]) -> str:
+    """
+    Encodes a keyset position into an opaque, URL-safe cursor string.
+    """
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict[str, Any]:
+    """
+    Decodes a cursor produced by encode_cursor. Raises HTTP 400 when the cursor
+    was tampered with or does not come from this API.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, ValueError):
+        payload = None
+
+    if not isinstance(payload, dict):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor."
+        )
+    return payload
+
+
+def decode_id_cursor(cursor: str | None) -> int | None:
+    """
+    Returns the last seen device id stored in a keyset cursor, if any.
+    """
+    if not cursor:
+        return None
+    after_id = decode_cursor(cursor).get("id")
+    if not isinstance(after_id, int):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor."
+        )
+    return after_id
+
+
+def decode_search_cursor(cursor: str | None, mode: str) -> tuple[str | float, int] | None:
+    """
+    Returns the last seen (rank, device id) pair stored in a search cursor, if
+    any. The rank is the lowercased name for prefix searches and the
+    similarity score otherwise, so a cursor is only valid for the search mode
+    it was issued for.
+    """
+    if not cursor:
+        return None
+    payload = decode_cursor(cursor)
+    rank, after_id = payload.get("rank"), payload.get("id")
+    rank_type = str if mode == "prefix" else (int, float)
+    if (
+        payload.get("mode") != mode
+        or not isinstance(rank, rank_type)
+        or isinstance(rank, bool)
+        or not isinstance(after_id, int)
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor."
+        )
+    return rank, after_id
@@ -0,0 +1,116 @@
+import json
+from dataclasses import asdict, dataclass
+from functools import cached_property
+from typing import Iterator
+
+
+@dataclass(frozen=True)
+class DeviceChange:
+    device_id: int
+    change_type: str
+    device_type: str | None = None
+    status: str | None = None
+    # Position in the change log; set for changes delivered from the log.
+    seq: int | None = None
+
+    @cached_property
+    def json(self) -> str:
+        # Serialized once per change no matter how many subscribers receive it.
+        return json.dumps(asdict(self))
+
+
+@dataclass(frozen=True)
+class SubscriptionFilter:
+    """
+    What a client wants to receive. A dimension left as None matches any value;
+    `batch_ms` > 0 asks for one frame per interval instead of one per change.
+    """
+    device_ids: frozenset[int] | None = None
+    device_types: frozenset[str] | None = None
+    statuses: frozenset[str] | None = None
+    change_types: frozenset[str] | None = None
+    batch_ms: int = 0
+
+    def matches(self, change: DeviceChange) -> bool:
+        return (
+            (self.device_ids is None or change.device_id in self.device_ids)
+            and (self.device_types is None or change.device_type in self.device_types)
+            and (self.statuses is None or change.status in self.statuses)
+            and (self.change_types is None or change.change_type in self.change_types)
+        )
+
+
+MATCH_ALL = SubscriptionFilter()
+
+
+class SubscriptionGroup:
+    """
+    All clients sharing an identical filter. Frames are built once per group
+    and then queued to each member.
+    """
+
+    def __init__(self, subscription_filter: SubscriptionFilter):
+        self.filter = subscription_filter
+        self.members: set = set()
+        # Changes waiting for the next micro-batch, latest change per device.
+        self.pending: dict[int, DeviceChange] = {}
+        self.flush_scheduled = False
+
+
+class SubscriptionIndex:
+    """
+    Groups subscribers by filter and indexes the groups by device id, so
+    matching a change only visits groups that can possibly accept it rather
+    than every connected client.
+    """
+
+    def __init__(self):
+        self._groups: dict[SubscriptionFilter, SubscriptionGroup] = {}
+        self._by_device: dict[int, set[SubscriptionGroup]] = {}
+        self._any_device: set[SubscriptionGroup] = set()
+
+    def __len__(self) -> int:
+        return len(self._groups)
+
+    def add(self, client, subscription_filter: SubscriptionFilter) -> SubscriptionGroup:
+        group = self._groups.get(subscription_filter)
+        if group is None:
+            group = self._groups[subscription_filter] = SubscriptionGroup(subscription_filter)
+            if subscription_filter.device_ids is None:
+                self._any_device.add(group)
+            else:
+                for device_id in subscription_filter.device_ids:
+                    self._by_device.setdefault(device_id, set()).add(group)
+        group.members.add(client)
+        return group
+
+    def remove(self, client, group: SubscriptionGroup) -> None:
+        group.members.discard(client)
+        if group.members or self._groups.get(group.filter) is not group:
+            return
+
+        del self._groups[group.filter]
+        if group.filter.device_ids is None:
+            self._any_device.discard(group)
+        else:
+            for device_id in group.filter.device_ids:
+                groups = self._by_device.get(device_id)
+                if groups is not None:
+                    groups.discard(group)
+                    if not groups:
+                        del self._by_device[device_id]
+
+    def match(self, change: DeviceChange) -> Iterator[SubscriptionGroup]:
+        for group in self._by_device.get(change.device_id, ()):
+            if group.filter.matches(change):
+                yield group
+        for group in self._any_device:
+            if group.filter.matches(change):
+                yield group
+
+
+def encode_changes(changes: list[DeviceChange]) -> str:
+    """
+    Encodes a list of changes as one frame: `{"changes": [...]}`.
+    """
+    return '{"changes":[' + ",".join(change.json for change in changes) + "]}"
@@ -1,51 +1,504 @@
 
+import asyncio
 import json
+import time
+from collections import Counter, deque
+from enum import StrEnum
 
-from fastapi import WebSocket, WebSocketDisconnect
+from fastapi import (
+    HTTPException,
+    WebSocket,
+    WebSocketDisconnect,
+    WebSocketException,
+    status,
+)
+from pydantic import ValidationError
+
+from mdm.database.database import sessionmanager
+from mdm.device.models.device_request import WebSocketSubscribeModel
+from mdm.device.services.cache_service import device_cache
+from mdm.device.services.change_feed import (
+    LogPosition,
+    create_change_feed,
+    read_changes,
+    resolve_since,
+    to_device_change,
+)
+from mdm.device.services.event_bus import create_event_bus
+from mdm.device.services.subscriptions import (
+    MATCH_ALL,
+    DeviceChange,
+    SubscriptionFilter,
+    SubscriptionGroup,
+    SubscriptionIndex,
+    encode_changes,
+)
+from mdm.logging_config import logger
+from mdm.metrics import registry, websocket_send_latency
+from mdm.rate_limit import client_key
+from mdm.settings import websocket_settings
+
+
+class OverflowPolicy(StrEnum):
+    drop_oldest = "drop_oldest"
+    coalesce = "coalesce"
+    disconnect = "disconnect"
+
+
+class ClientConnection:
+    """
+    A connected WebSocket together with its bounded send queue. Messages are
+    written by a dedicated writer task, so a slow client only delays itself.
+    """
+
+    def __init__(self, websocket: WebSocket, max_queue_size: int, overflow_policy: OverflowPolicy):
+        self.websocket = websocket
+        self.max_queue_size = max_queue_size
+        self.overflow_policy = overflow_policy
+        # Each entry is (coalescing key, message, enqueue time).
+        self._queue: deque[tuple[int | None, str, float]] = deque()
+        self._ready = asyncio.Event()
+        self.writer: asyncio.Task | None = None
+        self.group: SubscriptionGroup | None = None
+        self.dropped = 0
+        # While a replay is being prepared, live messages wait here.
+        self.held: list[tuple[str, int | None]] | None = None
+        self.client_key: str | None = None
+
+    @property
+    def depth(self) -> int:
+        return len(self._queue)
+
+    def enqueue(self, message: str, key: int | None = None) -> bool:
+        """
+        Queues a message without waiting. Returns False when the queue is full
+        and the overflow policy asks for the client to be disconnected.
+        """
+        entry = (key, message, time.perf_counter())
+        if len(self._queue) >= self.max_queue_size:
+            if self.overflow_policy == OverflowPolicy.disconnect:
+                return False
+            if not (self.overflow_policy == OverflowPolicy.coalesce and self._replace(entry)):
+                self._queue.popleft()
+                self._queue.append(entry)
+            self.dropped += 1
+            return True
+
+        self._queue.append(entry)
+        self._ready.set()
+        return True
+
+    def _replace(self, entry: tuple[int | None, str, float]) -> bool:
+        key = entry[0]
+        if key is None:
+            return False
+        for index, (queued_key, _, _) in enumerate(self._queue):
+            if queued_key == key:
+                # The newer message about the same device supersedes the queued one.
+                del self._queue[index]
+                self._queue.append(entry)
+                return True
+        return False
+
+    async def next_message(self) -> tuple[str, float]:
+        while not self._queue:
+            self._ready.clear()
+            await self._ready.wait()
+        _, message, enqueued_at = self._queue.popleft()
+        return message, enqueued_at
+
+
+class WebSocketBroadcaster:
+    """
+    Fans messages out to connected clients through per-client queues.
+    Broadcasting never awaits a socket; clients whose sends fail or time out
+    are evicted by their writer task. Device changes are routed through a
+    SubscriptionIndex so each client only receives what it subscribed to.
+    """
+
+    def __init__(
+            self,
+            max_queue_size: int,
+            overflow_policy: OverflowPolicy,
+            send_timeout: float,
+            max_connections: int | None = None,
+            max_connections_per_client: int | None = None
+    ):
+        self.max_queue_size = max_queue_size
+        self.overflow_policy = overflow_policy
+        self.send_timeout = send_timeout
+        self.max_connections = max_connections
+        self.max_connections_per_client = max_connections_per_client
+        self._clients: dict[WebSocket, ClientConnection] = {}
+        self._connections_per_client: Counter[str] = Counter()
+        self._evictions: set[asyncio.Task] = set()
+        self._subscriptions = SubscriptionIndex()
+
+        self.messages_sent_total = 0
+        self.messages_dropped_total = 0
+        self.clients_evicted_total = 0
+        self.clients_rejected_total = 0
+        self.send_latency_seconds_total = 0.0
+        self.send_latency_seconds_max = 0.0
+
+    @property
+    def client_count(self) -> int:
+        return len(self._clients)
+
+    def _check_capacity(self, client_key: str | None) -> None:
+        if self.max_connections is not None and len(self._clients) >= self.max_connections:
+            self.clients_rejected_total += 1
+            raise WebSocketException(code=status.WS_1013_TRY_AGAIN_LATER, reason="Too many connections.")
+        if (
+                client_key is not None
+                and self.max_connections_per_client is not None
+                and self._connections_per_client[client_key] >= self.max_connections_per_client
+        ):
+            self.clients_rejected_total += 1
+            raise WebSocketException(
+                code=status.WS_1008_POLICY_VIOLATION, reason="Too many connections from this client."
+            )
+
+    async def connect(self, websocket: WebSocket, client_key: str | None = None) -> ClientConnection:
+        """
+        Accepts and registers a socket. Sockets over the global or per-client
+        connection cap are refused before the handshake completes.
+        """
+        self._check_capacity(client_key)
+        await websocket.accept()
+        client = ClientConnection(websocket, self.max_queue_size, self.overflow_policy)
+        client.client_key = client_key
+        if client_key is not None:
+            self._connections_per_client[client_key] += 1
+        self._clients[websocket] = client
+        client.group = self._subscriptions.add(client, MATCH_ALL)
+        client.writer = asyncio.create_task(self._write(client))
+        return client
+
+    def subscribe(self, websocket: WebSocket, subscription_filter: SubscriptionFilter, hold: bool = False) -> None:
+        """
+        Replaces the client's current subscription with the given filter. With
+        `hold`, messages for the client are kept back until `release`.
+        """
+        client = self._clients.get(websocket)
+        if client is None:
+            return
+        if client.group is not None:
+            self._subscriptions.remove(client, client.group)
+        client.group = self._subscriptions.add(client, subscription_filter)
+        if hold and client.held is None:
+            client.held = []
+
+    def release(self, websocket: WebSocket, messages: list[str]) -> None:
+        """
+        Queues `messages` for a held client, followed by everything kept back
+        since the hold started.
+        """
+        client = self._clients.get(websocket)
+        if client is None:
+            return
+        held, client.held = client.held or [], None
+        for message in messages:
+            self._enqueue(client, message, None)
+        for message, key in held:
+            self._enqueue(client, message, key)
+
+    def send(self, websocket: WebSocket, message: str) -> None:
+        """
+        Queues a message for a single client.
+        """
+        client = self._clients.get(websocket)
+        if client is not None:
+            self._enqueue(client, message, None)
+
+    async def disconnect(self, websocket: WebSocket) -> None:
+        client = self._clients.pop(websocket, None)
+        if client is None:
+            return
+        if client.client_key is not None:
+            self._connections_per_client[client.client_key] -= 1
+            if not self._connections_per_client[client.client_key]:
+                del self._connections_per_client[client.client_key]
+        if client.group is not None:
+            self._subscriptions.remove(client, client.group)
+        if client.writer is not None and client.writer is not asyncio.current_task():
+            client.writer.cancel()
+            await asyncio.gather(client.writer, return_exceptions=True)
+        self.messages_dropped_total += client.depth
+
+    async def _evict(self, client: ClientConnection, reason: str) -> None:
+        if client.websocket not in self._clients:
+            return
+        logger.info("Evicting WebSocket client: %s", reason)
+        self.clients_evicted_total += 1
+        await self.disconnect(client.websocket)
+        try:
+            await client.websocket.close(code=1013)
+        except Exception:
+            pass
+
+    async def _write(self, client: ClientConnection) -> None:
+        while True:
+            message, enqueued_at = await client.next_message()
+            try:
+                async with asyncio.timeout(self.send_timeout):
+                    await client.websocket.send_text(message)
+            except Exception as e:
+                await self._evict(client, f"send failed: {e!r}")
+                return
+
+            latency = time.perf_counter() - enqueued_at
+            websocket_send_latency.observe(latency)
+            self.messages_sent_total += 1
+            self.send_latency_seconds_total += latency
+            self.send_latency_seconds_max = max(self.send_latency_seconds_max, latency)
+
+    def _enqueue(self, client: ClientConnection, message: str, key: int | None) -> None:
+        if client.held is not None:
+            client.held.append((message, key))
+            return
+        dropped_before = client.dropped
+        if not client.enqueue(message, key):
+            self.messages_dropped_total += 1
+            eviction = asyncio.create_task(self._evict(client, "send queue overflow"))
+            self._evictions.add(eviction)
+            eviction.add_done_callback(self._evictions.discard)
+            return
+        self.messages_dropped_total += client.dropped - dropped_before
+
+    def broadcast(self, message: str, key: int | None = None) -> None:
+        """
+        Queues a message for every connected client and returns immediately.
+        """
+        for client in list(self._clients.values()):
+            self._enqueue(client, message, key)
+
+    def publish(self, changes: list[DeviceChange]) -> None:
+        """
+        Routes device changes to the subscription groups whose filter matches.
+        Immediate groups get one frame per publish call: a single change is sent
+        as-is, several changes as `{"changes": [...]}`. Micro-batched groups
+        collect the latest change per device and are flushed every `batch_ms`.
+        """
+        immediate: dict[SubscriptionGroup, list[DeviceChange]] = {}
+        for change in changes:
+            for group in self._subscriptions.match(change):
+                if group.filter.batch_ms:
+                    group.pending[change.device_id] = change
+                    self._schedule_flush(group)
+                else:
+                    immediate.setdefault(group, []).append(change)
+
+        for group, group_changes in immediate.items():
+            if len(group_changes) == 1:
+                self._send_to_group(group, group_changes[0].json, group_changes[0].device_id)
+            else:
+                self._send_to_group(group, encode_changes(group_changes), None)
+
+    def _send_to_group(self, group: SubscriptionGroup, message: str, key: int | None) -> None:
+        for client in list(group.members):
+            self._enqueue(client, message, key)
+
+    def _schedule_flush(self, group: SubscriptionGroup) -> None:
+        if group.flush_scheduled:
+            return
+        group.flush_scheduled = True
+        asyncio.get_running_loop().call_later(group.filter.batch_ms / 1000, self._flush_group, group)
+
+    def _flush_group(self, group: SubscriptionGroup) -> None:
+        group.flush_scheduled = False
+        pending, group.pending = group.pending, {}
+        if pending and group.members:
+            self._send_to_group(group, encode_changes(list(pending.values())), None)
+
+    def stats(self) -> dict[str, int | float]:
+        depths = [client.depth for client in self._clients.values()]
+        return {
+            "clients": len(depths),
+            "subscription_groups": len(self._subscriptions),
+            "queue_depth_total": sum(depths),
+            "queue_depth_max": max(depths, default=0),
+            "messages_sent_total": self.messages_sent_total,
+            "messages_dropped_total": self.messages_dropped_total,
+            "clients_evicted_total": self.clients_evicted_total,
+            "clients_rejected_total": self.clients_rejected_total,
+            "send_latency_seconds_total": self.send_latency_seconds_total,
+            "send_latency_seconds_max": self.send_latency_seconds_max,
+        }
+
+
+broadcaster = WebSocketBroadcaster(
+    max_queue_size=websocket_settings.websocket_queue_size,
+    overflow_policy=OverflowPolicy(websocket_settings.websocket_overflow_policy),
+    send_timeout=websocket_settings.websocket_send_timeout,
+    max_connections=websocket_settings.websocket_max_connections,
+    max_connections_per_client=websocket_settings.websocket_max_connections_per_client,
+)
+
+registry.callback("mdm_websocket_clients", "Connected WebSocket clients.", lambda: broadcaster.client_count)
+registry.callback(
+    "mdm_websocket_queue_depth",
+    "Messages waiting in all WebSocket send queues.",
+    lambda: sum(client.depth for client in broadcaster._clients.values()),
+)
+registry.callback(
+    "mdm_websocket_messages_sent_total",
+    "WebSocket messages written to sockets.",
+    lambda: broadcaster.messages_sent_total,
+    type_name="counter",
+)
+registry.callback(
+    "mdm_websocket_messages_dropped_total",
+    "WebSocket messages dropped by the overflow policy or on disconnect.",
+    lambda: broadcaster.messages_dropped_total,
+    type_name="counter",
+)
+registry.callback(
+    "mdm_websocket_clients_evicted_total",
+    "WebSocket clients disconnected because they were dead or too slow.",
+    lambda: broadcaster.clients_evicted_total,
+    type_name="counter",
+)
+
+
+def dispatch_changes(changes: list[DeviceChange]) -> None:
+    """
+    Applies changes received from the event bus to this worker: drops the
+    devices from the local cache and wakes the change feed, which delivers
+    the logged changes to local sockets in sequence order.
+    """
+    for change in changes:
+        device_cache.discard(change.device_id)
+    change_feed.wake()
+
+
+event_bus = create_event_bus(dispatch_changes)
+change_feed = create_change_feed(broadcaster.publish)
 
-connected_clients: list[WebSocket] = []
 
 async def connect_websocket(websocket: WebSocket):
     """
-    Accepts a new WebSocket connection and saves it in connected_clients.
+    Accepts a new WebSocket connection and registers it with the broadcaster.
     """
-    await websocket.accept()
-    connected_clients.append(websocket)
+    await broadcaster.connect(websocket, client_key(websocket))
 
 async def disconnect_websocket(websocket: WebSocket):
     """
-    Removes a WebSocket connection from connected_clients.
+    Removes a WebSocket connection from the broadcaster.
+    """
+    await broadcaster.disconnect(websocket)
+
+def _subscription_filter(request: WebSocketSubscribeModel) -> SubscriptionFilter:
+    def optional_set(values):
+        return frozenset(values) if values is not None else None
+
+    return SubscriptionFilter(
+        device_ids=optional_set(request.device_ids),
+        device_types=optional_set(request.device_types),
+        statuses=optional_set(request.statuses),
+        change_types=optional_set(request.change_types),
+        batch_ms=request.batch_ms,
+    )
+
+async def _replay_changes(since: int, until: LogPosition, subscription_filter: SubscriptionFilter) -> list[str]:
+    """
+    Encodes the changes logged after the change with sequence number `since`
+    up to the feed position `until` that match the filter as
+    `{"changes": [...]}` frames.
     """
-    connected_clients.remove(websocket)
+    frames = []
+    batch_size = change_feed.batch_size
+    # Read from the primary: the live feed position may be ahead of a replica.
+    async with sessionmanager.session() as session:
+        position = await resolve_since(session, since)
+        while position < until:
+            entries = await read_changes(session, position, batch_size)
+            entries = [entry for entry in entries if (entry.xid, entry.seq) <= until]
+            if not entries:
+                break
+            position = (entries[-1].xid, entries[-1].seq)
+            changes = [change for change in map(to_device_change, entries) if subscription_filter.matches(change)]
+            if changes:
+                frames.append(encode_changes(changes))
+    return frames
 
 async def handle_websocket_messages(websocket: WebSocket):
     """
-    Continuously listens for messages from the client.
-    In this example, we don't do anything with them.
+    Continuously listens for messages from the client. A client may send a
+    subscribe message to narrow what it receives and to ask for micro-batched
+    delivery, e.g. `{"action": "subscribe", "device_types": ["android"],
+    "change_types": ["updated"], "batch_ms": 250}`. Each subscribe message
+    replaces the previous one; until then the client receives every change.
+
+    Every change carries its `seq` in the change log. A reconnecting client
+    passes the last `seq` it received as `since`: the matching changes logged
+    since then are replayed before live delivery resumes, without gaps or
+    duplicates. The acknowledgement carries the position live delivery
+    continues from.
     """
     try:
         while True:
-            await websocket.receive_text()  # or receive_json()
-    except WebSocketDisconnect:
+            raw_message = await websocket.receive_text()
+            try:
+                request = WebSocketSubscribeModel.model_validate_json(raw_message)
+            except ValidationError as e:
+                broadcaster.send(websocket, json.dumps({"error": e.errors(include_url=False, include_context=False)}))
+                continue
+            subscription_filter = _subscription_filter(request)
+            acknowledgement = {"subscribed": request.model_dump(mode="json"), "seq": change_feed.seq}
+            if request.since is None:
+                broadcaster.subscribe(websocket, subscription_filter)
+                broadcaster.send(websocket, json.dumps(acknowledgement))
+                continue
+
+            # Live changes after the feed position are held back while the
+            # log up to that position is replayed.
+            until = change_feed.position
+            broadcaster.subscribe(websocket, subscription_filter, hold=True)
+            messages = [json.dumps(acknowledgement)]
+            try:
+                if until is None:
+                    raise HTTPException(status_code=503, detail="The change feed is not available.")
+                messages.extend(await _replay_changes(request.since, until, subscription_filter))
+            except HTTPException as e:
+                messages.append(json.dumps({"error": e.detail}))
+            except Exception as e:
+                logger.error("Failed to replay changes: %s", e)
+                messages.append(json.dumps({"error": "Failed to replay changes."}))
+            broadcaster.release(websocket, messages)
+    except (WebSocketDisconnect, RuntimeError):
+        # RuntimeError is raised when the socket was closed by an eviction.
         await disconnect_websocket(websocket)
 
-async def notify_device_change(device_id: int, change_type: str):
+async def notify_device_change(
+        device_id: int,
+        change_type: str,
+        device_type: str | None = None,
+        status: str | None = None
+):
     """
-    Broadcasts a device change notification to all connected clients.
+    Publishes a device change on the event bus, which delivers it to the
+    subscribed clients of every worker.
     Args:
         device_id   : The ID of the changed device.
         change_type : A string describing the change (e.g., 'created', 'updated', 'deleted').
+        device_type : The device type, used to match subscription filters.
+        status      : The device status, used to match subscription filters.
     """
-    message = {
-        "device_id": device_id,
-        "change_type": change_type
-    }
-    message_str = json.dumps(message)
+    await notify_devices_change([DeviceChange(device_id, change_type, device_type, status)])
 
-    # Send the message to every connected client
-    for client in connected_clients:
-        try:
-            await client.send_text(message_str)
-        except Exception:
-            # Handle client sending failures if needed
-            pass
\ No newline at end of file
+async def notify_devices_change(changes: list[DeviceChange]):
+    """
+    Publishes a batch of changed devices, so bulk operations send one frame
+    per subscriber instead of one per device. The changes are already
+    committed, so a failed publish is logged rather than failing the request;
+    clients catch up from the change log.
+    Args:
+        changes : The device changes, in the order they happened.
+    """
+    if not changes:
+        return
+    try:
+        await event_bus.publish(changes)
+    except Exception as e:
+        logger.error("Failed to publish %d device changes: %s", len(changes), e)
@@ -1,10 +1,128 @@
+import atexit
+import datetime
+import json
 import logging
+import logging.handlers
+import queue
+import random
+import sys
 
-# Configure the logger
-logging.basicConfig(
-    level=logging.INFO,  # Set the minimum log level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",  # Log format
-)
+from mdm.metrics import registry
+from mdm.settings import db_settings, logging_settings
+
+# Attributes every LogRecord has; anything else was passed through `extra=`.
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats a record as one JSON object per line. Fields passed with `extra=`
+    are included as top-level keys.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps only a fraction of the records below WARNING for the configured
+    loggers (and their children). Warnings and errors are never sampled.
+    """
+
+    def __init__(self, rates: dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._resolved: dict[str, float] = {}
+
+    def _rate(self, name: str) -> float:
+        rate = self._resolved.get(name)
+        if rate is None:
+            logger_name = name
+            while logger_name not in self.rates and "." in logger_name:
+                logger_name = logger_name.rsplit(".", 1)[0]
+            rate = self._resolved[name] = self.rates.get(logger_name, 1.0)
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        rate = self._rate(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the listener thread without formatting them, so the
+    calling coroutine only pays for an append to a bounded queue. Records are
+    dropped, and counted, when the queue is full. Arguments are formatted
+    later on the listener thread, so they should not be mutated after logging.
+    """
+
+    def __init__(self, record_queue: queue.Queue):
+        super().__init__(record_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logging() -> logging.handlers.QueueListener:
+    """
+    Routes every log record through a bounded queue to a background thread
+    that formats and writes it, keeping blocking I/O off the event loop.
+    """
+    output = logging.StreamHandler(sys.stderr)
+    if logging_settings.log_format == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=logging_settings.log_queue_size))
+    handler.addFilter(SamplingFilter(logging_settings.log_sample_rates))
+
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(logging_settings.log_level.upper())
+
+    levels = dict(logging_settings.log_levels)
+    if db_settings.echo_sql:
+        # SQL echo goes through the queue instead of SQLAlchemy's own stream handler.
+        levels.setdefault("sqlalchemy.engine", "INFO")
+    for name, level in levels.items():
+        logging.getLogger(name).setLevel(level.upper())
+
+    listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    registry.callback(
+        "mdm_log_records_dropped_total",
+        "Log records dropped because the logging queue was full.",
+        lambda: handler.dropped,
+        type_name="counter",
+    )
+    return listener
+
+
+listener = configure_logging()
 
 # Create a logger instance
 logger = logging.getLogger("fastapi_app")
@@ -1,15 +1,31 @@
 from contextlib import asynccontextmanager
 
 from fastapi import  FastAPI
+from fastapi.responses import PlainTextResponse
 
 from mdm.database.database import sessionmanager
+from mdm.metrics import MetricsMiddleware, instrument_engine, registry
+from mdm.device.services.command_service import command_dispatcher
+from mdm.device.services.heartbeat_service import heartbeat_buffer
+from mdm.device.services.offline_sweeper import offline_sweeper
+from mdm.device.services.websockets_service import change_feed, event_bus
 from mdm.settings import settings as app_settings
 from mdm.device.routes.api import router as device_router
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    await event_bus.start()
+    await change_feed.start()
+    heartbeat_buffer.start()
+    await command_dispatcher.start()
+    offline_sweeper.start()
     yield
+    await offline_sweeper.stop()
+    await command_dispatcher.stop()
+    await heartbeat_buffer.stop()
+    await change_feed.stop()
+    await event_bus.stop()
     if sessionmanager._engine is not None:
         await sessionmanager.close()
 
@@ -28,11 +44,24 @@ app = FastAPI(
 )
 
 
+app.add_middleware(MetricsMiddleware)
+instrument_engine(sessionmanager._engine)
+if sessionmanager._read_engine is not None:
+    instrument_engine(sessionmanager._read_engine, "replica")
+
+
 @app.get("/healthcheck")
 def healthcheck():
     return {"status": "ok"}
 
 
+# Async so rendering runs on the event loop, never concurrently with the
+# middleware updating the metrics.
+@app.get("/internal/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
 app.include_router(device_router)
 
 
@@ -0,0 +1,269 @@
+import bisect
+import contextvars
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Iterable, TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = tuple[str, ...]
+Sample = tuple[str, dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + "}"
+
+
+class Metric(ABC):
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+
+    @abstractmethod
+    def samples(self) -> Iterable[Sample]:
+        ...
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(f"{name}{_format_labels(labels)} {value}" for name, labels, value in self.samples())
+        return lines
+
+
+class Counter(Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, *labelvalues: str) -> None:
+        self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def samples(self) -> Iterable[Sample]:
+        for labelvalues, value in self._values.items():
+            yield self.name, dict(zip(self.labelnames, labelvalues)), value
+
+
+class Histogram(Metric):
+    type_name = "histogram"
+
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            labelnames: tuple[str, ...] = (),
+            buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+        # Per label set: [bucket counts..., +Inf count, sum].
+        self._values: dict[LabelValues, list[float]] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        values = self._values.get(labelvalues)
+        if values is None:
+            values = self._values[labelvalues] = [0.0] * (len(self.buckets) + 2)
+        values[bisect.bisect_left(self.buckets, value)] += 1
+        values[-1] += value
+
+    def samples(self) -> Iterable[Sample]:
+        for labelvalues, values in self._values.items():
+            labels = dict(zip(self.labelnames, labelvalues))
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                yield f"{self.name}_bucket", {**labels, "le": str(bound)}, cumulative
+            cumulative += values[len(self.buckets)]
+            yield f"{self.name}_bucket", {**labels, "le": "+Inf"}, cumulative
+            yield f"{self.name}_count", labels, cumulative
+            yield f"{self.name}_sum", labels, values[-1]
+
+
+class CallbackMetric(Metric):
+    """
+    Metric whose samples are read from a callback at scrape time, so keeping it
+    current costs nothing on the hot path. Used to expose counters and gauges
+    that components already track themselves.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            collect: Callable[[], Iterable[tuple[dict[str, str], float]]],
+            type_name: str = "gauge"
+    ):
+        super().__init__(name, documentation)
+        self._collect = collect
+        self.type_name = type_name
+
+    def samples(self) -> Iterable[Sample]:
+        for labels, value in self._collect():
+            yield self.name, labels, value
+
+
+M = TypeVar("M", bound=Metric)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: M) -> M:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def callback(self, name: str, documentation: str, collect: Callable[[], float], type_name: str = "gauge") -> None:
+        self.register(CallbackMetric(name, documentation, lambda: [({}, collect())], type_name))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_request_duration = registry.register(Histogram(
+    "mdm_http_request_duration_seconds",
+    "HTTP request latency by route template, method and status code.",
+    ("route", "method", "status"),
+))
+http_request_db_queries = registry.register(Histogram(
+    "mdm_http_request_db_queries",
+    "Number of SQL statements executed per HTTP request.",
+    ("route", "method"),
+    buckets=(0, 1, 2, 3, 5, 10, 25, 50, 100),
+))
+http_request_db_duration = registry.register(Histogram(
+    "mdm_http_request_db_duration_seconds",
+    "Time spent executing SQL statements per HTTP request.",
+    ("route", "method"),
+))
+db_query_duration = registry.register(Histogram(
+    "mdm_db_query_duration_seconds",
+    "SQL statement execution time.",
+))
+db_connection_acquire_duration = registry.register(Histogram(
+    "mdm_db_connection_acquire_seconds",
+    "Time an ORM session waited for a pooled connection.",
+))
+websocket_send_latency = registry.register(Histogram(
+    "mdm_websocket_send_latency_seconds",
+    "Time from queueing a WebSocket message to it being written to the socket.",
+))
+
+# Per-request [query count, query seconds]; None outside of HTTP requests.
+_request_db_usage: contextvars.ContextVar[list[float] | None] = contextvars.ContextVar(
+    "request_db_usage", default=None
+)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording latency and DB usage per route template.
+    Requests for unmatched paths are grouped under a single label value.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        db_usage = [0, 0.0]
+        token = _request_db_usage.set(db_usage)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_db_usage.reset(token)
+            route = scope.get("route")
+            route_path = getattr(route, "path", "<unmatched>")
+            method = scope["method"]
+            http_request_duration.observe(elapsed, route_path, method, str(status_code))
+            http_request_db_queries.observe(db_usage[0], route_path, method)
+            http_request_db_duration.observe(db_usage[1], route_path, method)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    elapsed = time.perf_counter() - started
+    db_query_duration.observe(elapsed)
+    db_usage = _request_db_usage.get()
+    if db_usage is not None:
+        db_usage[0] += 1
+        db_usage[1] += elapsed
+
+
+def _before_orm_execute(orm_execute_state):
+    orm_execute_state.session.info["acquire_started"] = time.perf_counter()
+
+
+def _after_session_begin(session, transaction, connection):
+    started = session.info.pop("acquire_started", None)
+    if started is not None:
+        db_connection_acquire_duration.observe(time.perf_counter() - started)
+
+
+_pools: dict[str, QueuePool] = {}
+
+
+def _pool_samples() -> Iterable[tuple[dict[str, str], float]]:
+    for name, pool in _pools.items():
+        yield {"pool": name, "state": "checked_out"}, pool.checkedout()
+        yield {"pool": name, "state": "checked_in"}, pool.checkedin()
+        yield {"pool": name, "state": "overflow"}, max(pool.overflow(), 0)
+        yield {"pool": name, "state": "size"}, pool.size()
+
+
+registry.register(CallbackMetric(
+    "mdm_db_pool_connections",
+    "Pooled connections by state; overflow counts connections beyond pool_size.",
+    _pool_samples,
+))
+
+
+def instrument_engine(engine: AsyncEngine, name: str = "primary") -> None:
+    """
+    Hooks query timing into an engine and exposes its pool occupancy.
+    """
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+    if not event.contains(Session, "do_orm_execute", _before_orm_execute):
+        event.listen(Session, "do_orm_execute", _before_orm_execute)
+        event.listen(Session, "after_begin", _after_session_begin)
+    pool = engine.sync_engine.pool
+    # Pools without a fixed size (NullPool, StaticPool) have no occupancy to report.
+    if isinstance(pool, QueuePool):
+        _pools[name] = pool
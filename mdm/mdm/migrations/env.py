@@ -7,6 +7,9 @@ from asyncpg import Connection
 from sqlalchemy import pool
 from sqlalchemy.ext.asyncio import async_engine_from_config
 from mdm.device.schemas.device import Device
+from mdm.device.schemas.device_change_log import DeviceChangeLog, DeviceChangeLogWatermark
+from mdm.device.schemas.device_command import DeviceCommand
+from mdm.device.schemas.device_stats import DeviceStats
 # don't delete , those model imports are needed for alembic migrations
 from mdm.database.database import Base
 from mdm.settings import db_settings
@@ -0,0 +1,69 @@
+"""Move device timestamps to the database and index them
+
+Revision ID: 0b7e4c9d2a61
+Revises: f83b2d6a9e14
+Create Date: 2025-03-17 13:46:30.554971
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '0b7e4c9d2a61'
+down_revision: Union[str, None] = 'f83b2d6a9e14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# updated_at moves together with the version: only changes to client-visible
+# columns count as updates, so heartbeat flushes do not touch it.
+DEVICE_VERSION_FUNCTION = """
+CREATE OR REPLACE FUNCTION device_version_bump() RETURNS trigger AS $$
+BEGIN
+    IF (NEW.device_name, NEW.device_type, NEW.status)
+        IS DISTINCT FROM (OLD.device_name, OLD.device_type, OLD.status) THEN
+        NEW.version := OLD.version + 1;
+        NEW.updated_at := now();
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+PREVIOUS_DEVICE_VERSION_FUNCTION = """
+CREATE OR REPLACE FUNCTION device_version_bump() RETURNS trigger AS $$
+BEGIN
+    IF (NEW.device_name, NEW.device_type, NEW.status)
+        IS DISTINCT FROM (OLD.device_name, OLD.device_type, OLD.status) THEN
+        NEW.version := OLD.version + 1;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def upgrade() -> None:
+    op.alter_column('device', 'created_at', server_default=sa.text('now()'))
+    op.execute(DEVICE_VERSION_FUNCTION)
+    # Rows never updated so far count as updated when they were created. The
+    # original timestamps were frozen at process start and cannot be recovered.
+    op.execute("UPDATE device SET updated_at = created_at WHERE updated_at IS NULL")
+    op.alter_column('device', 'updated_at', server_default=sa.text('now()'), nullable=False)
+
+    with op.get_context().autocommit_block():
+        op.create_index(op.f('ix_device_updated_at'), 'device', ['updated_at'],
+                        unique=False, postgresql_concurrently=True)
+        op.create_index(op.f('ix_device_last_seen_at'), 'device', ['last_seen_at'],
+                        unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(op.f('ix_device_last_seen_at'), table_name='device', postgresql_concurrently=True)
+        op.drop_index(op.f('ix_device_updated_at'), table_name='device', postgresql_concurrently=True)
+    op.alter_column('device', 'updated_at', server_default=None, nullable=True)
+    op.execute(PREVIOUS_DEVICE_VERSION_FUNCTION)
+    op.alter_column('device', 'created_at', server_default=None)
@@ -0,0 +1,44 @@
+"""Add device_command table
+
+Revision ID: 7c3e91a4d2b8
+Revises: 2f1b9b953a33
+Create Date: 2025-03-03 10:12:41.518204
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '7c3e91a4d2b8'
+down_revision: Union[str, None] = '2f1b9b953a33'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('device_command',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('device_id', sa.Integer(), nullable=False),
+    sa.Column('command', sa.String(), nullable=False),
+    sa.Column('status', sa.Enum('queued', 'running', 'succeeded', 'failed', name='commandstatus'), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('error', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['device_id'], ['device.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_device_command_device_id'), 'device_command', ['device_id'], unique=False)
+    op.create_index('idx_device_command_queued', 'device_command', ['id'], unique=False,
+                    postgresql_where=sa.text("status = 'queued'"))
+
+
+def downgrade() -> None:
+    op.drop_index('idx_device_command_queued', table_name='device_command',
+                  postgresql_where=sa.text("status = 'queued'"))
+    op.drop_index(op.f('ix_device_command_device_id'), table_name='device_command')
+    op.drop_table('device_command')
+    sa.Enum(name='commandstatus').drop(op.get_bind(), checkfirst=True)
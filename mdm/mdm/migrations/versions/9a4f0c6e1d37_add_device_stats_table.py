@@ -0,0 +1,95 @@
+"""Add device_stats table maintained by triggers
+
+Revision ID: 9a4f0c6e1d37
+Revises: 7c3e91a4d2b8
+Create Date: 2025-03-05 14:27:09.331672
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4f0c6e1d37'
+down_revision: Union[str, None] = '7c3e91a4d2b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Statement-level triggers see every affected row at once through transition
+# tables, so a bulk statement adjusts each counter once instead of once per row.
+DEVICE_STATS_FUNCTION = """
+CREATE FUNCTION device_stats_refresh() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO device_stats (device_type, status, device_count)
+        SELECT device_type, status, count(*) FROM new_rows GROUP BY device_type, status
+        ON CONFLICT (device_type, status)
+        DO UPDATE SET device_count = device_stats.device_count + EXCLUDED.device_count;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE device_stats
+        SET device_count = device_stats.device_count - deleted.device_count
+        FROM (
+            SELECT device_type, status, count(*) AS device_count
+            FROM old_rows GROUP BY device_type, status
+        ) AS deleted
+        WHERE device_stats.device_type = deleted.device_type
+          AND device_stats.status = deleted.status;
+    ELSE
+        INSERT INTO device_stats (device_type, status, device_count)
+        SELECT device_type, status, sum(delta)
+        FROM (
+            SELECT device_type, status, 1 AS delta FROM new_rows
+            UNION ALL
+            SELECT device_type, status, -1 AS delta FROM old_rows
+        ) AS changes
+        GROUP BY device_type, status
+        HAVING sum(delta) <> 0
+        ON CONFLICT (device_type, status)
+        DO UPDATE SET device_count = device_stats.device_count + EXCLUDED.device_count;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def upgrade() -> None:
+    op.create_table('device_stats',
+    sa.Column('device_type', postgresql.ENUM(name='devicetype', create_type=False), nullable=False),
+    sa.Column('status', postgresql.ENUM(name='status', create_type=False), nullable=False),
+    sa.Column('device_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('device_type', 'status')
+    )
+    # Block writers until the triggers exist so the seed below is exact.
+    op.execute("LOCK TABLE device IN SHARE ROW EXCLUSIVE MODE")
+    op.execute(DEVICE_STATS_FUNCTION)
+    op.execute(
+        "CREATE TRIGGER device_stats_insert AFTER INSERT ON device "
+        "REFERENCING NEW TABLE AS new_rows "
+        "FOR EACH STATEMENT EXECUTE FUNCTION device_stats_refresh()"
+    )
+    op.execute(
+        "CREATE TRIGGER device_stats_update AFTER UPDATE ON device "
+        "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows "
+        "FOR EACH STATEMENT EXECUTE FUNCTION device_stats_refresh()"
+    )
+    op.execute(
+        "CREATE TRIGGER device_stats_delete AFTER DELETE ON device "
+        "REFERENCING OLD TABLE AS old_rows "
+        "FOR EACH STATEMENT EXECUTE FUNCTION device_stats_refresh()"
+    )
+    op.execute(
+        "INSERT INTO device_stats (device_type, status, device_count) "
+        "SELECT device_type, status, count(*) FROM device GROUP BY device_type, status"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS device_stats_delete ON device")
+    op.execute("DROP TRIGGER IF EXISTS device_stats_update ON device")
+    op.execute("DROP TRIGGER IF EXISTS device_stats_insert ON device")
+    op.execute("DROP FUNCTION IF EXISTS device_stats_refresh()")
+    op.drop_table('device_stats')
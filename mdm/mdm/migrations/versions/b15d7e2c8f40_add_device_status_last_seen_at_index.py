@@ -0,0 +1,29 @@
+"""Add (status, last_seen_at) index for offline detection
+
+Revision ID: b15d7e2c8f40
+Revises: 9a4f0c6e1d37
+Create Date: 2025-03-07 09:41:22.604118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'b15d7e2c8f40'
+down_revision: Union[str, None] = '9a4f0c6e1d37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Built concurrently so heartbeat flushes and API writes are not blocked.
+    with op.get_context().autocommit_block():
+        op.create_index('idx_device_status_last_seen_at', 'device', ['status', 'last_seen_at'],
+                        unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('idx_device_status_last_seen_at', table_name='device',
+                      postgresql_concurrently=True)
@@ -0,0 +1,30 @@
+"""Add device external_id as the natural key for imports
+
+Revision ID: c8e2f4a6b190
+Revises: a5d3e8f1c274
+Create Date: 2025-03-20 09:41:17.662905
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8e2f4a6b190'
+down_revision: Union[str, None] = 'a5d3e8f1c274'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('device', sa.Column('external_id', sa.String(), nullable=True))
+    with op.get_context().autocommit_block():
+        op.create_index(op.f('ix_device_external_id'), 'device', ['external_id'],
+                        unique=True, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(op.f('ix_device_external_id'), table_name='device', postgresql_concurrently=True)
+    op.drop_column('device', 'external_id')
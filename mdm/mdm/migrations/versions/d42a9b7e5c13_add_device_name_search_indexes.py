@@ -0,0 +1,35 @@
+"""Add device_name search indexes
+
+Revision ID: d42a9b7e5c13
+Revises: b15d7e2c8f40
+Create Date: 2025-03-10 11:08:53.217640
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'd42a9b7e5c13'
+down_revision: Union[str, None] = 'b15d7e2c8f40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # Built concurrently so the device table stays writable during the build.
+    with op.get_context().autocommit_block():
+        op.create_index('idx_device_name_lower', 'device',
+                        [sa.text('lower(device_name) COLLATE "C"'), 'id'],
+                        unique=False, postgresql_concurrently=True)
+        op.create_index('idx_device_name_trgm', 'device',
+                        [sa.text('lower(device_name) gin_trgm_ops')],
+                        unique=False, postgresql_using='gin', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('idx_device_name_trgm', table_name='device', postgresql_concurrently=True)
+        op.drop_index('idx_device_name_lower', table_name='device', postgresql_concurrently=True)
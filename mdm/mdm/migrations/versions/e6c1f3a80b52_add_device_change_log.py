@@ -0,0 +1,107 @@
+"""Add device_change_log maintained by triggers
+
+Revision ID: e6c1f3a80b52
+Revises: d42a9b7e5c13
+Create Date: 2025-03-12 16:35:47.902815
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6c1f3a80b52'
+down_revision: Union[str, None] = 'd42a9b7e5c13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Updates are only logged when a column visible to clients changed, so
+# heartbeat flushes touching last_seen_at do not flood the log. Writers do not
+# coordinate: every entry records the id of its transaction (the column
+# default), and readers only return entries of transactions older than every
+# running one, in (xid, seq) order, so an entry never shows up behind a
+# position a reader already passed.
+DEVICE_CHANGE_LOG_FUNCTION = """
+CREATE FUNCTION device_change_capture() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        IF EXISTS (SELECT 1 FROM new_rows) THEN
+            INSERT INTO device_change_log (device_id, change_type, device_type, status)
+            SELECT id, 'created', device_type, status FROM new_rows ORDER BY id;
+        END IF;
+    ELSIF TG_OP = 'DELETE' THEN
+        IF EXISTS (SELECT 1 FROM old_rows) THEN
+            INSERT INTO device_change_log (device_id, change_type, device_type, status)
+            SELECT id, 'deleted', device_type, status FROM old_rows ORDER BY id;
+        END IF;
+    ELSE
+        IF EXISTS (
+            SELECT 1 FROM new_rows JOIN old_rows USING (id)
+            WHERE (new_rows.device_name, new_rows.device_type, new_rows.status)
+                IS DISTINCT FROM (old_rows.device_name, old_rows.device_type, old_rows.status)
+        ) THEN
+            INSERT INTO device_change_log (device_id, change_type, device_type, status)
+            SELECT new_rows.id, 'updated', new_rows.device_type, new_rows.status
+            FROM new_rows JOIN old_rows USING (id)
+            WHERE (new_rows.device_name, new_rows.device_type, new_rows.status)
+                IS DISTINCT FROM (old_rows.device_name, old_rows.device_type, old_rows.status)
+            ORDER BY new_rows.id;
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def upgrade() -> None:
+    op.create_table('device_change_log',
+    sa.Column('seq', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('device_id', sa.Integer(), nullable=False),
+    sa.Column('change_type', sa.String(), nullable=False),
+    sa.Column('device_type', postgresql.ENUM(name='devicetype', create_type=False), nullable=True),
+    sa.Column('status', postgresql.ENUM(name='status', create_type=False), nullable=True),
+    sa.Column('changed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('xid', sa.BigInteger(), server_default=sa.text('pg_current_xact_id()::text::bigint'), nullable=False),
+    sa.PrimaryKeyConstraint('seq')
+    )
+    op.create_index(op.f('ix_device_change_log_changed_at'), 'device_change_log', ['changed_at'], unique=False)
+    op.create_index('idx_device_change_log_xid_seq', 'device_change_log', ['xid', 'seq'], unique=False)
+    op.create_table('device_change_log_watermark',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('pruned_through', sa.BigInteger(), nullable=False),
+    sa.Column('pruned_through_xid', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute("INSERT INTO device_change_log_watermark (id, pruned_through, pruned_through_xid) VALUES (1, 0, 0)")
+
+    op.execute(DEVICE_CHANGE_LOG_FUNCTION)
+    op.execute(
+        "CREATE TRIGGER device_change_log_insert AFTER INSERT ON device "
+        "REFERENCING NEW TABLE AS new_rows "
+        "FOR EACH STATEMENT EXECUTE FUNCTION device_change_capture()"
+    )
+    op.execute(
+        "CREATE TRIGGER device_change_log_update AFTER UPDATE ON device "
+        "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows "
+        "FOR EACH STATEMENT EXECUTE FUNCTION device_change_capture()"
+    )
+    op.execute(
+        "CREATE TRIGGER device_change_log_delete AFTER DELETE ON device "
+        "REFERENCING OLD TABLE AS old_rows "
+        "FOR EACH STATEMENT EXECUTE FUNCTION device_change_capture()"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS device_change_log_delete ON device")
+    op.execute("DROP TRIGGER IF EXISTS device_change_log_update ON device")
+    op.execute("DROP TRIGGER IF EXISTS device_change_log_insert ON device")
+    op.execute("DROP FUNCTION IF EXISTS device_change_capture()")
+    op.drop_table('device_change_log_watermark')
+    op.drop_index('idx_device_change_log_xid_seq', table_name='device_change_log')
+    op.drop_index(op.f('ix_device_change_log_changed_at'), table_name='device_change_log')
+    op.drop_table('device_change_log')
@@ -0,0 +1,47 @@
+"""Add device version counter for ETags
+
+Revision ID: f83b2d6a9e14
+Revises: e6c1f3a80b52
+Create Date: 2025-03-14 10:22:05.118392
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'f83b2d6a9e14'
+down_revision: Union[str, None] = 'e6c1f3a80b52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Only client-visible columns bump the version, so heartbeat flushes leave
+# ETags intact.
+DEVICE_VERSION_FUNCTION = """
+CREATE FUNCTION device_version_bump() RETURNS trigger AS $$
+BEGIN
+    IF (NEW.device_name, NEW.device_type, NEW.status)
+        IS DISTINCT FROM (OLD.device_name, OLD.device_type, OLD.status) THEN
+        NEW.version := OLD.version + 1;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def upgrade() -> None:
+    op.add_column('device', sa.Column('version', sa.Integer(), server_default=sa.text('1'), nullable=False))
+    op.execute(DEVICE_VERSION_FUNCTION)
+    op.execute(
+        "CREATE TRIGGER device_version_bump BEFORE UPDATE ON device "
+        "FOR EACH ROW EXECUTE FUNCTION device_version_bump()"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS device_version_bump ON device")
+    op.execute("DROP FUNCTION IF EXISTS device_version_bump()")
+    op.drop_column('device', 'version')
@@ -0,0 +1,201 @@
+import asyncio
+import math
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from fastapi import HTTPException, status
+from starlette.requests import HTTPConnection
+
+from mdm.metrics import registry
+from mdm.settings import db_settings, rate_limit_settings
+
+
+class RateLimitStore(ABC):
+    """
+    Keeps one token bucket per key. The in-memory store limits each worker on
+    its own; a shared store (e.g. Redis) implements `take` atomically so every
+    worker draws from the same buckets.
+    """
+
+    @abstractmethod
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        """
+        Takes one token from the bucket of `key`, which refills at `rate`
+        tokens per second up to `burst`. Returns 0 when a token was taken,
+        otherwise the number of seconds until one is available.
+        """
+
+
+class InMemoryRateLimitStore(RateLimitStore):
+    """
+    Buckets in a dict bounded to `max_keys`; the least recently used bucket is
+    dropped first. A dropped bucket comes back full, which only ever errs on
+    the side of letting a request through.
+    """
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        if tokens >= 1:
+            tokens -= 1
+            wait = 0.0
+        else:
+            wait = (1 - tokens) / rate
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+def create_rate_limit_store() -> RateLimitStore:
+    match rate_limit_settings.rate_limit_backend:
+        case "memory":
+            return InMemoryRateLimitStore(rate_limit_settings.rate_limit_max_keys)
+        case backend:
+            raise ValueError(f"Unknown rate limit backend: {backend}")
+
+
+def client_key(connection: HTTPConnection) -> str:
+    """
+    Identifies the client of a request or WebSocket: the first X-Forwarded-For
+    address when running behind a trusted proxy, otherwise the peer address.
+    """
+    if rate_limit_settings.rate_limit_trust_forwarded:
+        forwarded = connection.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",", 1)[0].strip()
+    return connection.client.host if connection.client else "unknown"
+
+
+class RateLimiter:
+    """
+    Router dependency limiting every client per route template, e.g.
+    "POST /api/v1/devices/{device_id}/command". Routes listed in
+    `rate_limit_routes` get their own rate and burst, the others the default.
+    WebSocket connections are capped by the broadcaster instead.
+    """
+
+    def __init__(self, store: RateLimitStore):
+        self.store = store
+        self.limited_total = 0
+
+    async def __call__(self, connection: HTTPConnection) -> None:
+        if connection.scope["type"] != "http" or not rate_limit_settings.rate_limit_enabled:
+            return
+        route = connection.scope.get("route")
+        route_key = f"{connection.scope['method']} {getattr(route, 'path', connection.url.path)}"
+        rate, burst = rate_limit_settings.rate_limit_routes.get(
+            route_key, (rate_limit_settings.rate_limit_rate, rate_limit_settings.rate_limit_burst)
+        )
+        wait = await self.store.take(f"{client_key(connection)}|{route_key}", rate, burst)
+        if wait:
+            self.limited_total += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Rate limit exceeded.",
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+
+
+class AdmissionController:
+    """
+    Bounds the requests using a connection pool at once. A request waits at
+    most `timeout` seconds for a slot, which is kept well below the pool
+    timeout, and is rejected with 503 right away when `max_waiting` requests
+    are already waiting, so overload is shed early instead of piling up
+    behind the pool.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_waiting: int, timeout: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self.active = 0
+        self.waiting = 0
+        self.shed_total = 0
+
+    def _shed(self, reason: str) -> HTTPException:
+        self.shed_total += 1
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"The server is overloaded ({reason}); retry later.",
+            headers={"Retry-After": str(math.ceil(self.timeout))},
+        )
+
+    async def acquire(self) -> None:
+        if self._slots.locked() and self.waiting >= self.max_waiting:
+            raise self._shed("too many queued requests")
+        self.waiting += 1
+        try:
+            async with asyncio.timeout(self.timeout):
+                await self._slots.acquire()
+        except TimeoutError:
+            raise self._shed("no database capacity")
+        finally:
+            self.waiting -= 1
+        self.active += 1
+
+    def release(self) -> None:
+        self.active -= 1
+        self._slots.release()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """
+        Holds a slot for the duration of the block, e.g. for the lifetime of a
+        streamed response that owns its own session.
+        """
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+
+def create_admission_controller(name: str) -> AdmissionController:
+    controller = AdmissionController(
+        name,
+        # By default as many requests as the pool has connections.
+        max_concurrent=(
+            rate_limit_settings.admission_max_concurrent
+            or db_settings.db_pool_size + db_settings.db_max_overflow
+        ),
+        max_waiting=rate_limit_settings.admission_max_waiting,
+        timeout=rate_limit_settings.admission_timeout,
+    )
+    registry.callback(
+        f"mdm_admission_{name}_active",
+        f"Requests holding a {name} database slot.",
+        lambda: controller.active,
+    )
+    registry.callback(
+        f"mdm_admission_{name}_waiting",
+        f"Requests waiting for a {name} database slot.",
+        lambda: controller.waiting,
+    )
+    registry.callback(
+        f"mdm_admission_{name}_shed_total",
+        f"Requests rejected with 503 while waiting for a {name} database slot.",
+        lambda: controller.shed_total,
+        type_name="counter",
+    )
+    return controller
+
+
+rate_limiter = RateLimiter(create_rate_limit_store())
+registry.callback(
+    "mdm_rate_limited_total",
+    "Requests rejected with 429 by the rate limiter.",
+    lambda: rate_limiter.limited_total,
+    type_name="counter",
+)
@@ -0,0 +1,37 @@
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None  # type: ignore[assignment]
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Serializes plain Python data (dicts, lists, str/int/enum values) to compact
+    UTF-8 JSON, byte-for-byte the same as FastAPI's default JSONResponse output.
+    Uses orjson when it is installed.
+    """
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response for content that is already JSON-ready. It skips FastAPI's
+    response model validation and jsonable_encoder pass, so handlers should
+    return it only for data whose shape they build themselves.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
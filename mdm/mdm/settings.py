@@ -25,13 +25,161 @@ class DBSettings(BaseSettings):
     postgres_host: str = "db"
     postgres_port: int = 5432
     postgres_db_name: str = "mdm"
-    echo_sql: bool = True
+    # Optional read replica; GET endpoints are routed to it when set.
+    postgres_replica_host: str | None = None
+    postgres_replica_port: int | None = None
+    echo_sql: bool = False
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = False
+    db_statement_cache_size: int = 500
+    db_statement_timeout_ms: int = 30000
+    # Change log entries are delivered only once every older writing
+    # transaction has ended, so a session left idle in a transaction would
+    # stall the change feed; the server aborts such sessions after this long.
+    db_idle_in_transaction_timeout_ms: int = 60000
 
-    def connection_string(self) -> str:
+    def connection_string(self, host: str | None = None, port: int | None = None) -> str:
         postgres_pass = urllib.parse.quote_plus(self.postgres_pass)
-        return f"postgresql+asyncpg://{self.postgres_user}:{postgres_pass}@{self.postgres_host}:{self.postgres_port}/{self.postgres_db_name}"
+        host = host or self.postgres_host
+        port = port or self.postgres_port
+        return f"postgresql+asyncpg://{self.postgres_user}:{postgres_pass}@{host}:{port}/{self.postgres_db_name}"
+
+    def replica_connection_string(self) -> str | None:
+        if not self.postgres_replica_host:
+            return None
+        return self.connection_string(self.postgres_replica_host, self.postgres_replica_port)
+
+    def engine_kwargs(self) -> dict:
+        return {
+            "pool_size": self.db_pool_size,
+            "max_overflow": self.db_max_overflow,
+            "pool_timeout": self.db_pool_timeout,
+            "pool_recycle": self.db_pool_recycle,
+            "pool_pre_ping": self.db_pool_pre_ping,
+            "connect_args": {
+                # Prepared statements kept per connection; set to 0 behind a
+                # transaction-pooling proxy such as pgbouncer.
+                "prepared_statement_cache_size": self.db_statement_cache_size,
+                "server_settings": {
+                    "statement_timeout": str(self.db_statement_timeout_ms),
+                    "idle_in_transaction_session_timeout": str(self.db_idle_in_transaction_timeout_ms),
+                },
+            },
+        }
 
     model_config = SettingsConfigDict(env_file=env_file, extra="allow")
 
 
 db_settings = DBSettings()
+
+
+class DeviceSettings(BaseSettings):
+    devices_page_size: int = 100
+    devices_max_page_size: int = 1000
+    devices_stream_chunk_size: int = 1000
+    devices_max_batch_size: int = 10000
+    devices_insert_chunk_size: int = 1000
+    devices_bulk_chunk_size: int = 5000
+    devices_export_batch_bytes: int = 8 * 1024 * 1024
+    devices_export_queue_size: int = 16
+    # Replaces db_statement_timeout_ms for the export COPY, which a slow client
+    # can keep running for minutes; 0 disables the timeout.
+    devices_export_timeout_ms: int = 0
+    devices_import_batch_size: int = 10000
+    devices_import_max_rejects: int = 1000
+    heartbeat_flush_interval: float = 1.0
+    heartbeat_max_buffer_size: int = 50000
+    # Upper bound for the wait between flush retries while the database is failing.
+    heartbeat_max_retry_delay: float = 30.0
+    device_cache_max_size: int = 10000
+    device_cache_ttl: float = 30.0
+    command_workers: int = 4
+    command_poll_interval: float = 1.0
+    command_stale_after: float = 300.0
+    offline_sweep_interval: float = 30.0
+    offline_after: float = 300.0
+    change_feed_poll_interval: float = 1.0
+    change_feed_batch_size: int = 1000
+    # Logged when committed changes wait longer than this for older writing
+    # transactions to end.
+    change_feed_lag_warning: float = 30.0
+    change_log_retention: float = 604800.0
+    change_log_prune_interval: float = 3600.0
+
+    model_config = SettingsConfigDict(env_file=env_file, extra="allow")
+
+
+device_settings = DeviceSettings()
+
+
+class WebSocketSettings(BaseSettings):
+    websocket_queue_size: int = 1000
+    websocket_overflow_policy: str = "drop_oldest"
+    websocket_send_timeout: float = 5.0
+    websocket_max_connections: int = 10000
+    websocket_max_connections_per_client: int = 20
+
+    model_config = SettingsConfigDict(env_file=env_file, extra="allow")
+
+
+websocket_settings = WebSocketSettings()
+
+
+class RateLimitSettings(BaseSettings):
+    rate_limit_enabled: bool = True
+    # "memory" keeps buckets per worker; shared stores plug in through RateLimitStore.
+    rate_limit_backend: str = "memory"
+    rate_limit_max_keys: int = 100000
+    # Take the client address from X-Forwarded-For; only behind a trusted proxy.
+    rate_limit_trust_forwarded: bool = False
+    # Default tokens per second and burst per client and route.
+    rate_limit_rate: float = 50.0
+    rate_limit_burst: int = 100
+    # Per-route (rate, burst), keyed by method and route template.
+    rate_limit_routes: dict[str, tuple[float, int]] = {
+        "POST /api/v1/devices/": (10.0, 20),
+        "POST /api/v1/devices/{device_id}/command": (2.0, 10),
+        "POST /api/v1/devices/commands": (1.0, 5),
+        # Each export or import holds a database connection for minutes.
+        "GET /api/v1/devices/export": (0.1, 2),
+        "POST /api/v1/devices/import": (0.1, 2),
+    }
+    # Concurrent requests per connection pool; defaults to the pool capacity.
+    admission_max_concurrent: int | None = None
+    admission_max_waiting: int = 100
+    # Kept well below db_pool_timeout so overload is shed before the pool times out.
+    admission_timeout: float = 5.0
+
+    model_config = SettingsConfigDict(env_file=env_file, extra="allow")
+
+
+rate_limit_settings = RateLimitSettings()
+
+
+class EventBusSettings(BaseSettings):
+    event_bus_backend: str = "local"
+    event_bus_channel: str = "device_changes"
+    event_bus_reconnect_delay: float = 1.0
+
+    model_config = SettingsConfigDict(env_file=env_file, extra="allow")
+
+
+event_bus_settings = EventBusSettings()
+
+
+class LoggingSettings(BaseSettings):
+    log_level: str = "INFO"
+    log_format: str = "json"
+    # Per-logger levels, e.g. LOG_LEVELS='{"sqlalchemy.engine": "INFO"}'.
+    log_levels: dict[str, str] = {}
+    # Fraction of records below WARNING kept per logger, e.g. '{"mdm.access": 0.01}'.
+    log_sample_rates: dict[str, float] = {}
+    log_queue_size: int = 10000
+
+    model_config = SettingsConfigDict(env_file=env_file, extra="allow")
+
+
+logging_settings = LoggingSettings()
@@ -0,0 +1,33 @@
+import pytest
+
+from benchmarks.run import compare, parse_args, percentile, summarize
+
+
+def test_percentile_and_summary():
+    latencies = [index / 1000 for index in range(1, 101)]
+
+    assert percentile(latencies, 0.5) == 0.05
+    assert percentile(latencies, 0.99) == 0.099
+    assert summarize(latencies, errors=2, elapsed=2.0) == {
+        "requests": 102, "errors": 2, "rps": 50.0, "p50_ms": 50.0, "p99_ms": 99.0,
+    }
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    baseline = {"get": {"rps": 1000, "p99_ms": 10.0}, "list": {"rps": 100, "p99_ms": 50.0}}
+    results = {
+        "get": {"rps": 850, "p99_ms": 11.0},
+        "list": {"rps": 70, "p99_ms": 80.0},
+        "create": {"rps": 10, "p99_ms": 500.0},
+    }
+
+    regressions = compare(results, baseline, max_regression=0.2)
+
+    assert len(regressions) == 2
+    assert all(regression.startswith("list:") for regression in regressions)
+
+
+def test_parse_args_requires_devices_to_pick_from():
+    assert parse_args(["--devices", "1"]).devices == 1
+    with pytest.raises(SystemExit):
+        parse_args(["--devices", "0"])
@@ -0,0 +1,68 @@
+from mdm.device.models.device_request import DeviceGetModel
+from mdm.device.services import device_service
+from mdm.device.services.cache_service import DeviceCache, LocalInvalidationBackend
+
+
+def _device(device_id: int) -> DeviceGetModel:
+    return DeviceGetModel(id=device_id, device_name=f"Device{device_id}", device_type="android", status="active")
+
+
+def test_cache_evicts_least_recently_used():
+    cache = DeviceCache(max_size=2, ttl=60)
+    cache.set(1, _device(1))
+    cache.set(2, _device(2))
+    assert cache.get(1) is not None
+    cache.set(3, _device(3))
+
+    assert cache.get(2) is None
+    assert cache.get(1) is not None
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 1
+
+
+def test_cache_entries_expire():
+    cache = DeviceCache(max_size=2, ttl=-1)
+    cache.set(1, _device(1))
+    assert cache.get(1) is None
+
+
+async def test_invalidation_is_shared_through_backend():
+    backend = LocalInvalidationBackend()
+    worker_a = DeviceCache(max_size=10, ttl=60, backend=backend)
+    worker_b = DeviceCache(max_size=10, ttl=60, backend=backend)
+    worker_a.set(1, _device(1))
+    worker_b.set(1, _device(1))
+
+    await worker_a.invalidate(1)
+
+    assert worker_a.get(1) is None
+    assert worker_b.get(1) is None
+
+
+async def test_set_after_concurrent_invalidation_is_dropped():
+    cache = DeviceCache(max_size=10, ttl=60)
+    generation = cache.generation(1)
+    # The device changes while the old row is being loaded.
+    await cache.invalidate(1)
+    cache.set(1, _device(1), generation)
+
+    assert cache.get(1) is None
+
+    cache.set(1, _device(1), cache.generation(1))
+    assert cache.get(1) is not None
+
+
+async def test_get_device_cached_does_not_cache_a_device_invalidated_while_loading(monkeypatch):
+    cache = DeviceCache(max_size=10, ttl=60)
+    monkeypatch.setattr(device_service, "device_cache", cache)
+
+    async def find_device_by_id(db_session, device_id):
+        # Another request updates the device between our SELECT and the set.
+        await cache.invalidate(device_id)
+        return _device(device_id)
+
+    monkeypatch.setattr(device_service, "find_device_by_id", find_device_by_id)
+
+    assert await device_service.get_device_cached(None, 1) is not None
+    assert cache.get(1) is None
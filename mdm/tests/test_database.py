@@ -0,0 +1,34 @@
+from mdm.database.database import DatabaseSessionManager
+from mdm.settings import DBSettings
+
+
+def test_engine_settings_are_configurable():
+    db_settings = DBSettings(
+        db_pool_size=3, db_max_overflow=0, db_statement_timeout_ms=500, db_idle_in_transaction_timeout_ms=1000
+    )
+    manager = DatabaseSessionManager(db_settings.connection_string(), db_settings.engine_kwargs())
+
+    assert manager._engine.sync_engine.pool.size() == 3
+    assert db_settings.engine_kwargs()["connect_args"]["server_settings"] == {
+        "statement_timeout": "500",
+        "idle_in_transaction_session_timeout": "1000",
+    }
+
+
+def test_reads_use_the_primary_without_a_replica():
+    db_settings = DBSettings()
+    manager = DatabaseSessionManager(
+        db_settings.connection_string(), db_settings.engine_kwargs(), db_settings.replica_connection_string()
+    )
+    assert manager._read_engine is None
+    assert manager._read_sessionmaker is manager._sessionmaker
+
+
+def test_reads_use_the_replica_when_configured():
+    db_settings = DBSettings(postgres_replica_host="replica")
+    manager = DatabaseSessionManager(
+        db_settings.connection_string(), db_settings.engine_kwargs(), db_settings.replica_connection_string()
+    )
+    assert manager._read_engine.url.host == "replica"
+    assert manager._read_engine.url.port == db_settings.postgres_port
+    assert manager._engine.url.host == db_settings.postgres_host
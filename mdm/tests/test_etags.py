@@ -0,0 +1,35 @@
+import pytest
+from fastapi import HTTPException
+
+from mdm.device.services.etags import (
+    device_etag,
+    etag_matches,
+    if_match_version,
+    list_etag,
+)
+
+
+def test_etags_compare_weakly():
+    etag = device_etag(3)
+    assert etag == 'W/"3"'
+    assert etag_matches('W/"3"', etag)
+    assert etag_matches('"2", "3"', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('W/"2"', etag)
+    assert not etag_matches(None, etag)
+
+
+def test_list_etag_depends_on_log_head_and_query():
+    params = {"filters": {"status": "active"}, "limit": 10}
+    assert list_etag(5, params) == list_etag(5, dict(params))
+    assert list_etag(5, params) != list_etag(6, params)
+    assert list_etag(5, params) != list_etag(5, {**params, "limit": 20})
+
+
+def test_if_match_version():
+    assert if_match_version(None) is None
+    assert if_match_version("*") is None
+    assert if_match_version('W/"7"') == 7
+    with pytest.raises(HTTPException) as exc_info:
+        if_match_version('"abc"')
+    assert exc_info.value.status_code == 412
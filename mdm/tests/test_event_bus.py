@@ -0,0 +1,22 @@
+from mdm.device.services.event_bus import LocalEventBus, decode_payload, encode_payloads
+from mdm.device.services.subscriptions import DeviceChange
+
+
+def test_payloads_round_trip_and_respect_notify_limit():
+    changes = [DeviceChange(device_id, "updated", "android", "offline") for device_id in range(2000)]
+
+    payloads = encode_payloads(changes)
+
+    assert len(payloads) > 1
+    assert all(len(payload) < 8000 for payload in payloads)
+    assert [change for payload in payloads for change in decode_payload(payload)] == changes
+
+
+async def test_local_event_bus_delivers_to_handler():
+    received = []
+    bus = LocalEventBus(received.extend)
+
+    await bus.publish([DeviceChange(1, "created", "windows", "active")])
+    await bus.publish([])
+
+    assert received == [DeviceChange(1, "created", "windows", "active")]
@@ -0,0 +1,82 @@
+import contextlib
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from mdm.device.models.device_request import ExportFormat
+from mdm.device.services import export_service
+from mdm.device.services.export_service import (
+    _ColumnarEncoder,
+    _copy_csv,
+    complete_rows,
+)
+from mdm.settings import device_settings
+
+
+def test_complete_rows_cuts_after_last_full_row():
+    buffer = b'1,Pixel,android\n2,Surf'
+    assert buffer[:complete_rows(buffer)] == b'1,Pixel,android\n'
+
+
+def test_complete_rows_skips_newlines_inside_quoted_fields():
+    buffer = b'1,"Pixel ""7""",android\n2,"multi\nline'
+    assert buffer[:complete_rows(buffer)] == b'1,"Pixel ""7""",android\n'
+
+    buffer += b'",windows\n'
+    assert complete_rows(buffer) == len(buffer)
+
+
+def test_complete_rows_without_a_full_row():
+    assert complete_rows(b'1,"multi\nline') == 0
+    assert complete_rows(b"") == 0
+
+
+async def test_export_copy_overrides_the_statement_timeout(monkeypatch):
+    calls = []
+
+    async def copy_from_table(table, output, **kwargs):
+        calls.append("copy")
+        await output(b"1,Pixel\n")
+
+    driver_connection = SimpleNamespace(copy_from_table=copy_from_table)
+
+    async def get_raw_connection():
+        return SimpleNamespace(driver_connection=driver_connection)
+
+    class Session:
+        async def execute(self, statement):
+            calls.append(str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})))
+
+        async def connection(self):
+            return SimpleNamespace(get_raw_connection=get_raw_connection)
+
+    @contextlib.asynccontextmanager
+    async def read_session():
+        yield Session()
+
+    monkeypatch.setattr(export_service, "sessionmanager", SimpleNamespace(read_session=read_session))
+    monkeypatch.setattr(device_settings, "devices_export_timeout_ms", 0)
+
+    assert [chunk async for chunk in _copy_csv(None, header=True)] == [b"1,Pixel\n"]
+    # Set in the copy's own transaction, before the copy starts.
+    assert calls == ["SELECT set_config('statement_timeout', '0', true) AS set_config_1", "copy"]
+
+
+def test_columnar_encoder_round_trip():
+    ipc = pytest.importorskip("pyarrow.ipc")
+
+    encoder = _ColumnarEncoder(ExportFormat.arrow)
+    data = encoder.encode(b'1,Pixel,android,active,1700000000000000,,1700000000500000\n')
+    data += encoder.encode(b'2,"Surface, ""Pro""",windows,inactive,1700000001000000,1700000002000000,1700000003000000\n')
+    data += encoder.close()
+
+    table = ipc.open_stream(data).read_all()
+    assert encoder.rows_total == 2
+    assert table.schema == encoder.schema
+    rows = table.to_pylist()
+    assert [row["id"] for row in rows] == [1, 2]
+    assert rows[1]["device_name"] == 'Surface, "Pro"'
+    assert rows[0]["last_seen_at"] is None
+    assert rows[0]["created_at"] == datetime(2023, 11, 14, 22, 13, 20, tzinfo=timezone.utc)
@@ -0,0 +1,111 @@
+import asyncio
+import contextlib
+import datetime
+from types import SimpleNamespace
+
+from mdm.device.services import heartbeat_service
+from mdm.device.services.heartbeat_service import HeartbeatBuffer
+from mdm.device.services.subscriptions import DeviceChange
+
+
+class FakeConnection:
+    def __init__(self, fail: bool = False, reactivated: list[SimpleNamespace] | None = None):
+        self.fail = fail
+        self.reactivated = reactivated or []
+        self.flushes: list[dict[int, datetime.datetime]] = []
+
+    async def execute(self, statement, parameters):
+        if self.fail:
+            raise ConnectionError("database is down")
+        self.flushes.append(dict(zip(parameters["device_ids"], parameters["seen_at"])))
+        return SimpleNamespace(all=lambda: self.reactivated)
+
+
+def _use_connection(monkeypatch, connection: FakeConnection) -> None:
+    @contextlib.asynccontextmanager
+    async def connect():
+        yield connection
+
+    monkeypatch.setattr(heartbeat_service.sessionmanager, "connect", connect)
+
+
+async def test_heartbeats_are_coalesced_per_device(monkeypatch):
+    connection = FakeConnection()
+    _use_connection(monkeypatch, connection)
+    buffer = HeartbeatBuffer(flush_interval=60, max_buffer_size=100)
+    earlier = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+    later = earlier + datetime.timedelta(seconds=30)
+
+    buffer.record(1, later)
+    buffer.record(1, earlier)
+    buffer.record(2, earlier)
+
+    assert buffer.depth == 2
+    assert await buffer.flush() == 2
+    assert connection.flushes == [{1: later, 2: earlier}]
+    assert buffer.stats()["received_total"] == 3
+    assert buffer.stats()["coalesced_total"] == 1
+
+
+async def test_flush_publishes_devices_back_online(monkeypatch):
+    _use_connection(monkeypatch, FakeConnection(reactivated=[SimpleNamespace(id=2, device_type="android")]))
+    published = []
+
+    async def notify_devices_change(changes):
+        published.extend(changes)
+
+    monkeypatch.setattr(heartbeat_service, "notify_devices_change", notify_devices_change)
+    buffer = HeartbeatBuffer(flush_interval=60, max_buffer_size=100)
+    buffer.record(1)
+    buffer.record(2)
+
+    assert await buffer.flush() == 2
+    assert published == [DeviceChange(2, "updated", "android", "active")]
+
+
+async def test_full_buffer_requests_a_flush(monkeypatch):
+    connection = FakeConnection()
+    _use_connection(monkeypatch, connection)
+    buffer = HeartbeatBuffer(flush_interval=60, max_buffer_size=2)
+    buffer.start()
+    try:
+        buffer.record(1)
+        await asyncio.sleep(0.05)
+        assert connection.flushes == []
+
+        buffer.record(2)
+        await asyncio.sleep(0.05)
+        assert len(connection.flushes) == 1
+    finally:
+        await buffer.stop()
+
+
+async def test_failed_flushes_back_off(monkeypatch):
+    connection = FakeConnection(fail=True)
+    _use_connection(monkeypatch, connection)
+    buffer = HeartbeatBuffer(flush_interval=0.05, max_buffer_size=1, max_retry_delay=0.2)
+    buffer.record(1)
+    buffer.start()
+    try:
+        await asyncio.sleep(0.02)
+        # The full buffer keeps requesting flushes, but retries wait 0.05s, 0.1s, ...
+        buffer.record(2)
+        await asyncio.sleep(0.3)
+        assert 1 <= buffer.stats()["flush_failures_total"] <= 4
+        assert buffer.retry_delay() == 0.2
+        assert buffer.depth == 2
+
+        connection.fail = False
+        await asyncio.sleep(0.3)
+        assert buffer.retry_delay() == 0
+        assert buffer.depth == 0
+    finally:
+        await buffer.stop()
+
+
+def test_post_heartbeat(test_client):
+    response = test_client.post("/api/v1/devices/1/heartbeat")
+    assert response.status_code == 202
+
+    stats = test_client.get("/api/v1/devices/heartbeats/stats").json()
+    assert stats["buffer_depth"] >= 1
@@ -0,0 +1,113 @@
+from types import SimpleNamespace
+
+from mdm.device.models.device_request import ImportFormat
+from mdm.device.services import import_service
+from mdm.device.services.import_service import (
+    _csv_rows,
+    _ndjson_rows,
+    import_devices,
+    validate_rows,
+)
+from mdm.settings import device_settings
+
+
+async def _chunks(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+async def test_csv_rows_span_chunks():
+    data = (
+        b"\xef\xbb\xbfexternal_id,device_name,device_type,status\n"
+        b'a-1,"Pixel, ""7""\nlab",android,active\n'
+        b"a-2,Surface,windows\n"
+        b"\n"
+        b"a-3,Surface,windows,offline"
+    )
+    rows = [row async for row in _csv_rows(_chunks(data, 7))]
+    assert rows == [
+        (1, {"external_id": "a-1", "device_name": 'Pixel, "7"\nlab', "device_type": "android", "status": "active"}),
+        (2, "Expected 4 fields, got 3."),
+        (3, {"external_id": "a-3", "device_name": "Surface", "device_type": "windows", "status": "offline"}),
+    ]
+
+
+async def test_csv_rows_reject_invalid_utf8():
+    data = b"external_id,device_name,device_type,status\na-1,Pix\xffel,android,active\na-2,Pixel,android,active\n"
+    rows = [row async for row in _csv_rows(_chunks(data, 64))]
+    assert rows == [
+        (1, "Row is not valid UTF-8."),
+        (2, {"external_id": "a-2", "device_name": "Pixel", "device_type": "android", "status": "active"}),
+    ]
+
+
+async def test_ndjson_rows_report_invalid_lines():
+    data = b'{"external_id": "a-1"}\n\nnot json\n{"external_id": "a-2"}'
+    rows = [row async for row in _ndjson_rows(_chunks(data, 5))]
+    assert [row_number for row_number, _ in rows] == [1, 3, 4]
+    assert rows[0][1] == {"external_id": "a-1"}
+    assert rows[1][1].startswith("Invalid JSON")
+    assert rows[2][1] == {"external_id": "a-2"}
+
+
+def test_validate_rows_rejects_only_invalid_rows():
+    valid = {"external_id": "a-1", "device_name": "Pixel", "device_type": "android", "status": "active"}
+    records, rejects = validate_rows([
+        (1, valid),
+        (2, {**valid, "external_id": "a-2", "status": "broken"}),
+        (3, "Expected 4 fields, got 3."),
+        (4, [1, 2]),
+        (5, {**valid, "external_id": "a-5"}),
+    ])
+    assert records == [
+        (1, "a-1", "Pixel", "android", "active"),
+        (5, "a-5", "Pixel", "android", "active"),
+    ]
+    assert [reject.row for reject in rejects] == [2, 3, 4]
+    assert rejects[0].error.startswith("status:")
+
+
+async def test_import_publishes_changes_per_batch(monkeypatch):
+    async def merge_batch(records):
+        return [
+            SimpleNamespace(id=row_number, device_type=device_type, status=status, inserted=row_number % 2 == 1)
+            for row_number, _, _, device_type, status in records
+        ]
+
+    published = []
+
+    async def notify_devices_change(changes):
+        published.append([(change.device_id, change.change_type) for change in changes])
+
+    monkeypatch.setattr(import_service, "_merge_batch", merge_batch)
+    monkeypatch.setattr(import_service, "notify_devices_change", notify_devices_change)
+    monkeypatch.setattr(device_settings, "devices_import_batch_size", 2)
+    data = b"".join(
+        b'{"external_id": "a-%d", "device_name": "Pixel", "device_type": "android", "status": "active"}\n' % number
+        for number in range(1, 6)
+    )
+
+    summary = await import_devices(_chunks(data, 64), ImportFormat.ndjson)
+    assert (summary.created, summary.updated) == (3, 2)
+    # Each batch publishes its updates and its last created device once committed.
+    assert published == [[(2, "updated"), (1, "created")], [(4, "updated"), (3, "created")], [(5, "created")]]
+
+
+async def test_import_counts_duplicates_within_a_batch(monkeypatch):
+    async def merge_batch(records):
+        # a-1 is written once, from its last row; a-2 matches the stored device.
+        return [SimpleNamespace(id=1, device_type="android", status="offline", inserted=False)]
+
+    async def notify_devices_change(changes):
+        pass
+
+    monkeypatch.setattr(import_service, "_merge_batch", merge_batch)
+    monkeypatch.setattr(import_service, "notify_devices_change", notify_devices_change)
+    data = (
+        b'{"external_id": "a-1", "device_name": "Pixel", "device_type": "android", "status": "active"}\n'
+        b'{"external_id": "a-2", "device_name": "Pixel", "device_type": "android", "status": "active"}\n'
+        b'{"external_id": "a-1", "device_name": "Pixel", "device_type": "android", "status": "offline"}\n'
+    )
+
+    summary = await import_devices(_chunks(data, 64), ImportFormat.ndjson)
+    assert (summary.received, summary.updated, summary.unchanged, summary.duplicates) == (3, 1, 1, 1)
@@ -0,0 +1,34 @@
+import json
+import logging
+import queue
+
+from mdm.logging_config import JsonFormatter, NonBlockingQueueHandler, SamplingFilter
+
+
+def _record(name: str, level: int = logging.INFO, **extra) -> logging.LogRecord:
+    record = logging.LogRecord(name, level, __file__, 1, "device %s updated", (7,), None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter_includes_extra_fields():
+    entry = json.loads(JsonFormatter().format(_record("mdm.devices", device_id=7)))
+    assert entry["message"] == "device 7 updated"
+    assert entry["logger"] == "mdm.devices"
+    assert entry["level"] == "INFO"
+    assert entry["device_id"] == 7
+
+
+def test_sampling_applies_to_child_loggers_below_warning():
+    sampling = SamplingFilter({"mdm.access": 0.0})
+    assert not sampling.filter(_record("mdm.access.devices"))
+    assert sampling.filter(_record("mdm.access.devices", logging.WARNING))
+    assert sampling.filter(_record("mdm.devices"))
+
+
+def test_full_queue_drops_records_instead_of_blocking():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    handler.emit(_record("mdm.devices"))
+    handler.emit(_record("mdm.devices"))
+    assert handler.queue.qsize() == 1
+    assert handler.dropped == 1
@@ -1,4 +1,18 @@
+import asyncio
+import datetime
+
 import pytest
+from sqlalchemy import select, text, update
+
+from mdm.database.database import sessionmanager
+from mdm.device.routes import api
+from mdm.device.schemas import Device
+from mdm.device.schemas.device import Status
+from mdm.device.services import offline_sweeper
+from mdm.device.services.change_feed import get_changes
+from mdm.device.services.heartbeat_service import heartbeat_buffer
+from mdm.device.services.offline_sweeper import OfflineSweeper
+from mdm.settings import device_settings
 
 
 @pytest.mark.order(1)
@@ -65,8 +79,29 @@ def test_send_command(test_client):
 
 
     command_payload = {"command": "reboot"}
-    cmd_resp = test_client.post(f"/api/v1/devices/1/command", json=command_payload)
-    assert cmd_resp.status_code == 200
+    cmd_resp = test_client.post("/api/v1/devices/1/command", json=command_payload)
+    assert cmd_resp.status_code == 202
+    command_id = cmd_resp.json()["command_id"]
+
+    status_resp = test_client.get(f"/api/v1/devices/commands/{command_id}")
+    assert status_resp.status_code == 200
+    assert status_resp.json()["status"] in {"queued", "running", "succeeded"}
+
+    unknown_resp = test_client.post("/api/v1/devices/1/command", json={"command": "explode"})
+    assert unknown_resp.status_code == 400
+
+
+@pytest.mark.order(5)
+def test_send_command_to_device_deleted_after_lookup(test_client, monkeypatch):
+    """
+    A device deleted by another worker after the lookup is rejected like an unknown one.
+    """
+    async def get_device_cached(db_session, device_id):
+        return object()
+
+    monkeypatch.setattr(api, "get_device_cached", get_device_cached)
+    response = test_client.post("/api/v1/devices/987654321/command", json={"command": "reboot"})
+    assert response.status_code == 400
 
 @pytest.mark.order(6)
 def test_delete_device(test_client):
@@ -78,7 +113,476 @@ def test_delete_device(test_client):
     assert delete_resp.status_code == 200  # or whatever success code is expected
 
 
+@pytest.mark.order(7)
+def test_get_devices_paginated(test_client):
+    """
+    Pages through the device list with a keyset cursor.
+    """
+    for index in range(3):
+        payload = {"device_name": f"Paged{index}", "device_type": "windows", "status": "active"}
+        assert test_client.post("/api/v1/devices", json=payload).status_code == 201
+
+    first_page = test_client.get("/api/v1/devices", params={"limit": 2}).json()
+    assert len(first_page["devices"]) == 2
+    assert first_page["next_cursor"]
+
+    second_page = test_client.get(
+        "/api/v1/devices", params={"limit": 2, "cursor": first_page["next_cursor"]}
+    ).json()
+    assert second_page["devices"][0]["id"] > first_page["devices"][-1]["id"]
+
+
+@pytest.mark.order(8)
+def test_get_devices_stream(test_client):
+    """
+    Streams the device list as newline-delimited JSON.
+    """
+    response = test_client.get("/api/v1/devices", params={"stream": True})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [line for line in response.text.splitlines() if line]
+    assert all("device_name" in line for line in lines)
+
+
+@pytest.mark.order(9)
+def test_create_device_entries_batch(test_client):
+    """
+    Creates several devices in one request and reports invalid items per index.
+    """
+    payload = [
+        {"device_name": "Batch1", "device_type": "android", "status": "active"},
+        {"device_name": "Batch2", "device_type": "tablet", "status": "active"},
+        {"device_name": "Batch3", "device_type": "windows", "status": "inactive"},
+    ]
+    response = test_client.post("/api/v1/devices/batch", json=payload)
+    assert response.status_code == 201
+    data = response.json()
+    assert data["created"] == 2
+    assert data["failed"] == 1
+    assert data["results"][1]["index"] == 1
+    assert data["results"][1]["error"]
+    assert all(data["results"][index]["id"] for index in (0, 2))
+
+
+def test_create_device_entries_batch_without_valid_items(test_client):
+    """
+    A batch in which every item is invalid is answered without touching the database.
+    """
+    response = test_client.post("/api/v1/devices/batch", json=[{"device_name": "NoType"}])
+    assert response.status_code == 201
+    assert response.json()["created"] == 0
+    assert response.json()["failed"] == 1
+
+
+def test_create_device_entries_batch_is_capped(test_client, monkeypatch):
+    """
+    Oversized batches are refused, and the limit and item model are documented.
+    """
+    monkeypatch.setattr(device_settings, "devices_max_batch_size", 2)
+    response = test_client.post("/api/v1/devices/batch", json=[{"device_name": "NoType"}] * 3)
+    assert response.status_code == 413
+
+    schema = test_client.app.openapi()["paths"]["/api/v1/devices/batch"]["post"]["requestBody"]
+    items = schema["content"]["application/json"]["schema"]["items"]
+    assert items == {"$ref": "#/components/schemas/DeviceRequestModel"}
+
+
+@pytest.mark.order(10)
+def test_get_devices_stats(test_client):
+    """
+    Device counts by type and status add up to the total.
+    """
+    response = test_client.get("/api/v1/devices/stats")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] == sum(entry["count"] for entry in data["counts"])
+    assert data["total"] >= 1
+
+
+def test_send_bulk_command_validation(test_client):
+    """
+    Bulk commands need a known command and at least one target selector.
+    """
+    response = test_client.post("/api/v1/devices/commands", json={"command": "explode", "status": "offline"})
+    assert response.status_code == 400
+
+    response = test_client.post("/api/v1/devices/commands", json={"command": "reboot"})
+    assert response.status_code == 400
+
+
+@pytest.mark.order(11)
+def test_bulk_update_and_delete_devices(test_client):
+    """
+    Bulk update and delete report the devices they touched.
+    """
+    payload = [
+        {"device_name": f"Bulk{index}", "device_type": "android", "status": "active"}
+        for index in range(3)
+    ]
+    created = test_client.post("/api/v1/devices/batch", json=payload).json()
+    device_ids = [result["id"] for result in created["results"]]
+
+    response = test_client.post(
+        "/api/v1/devices/bulk/update",
+        json={"device_ids": device_ids, "update": {"status": "offline"}}
+    )
+    assert response.status_code == 200
+    assert response.json() == {"affected": 3, "device_ids": device_ids}
+    for device_id in device_ids:
+        assert test_client.get(f"/api/v1/devices/{device_id}").json()["device"]["status"] == "offline"
+
+    response = test_client.post("/api/v1/devices/bulk/delete", json={"device_ids": device_ids})
+    assert response.status_code == 200
+    assert response.json() == {"affected": 3, "device_ids": device_ids}
+    assert test_client.get(f"/api/v1/devices/{device_ids[0]}").json() == []
+
+
+def test_bulk_device_changes_validation(test_client):
+    """
+    Bulk changes need at least one target selector, and updates need a field to change.
+    """
+    response = test_client.post("/api/v1/devices/bulk/delete", json={})
+    assert response.status_code == 400
+
+    response = test_client.post(
+        "/api/v1/devices/bulk/update",
+        json={"status": "offline", "update": {}}
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.order(12)
+def test_search_devices(test_client):
+    """
+    Name search is case-insensitive in every match mode.
+    """
+    payload = [
+        {"device_name": "SearchPixel-Alpha", "device_type": "android", "status": "active"},
+        {"device_name": "searchpixel-beta", "device_type": "android", "status": "active"},
+    ]
+    test_client.post("/api/v1/devices/batch", json=payload)
+
+    for match, term in (("prefix", "SEARCHPIXEL"), ("substring", "pixel-"), ("fuzzy", "searchpixel-alpah")):
+        response = test_client.get("/api/v1/devices", params={"search": term, "match": match})
+        assert response.status_code == 200
+        names = [device["device_name"] for device in response.json()["devices"]]
+        assert "SearchPixel-Alpha" in names
+
+    response = test_client.get("/api/v1/devices", params={"search": "searchpixel", "match": "prefix", "limit": 1})
+    data = response.json()
+    assert data["devices"][0]["device_name"] == "SearchPixel-Alpha"
+    response = test_client.get(
+        "/api/v1/devices",
+        params={"search": "searchpixel", "match": "prefix", "limit": 1, "cursor": data["next_cursor"]}
+    )
+    assert response.json()["devices"][0]["device_name"] == "searchpixel-beta"
+
+
+@pytest.mark.order(13)
+def test_get_device_changes(test_client):
+    """
+    Device changes are logged in order and can be read incrementally.
+    """
+    head = test_client.get("/api/v1/devices/changes", params={"since": 0, "limit": 1000})
+    assert head.status_code == 200
+    since = head.json()["next_since"]
+    while True:
+        page = test_client.get("/api/v1/devices/changes", params={"since": since, "limit": 1000}).json()
+        if page["next_since"] == since:
+            break
+        since = page["next_since"]
+
+    created = test_client.post(
+        "/api/v1/devices/batch",
+        json=[{"device_name": "ChangeFeed", "device_type": "android", "status": "active"}]
+    ).json()
+    device_id = created["results"][0]["id"]
+    test_client.put(f"/api/v1/devices/{device_id}", json={"status": "inactive"})
+    test_client.delete(f"/api/v1/devices/{device_id}")
+
+    response = test_client.get("/api/v1/devices/changes", params={"since": since})
+    changes = response.json()["changes"]
+    assert [(change["device_id"], change["change_type"]) for change in changes] == [
+        (device_id, "created"), (device_id, "updated"), (device_id, "deleted")
+    ]
+    assert [change["seq"] for change in changes] == sorted(change["seq"] for change in changes)
+    assert response.json()["next_since"] == changes[-1]["seq"]
+
+    # A number that is not the seq of a change is still a valid position.
+    response = test_client.get("/api/v1/devices/changes", params={"since": changes[-1]["seq"] + 1000})
+    assert response.status_code == 200
+    assert response.json()["changes"] == []
+
+
+@pytest.mark.order(14)
+def test_conditional_requests(test_client):
+    """
+    Unchanged devices and listings are answered with 304, and If-Match rejects
+    updates based on a stale version.
+    """
+    created = test_client.post(
+        "/api/v1/devices/batch",
+        json=[{"device_name": "Conditional", "device_type": "android", "status": "active"}]
+    ).json()
+    device_id = created["results"][0]["id"]
+
+    response = test_client.get(f"/api/v1/devices/{device_id}")
+    etag = response.headers["ETag"]
+    response = test_client.get(f"/api/v1/devices/{device_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    listing = test_client.get("/api/v1/devices", params={"status": "active"})
+    response = test_client.get(
+        "/api/v1/devices", params={"status": "active"}, headers={"If-None-Match": listing.headers["ETag"]}
+    )
+    assert response.status_code == 304
+
+    response = test_client.put(
+        f"/api/v1/devices/{device_id}", json={"status": "inactive"}, headers={"If-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+    response = test_client.put(
+        f"/api/v1/devices/{device_id}", json={"status": "offline"}, headers={"If-Match": etag}
+    )
+    assert response.status_code == 412
+
+    response = test_client.get(
+        "/api/v1/devices", params={"status": "active"}, headers={"If-None-Match": listing.headers["ETag"]}
+    )
+    assert response.status_code == 200
+
+
+@pytest.mark.order(15)
+def test_get_devices_by_time_range(test_client):
+    """
+    updated_since only returns devices changed at or after the given time.
+    """
+    before = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(minutes=1)
+    created = test_client.post(
+        "/api/v1/devices/batch",
+        json=[{"device_name": "TimeRange", "device_type": "windows", "status": "active"}]
+    ).json()
+    device_id = created["results"][0]["id"]
+
+    response = test_client.get(
+        "/api/v1/devices", params={"updated_since": before.isoformat(), "limit": 1000}
+    )
+    assert device_id in [device["id"] for device in response.json()["devices"]]
+
+    later = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(minutes=1)
+    response = test_client.get("/api/v1/devices", params={"updated_since": later.isoformat()})
+    assert response.json()["devices"] == []
+
+    response = test_client.get("/api/v1/devices", params={"seen_before": later.isoformat(), "limit": 1000})
+    assert device_id not in [device["id"] for device in response.json()["devices"]]
+
+    # A check-in moves the device out of a seen_before listing without going
+    # through the change log, so a conditional request must not get a 304.
+    heartbeat_buffer.record(device_id, before - datetime.timedelta(hours=1))
+    asyncio.run(heartbeat_buffer.flush())
+    params = {"seen_before": before.isoformat(), "limit": 1000}
+    response = test_client.get("/api/v1/devices", params=params)
+    assert device_id in [device["id"] for device in response.json()["devices"]]
+    assert "ETag" not in response.headers
+
+    assert test_client.post(f"/api/v1/devices/{device_id}/heartbeat").status_code == 202
+    asyncio.run(heartbeat_buffer.flush())
+    response = test_client.get("/api/v1/devices", params=params, headers={"If-None-Match": "*"})
+    assert response.status_code == 200
+    assert device_id not in [device["id"] for device in response.json()["devices"]]
+
+
+@pytest.mark.order(16)
+def test_device_groups(test_client):
+    """
+    Devices can be grouped, listed by group together with other filters, and
+    bulk operations can target a group.
+    """
+    created = test_client.post(
+        "/api/v1/devices/batch",
+        json=[
+            {"device_name": "Ring2-A", "device_type": "android", "status": "offline"},
+            {"device_name": "Ring2-B", "device_type": "android", "status": "active"},
+            {"device_name": "Ring2-C", "device_type": "windows", "status": "offline"},
+        ]
+    ).json()
+    device_ids = [result["id"] for result in created["results"]]
+
+    response = test_client.post("/api/v1/devices/groups", json={"name": "ring-2"})
+    assert response.status_code == 201
+    assert test_client.post("/api/v1/devices/groups", json={"name": "ring-2"}).status_code == 409
+
+    response = test_client.post("/api/v1/devices/groups/ring-2/add", json={"device_ids": device_ids + [999999]})
+    assert response.json() == {"changed": 3, "device_ids": device_ids}
+    response = test_client.post("/api/v1/devices/groups/ring-2/add", json={"device_ids": device_ids[:1]})
+    assert response.json()["changed"] == 0
+
+    listing = test_client.get(
+        "/api/v1/devices", params={"group": "ring-2", "device_type": "android", "status": "offline"}
+    )
+    assert [device["id"] for device in listing.json()["devices"]] == device_ids[:1]
+
+    response = test_client.post("/api/v1/devices/groups/ring-2/remove", json={"device_ids": device_ids[:1]})
+    assert response.json() == {"changed": 1, "device_ids": device_ids[:1]}
+    response = test_client.get(
+        "/api/v1/devices",
+        params={"group": "ring-2", "device_type": "android", "status": "offline"},
+        headers={"If-None-Match": listing.headers["ETag"]}
+    )
+    assert response.status_code == 200
+    assert response.json()["devices"] == []
+
+    response = test_client.post("/api/v1/devices/bulk/update", json={"group": "ring-2", "update": {"status": "inactive"}})
+    assert response.json()["device_ids"] == device_ids[1:]
+
+    listing = test_client.get("/api/v1/devices", params={"group": "ring-2"})
+    assert [device["id"] for device in listing.json()["devices"]] == device_ids[1:]
+
+    assert test_client.delete("/api/v1/devices/groups/ring-2").status_code == 200
+    assert test_client.post("/api/v1/devices/groups/ring-2/add", json={"device_ids": device_ids}).status_code == 404
+
+    # A recreated group starts over at the same version with other members.
+    assert test_client.post("/api/v1/devices/groups", json={"name": "ring-2"}).status_code == 201
+    test_client.post("/api/v1/devices/groups/ring-2/add", json={"device_ids": device_ids})
+    test_client.post("/api/v1/devices/groups/ring-2/remove", json={"device_ids": device_ids[1:2]})
+    response = test_client.get(
+        "/api/v1/devices", params={"group": "ring-2"}, headers={"If-None-Match": listing.headers["ETag"]}
+    )
+    assert response.status_code == 200
+    assert [device["id"] for device in response.json()["devices"]] == device_ids[::2]
+    assert test_client.delete("/api/v1/devices/groups/ring-2").status_code == 200
 
 
+@pytest.mark.order(17)
+def test_import_devices(test_client):
+    """
+    Importing upserts on external_id and reports rejected rows.
+    """
+    data = (
+        "external_id,device_name,device_type,status\n"
+        "import-1,Imported1,android,active\n"
+        "import-2,Imported2,windows,broken\n"
+    )
+    response = test_client.post("/api/v1/devices/import", params={"format": "csv"}, content=data)
+    summary = response.json()
+    assert (summary["created"], summary["updated"], summary["rejected"]) == (1, 0, 1)
+    assert summary["rejects"][0]["row"] == 2
+
+    data = (
+        '{"external_id": "import-1", "device_name": "Imported1", "device_type": "android", "status": "offline"}\n'
+        '{"external_id": "import-1", "device_name": "Imported1", "device_type": "android", "status": "offline"}\n'
+    )
+    response = test_client.post("/api/v1/devices/import", params={"format": "ndjson"}, content=data)
+    summary = response.json()
+    assert (summary["created"], summary["updated"], summary["unchanged"]) == (0, 1, 1)
+
+
+@pytest.mark.order(18)
+def test_concurrent_writers_are_delivered_in_log_order(test_client):
+    """
+    Writers of the change log do not wait for each other, and a change that
+    commits after a higher numbered one is still delivered to a reader that
+    already passed the latter.
+    """
+    created = test_client.post(
+        "/api/v1/devices/batch",
+        json=[
+            {"device_name": "Concurrent1", "device_type": "android", "status": "active"},
+            {"device_name": "Concurrent2", "device_type": "android", "status": "active"},
+        ]
+    ).json()
+    first_id, second_id = [result["id"] for result in created["results"]]
+    since = 0
+    while True:
+        page = test_client.get("/api/v1/devices/changes", params={"since": since, "limit": 1000}).json()
+        if page["next_since"] == since:
+            break
+        since = page["next_since"]
+
+    async def write_concurrently():
+        async with sessionmanager.session() as first, sessionmanager.session() as second:
+            # The second writer starts first, so it has the lower transaction id
+            # but logs its change after the first writer.
+            await second.execute(text("SELECT pg_current_xact_id()::text"))
+            await first.execute(update(Device).where(Device.id == first_id).values(status=Status.offline))
+            await asyncio.wait_for(
+                second.execute(update(Device).where(Device.id == second_id).values(status=Status.offline)),
+                timeout=5
+            )
+            await second.commit()
+            async with sessionmanager.session() as reader:
+                before = await get_changes(reader, since, 100)
+            await first.commit()
+            async with sessionmanager.session() as reader:
+                after = await get_changes(reader, before[-1].seq, 100)
+            return before, after
+
+    before, after = asyncio.run(write_concurrently())
+    assert [(change.device_id, change.change_type) for change in before] == [(second_id, "updated")]
+    assert [(change.device_id, change.change_type) for change in after] == [(first_id, "updated")]
+    assert after[0].seq < before[0].seq
+
+
+@pytest.mark.order(19)
+def test_offline_sweep_and_reactivation(test_client, monkeypatch):
+    """
+    The sweeper moves active devices that stopped checking in to offline and
+    publishes them; a check-in from an offline device makes it active again
+    through the change log.
+    """
+    created = test_client.post(
+        "/api/v1/devices/batch",
+        json=[
+            {"device_name": "SweepStale", "device_type": "android", "status": "active"},
+            {"device_name": "SweepFresh", "device_type": "android", "status": "active"},
+            {"device_name": "SweepOffline", "device_type": "windows", "status": "offline"},
+            {"device_name": "SweepNeverSeen", "device_type": "windows", "status": "active"},
+        ]
+    ).json()
+    stale_id, fresh_id, offline_id, never_seen_id = [result["id"] for result in created["results"]]
+    ids = (stale_id, fresh_id, offline_id, never_seen_id)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    published = []
+
+    async def notify_devices_change(changes):
+        published.extend(change for change in changes if change.device_id in ids)
+
+    async def sweep_and_read():
+        async with sessionmanager.session() as session:
+            for device_id, last_seen_at in (
+                (stale_id, now - datetime.timedelta(hours=2)),
+                (fresh_id, now),
+                (offline_id, now - datetime.timedelta(hours=2)),
+            ):
+                await session.execute(update(Device).where(Device.id == device_id).values(last_seen_at=last_seen_at))
+            await session.commit()
+        await OfflineSweeper(interval=60, offline_after=3600).sweep()
+        async with sessionmanager.session() as session:
+            rows = await session.execute(select(Device.id, Device.status).where(Device.id.in_(ids)))
+            return dict(rows.all())
+
+    monkeypatch.setattr(offline_sweeper, "notify_devices_change", notify_devices_change)
+    statuses = asyncio.run(sweep_and_read())
+    assert statuses == {
+        stale_id: Status.offline, fresh_id: Status.active, offline_id: Status.offline, never_seen_id: Status.active
+    }
+    assert [(change.device_id, change.change_type, change.status) for change in published] == [
+        (stale_id, "updated", Status.offline)
+    ]
 
+    since = 0
+    while True:
+        page = test_client.get("/api/v1/devices/changes", params={"since": since, "limit": 1000}).json()
+        if page["next_since"] == since:
+            break
+        since = page["next_since"]
 
+    assert test_client.post(f"/api/v1/devices/{stale_id}/heartbeat").status_code == 202
+    asyncio.run(heartbeat_buffer.flush())
+    changes = test_client.get("/api/v1/devices/changes", params={"since": since}).json()["changes"]
+    assert [(change["device_id"], change["change_type"], change["status"]) for change in changes] == [
+        (stale_id, "updated", "active")
+    ]
@@ -0,0 +1,25 @@
+from mdm.metrics import Histogram
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("test_duration_seconds", "Test histogram.", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, "/a")
+    histogram.observe(0.5, "/a")
+    histogram.observe(5, "/a")
+
+    lines = histogram.render()
+
+    assert 'test_duration_seconds_bucket{route="/a",le="0.1"} 1.0' in lines
+    assert 'test_duration_seconds_bucket{route="/a",le="1.0"} 2.0' in lines
+    assert 'test_duration_seconds_bucket{route="/a",le="+Inf"} 3.0' in lines
+    assert 'test_duration_seconds_count{route="/a"} 3.0' in lines
+
+
+def test_metrics_endpoint_reports_route_latency(test_client):
+    test_client.get("/healthcheck")
+
+    response = test_client.get("/internal/metrics")
+
+    assert response.status_code == 200
+    assert 'mdm_http_request_duration_seconds_count{route="/healthcheck",method="GET",status="200"}' in response.text
+    assert "mdm_db_pool_connections" in response.text
@@ -0,0 +1,18 @@
+import datetime
+
+from sqlalchemy.dialects import postgresql
+
+from mdm.device.services.offline_sweeper import sweep_statement
+
+
+def test_sweep_only_moves_stale_active_devices():
+    cutoff = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+    compiled = sweep_statement(cutoff).compile(dialect=postgresql.dialect())
+    sql = str(compiled)
+
+    assert "device.status = %(status_1)s" in sql
+    assert "device.last_seen_at < %(last_seen_at_1)s" in sql
+    assert "RETURNING device.id, device.device_type" in sql
+    assert compiled.params["status_1"] == "active"
+    assert compiled.params["status"] == "offline"
+    assert compiled.params["last_seen_at_1"] == cutoff
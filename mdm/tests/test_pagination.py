@@ -0,0 +1,61 @@
+import pytest
+from fastapi import HTTPException
+
+from mdm.device.services.pagination import (
+    decode_cursor,
+    decode_id_cursor,
+    decode_search_cursor,
+    encode_cursor,
+)
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor({"id": 42})
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == {"id": 42}
+    assert decode_id_cursor(cursor) == 42
+    assert decode_id_cursor(None) is None
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", encode_cursor({"id": "1"}), "W10"])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as exc_info:
+        decode_id_cursor(cursor)
+    assert exc_info.value.status_code == 400
+
+
+def test_get_devices_rejects_invalid_cursor(test_client):
+    response = test_client.get("/api/v1/devices", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+def test_search_cursor_round_trip():
+    assert decode_search_cursor(encode_cursor({"mode": "prefix", "rank": "pixel", "id": 7}), "prefix") == ("pixel", 7)
+    assert decode_search_cursor(encode_cursor({"mode": "fuzzy", "rank": 0.25, "id": 7}), "fuzzy") == (0.25, 7)
+    assert decode_search_cursor(None, "prefix") is None
+    with pytest.raises(HTTPException):
+        decode_search_cursor(encode_cursor({"mode": "prefix", "id": 7}), "prefix")
+
+
+@pytest.mark.parametrize("payload, mode", [
+    ({"mode": "prefix", "rank": "pixel", "id": 7}, "fuzzy"),
+    ({"mode": "substring", "rank": 0.25, "id": 7}, "prefix"),
+    ({"mode": "fuzzy", "rank": 0.25, "id": 7}, "substring"),
+    ({"mode": "prefix", "rank": 0.25, "id": 7}, "prefix"),
+    ({"rank": "pixel", "id": 7}, "prefix"),
+])
+def test_search_cursor_of_another_mode_is_rejected(payload, mode):
+    with pytest.raises(HTTPException) as exc_info:
+        decode_search_cursor(encode_cursor(payload), mode)
+    assert exc_info.value.status_code == 400
+
+
+def test_search_rejects_cursor_of_another_mode(test_client):
+    cursor = encode_cursor({"mode": "prefix", "rank": "pixel", "id": 7})
+    response = test_client.get("/api/v1/devices", params={"search": "pixel", "match": "fuzzy", "cursor": cursor})
+    assert response.status_code == 400
+
+
+def test_search_cannot_be_streamed(test_client):
+    response = test_client.get("/api/v1/devices", params={"search": "pixel", "stream": "true"})
+    assert response.status_code == 400
@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from mdm.rate_limit import AdmissionController, InMemoryRateLimitStore, RateLimitStore
+
+
+async def test_token_bucket_allows_burst_then_limits():
+    store = InMemoryRateLimitStore(max_keys=10)
+    assert [await store.take("client", rate=1.0, burst=3) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert 0 < await store.take("client", rate=1.0, burst=3) <= 1.0
+    assert await store.take("other", rate=1.0, burst=3) == 0.0
+
+
+async def test_token_bucket_store_is_bounded():
+    store = InMemoryRateLimitStore(max_keys=2)
+    for key in ("a", "b", "c"):
+        await store.take(key, rate=1.0, burst=1)
+    assert list(store._buckets) == ["b", "c"]
+
+
+async def test_admission_sheds_when_queue_is_full():
+    admission = AdmissionController("test", max_concurrent=1, max_waiting=1, timeout=5)
+    await admission.acquire()
+    waiter = asyncio.create_task(admission.acquire())
+    await asyncio.sleep(0)
+
+    with pytest.raises(HTTPException) as error:
+        await admission.acquire()
+    assert error.value.status_code == 503
+
+    admission.release()
+    await waiter
+    assert (admission.active, admission.waiting, admission.shed_total) == (1, 0, 1)
+
+
+async def test_admission_sheds_after_timeout():
+    admission = AdmissionController("test", max_concurrent=1, max_waiting=10, timeout=0.01)
+    await admission.acquire()
+    with pytest.raises(HTTPException) as error:
+        await admission.acquire()
+    assert error.value.status_code == 503
+    assert error.value.headers["Retry-After"] == "1"
+    assert admission.waiting == 0
+
+
+async def test_admission_slot_is_released_on_error():
+    admission = AdmissionController("test", max_concurrent=1, max_waiting=10, timeout=0.01)
+    with pytest.raises(RuntimeError):
+        async with admission.slot():
+            assert admission.active == 1
+            raise RuntimeError
+    assert admission.active == 0
+
+    async with admission.slot():
+        with pytest.raises(HTTPException):
+            async with admission.slot():
+                pass
+    assert (admission.active, admission.shed_total) == (0, 1)
+
+
+def test_incomplete_store_fails_on_instantiation():
+    class IncompleteStore(RateLimitStore):
+        pass
+
+    with pytest.raises(TypeError):
+        IncompleteStore()
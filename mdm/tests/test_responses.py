@@ -0,0 +1,20 @@
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from mdm.device.models.device_request import DeviceGetModel, GetDevicesResponseModel
+from mdm.device.schemas.device import DeviceType, Status
+from mdm.responses import FastJSONResponse
+
+
+def test_fast_listing_matches_model_serialization():
+    rows = [
+        {"id": 1, "device_name": "Pixel é \"quoted\"", "device_type": DeviceType.android, "status": Status.active},
+        {"id": 2, "device_name": "Surface", "device_type": DeviceType.windows, "status": Status.offline},
+    ]
+    for next_cursor in (None, "eyJpZCI6IDJ9"):
+        expected = JSONResponse(jsonable_encoder(GetDevicesResponseModel(
+            devices=[DeviceGetModel(**row) for row in rows],
+            next_cursor=next_cursor,
+        ))).body
+        actual = FastJSONResponse({"devices": rows, "next_cursor": next_cursor}).body
+        assert actual == expected
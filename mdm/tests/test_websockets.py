@@ -0,0 +1,174 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import WebSocketException
+
+from mdm.device.services import websockets_service
+from mdm.device.services.subscriptions import DeviceChange, SubscriptionFilter
+from mdm.device.services.websockets_service import (
+    OverflowPolicy,
+    WebSocketBroadcaster,
+    notify_device_change,
+)
+
+
+class FakeWebSocket:
+    def __init__(self, send_delay: float = 0, fail: bool = False):
+        self.send_delay = send_delay
+        self.fail = fail
+        self.sent: list[str] = []
+        self.closed = False
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message: str):
+        if self.fail:
+            raise RuntimeError("socket is gone")
+        await asyncio.sleep(self.send_delay)
+        self.sent.append(message)
+
+    async def close(self, code: int = 1000):
+        self.closed = True
+
+
+async def test_slow_client_does_not_block_broadcast():
+    broadcaster = WebSocketBroadcaster(max_queue_size=10, overflow_policy=OverflowPolicy.drop_oldest, send_timeout=5)
+    fast, slow = FakeWebSocket(), FakeWebSocket(send_delay=10)
+    await broadcaster.connect(fast)
+    await broadcaster.connect(slow)
+
+    broadcaster.broadcast("hello")
+    await asyncio.sleep(0.01)
+
+    assert fast.sent == ["hello"]
+    assert slow.sent == []
+    await broadcaster.disconnect(slow)
+
+
+async def test_dead_client_is_evicted():
+    broadcaster = WebSocketBroadcaster(max_queue_size=10, overflow_policy=OverflowPolicy.drop_oldest, send_timeout=5)
+    dead = FakeWebSocket(fail=True)
+    await broadcaster.connect(dead)
+
+    broadcaster.broadcast("hello")
+    await asyncio.sleep(0.01)
+
+    assert broadcaster.client_count == 0
+    assert broadcaster.stats()["clients_evicted_total"] == 1
+    assert dead.closed
+
+
+async def test_overflow_policies():
+    drop_oldest = WebSocketBroadcaster(max_queue_size=2, overflow_policy=OverflowPolicy.drop_oldest, send_timeout=5)
+    coalesce = WebSocketBroadcaster(max_queue_size=2, overflow_policy=OverflowPolicy.coalesce, send_timeout=5)
+    disconnect = WebSocketBroadcaster(max_queue_size=2, overflow_policy=OverflowPolicy.disconnect, send_timeout=5)
+    clients = {}
+    for broadcaster in (drop_oldest, coalesce, disconnect):
+        clients[broadcaster] = await broadcaster.connect(FakeWebSocket(send_delay=10))
+        await asyncio.sleep(0)
+        broadcaster.broadcast("first", key=0)
+        await asyncio.sleep(0)
+        # The writer is busy sending "first", so the next messages stay queued.
+        broadcaster.broadcast("a", key=1)
+        broadcaster.broadcast("b", key=2)
+        broadcaster.broadcast("c", key=2)
+    await asyncio.sleep(0)
+
+    assert [message for _, message, _ in clients[drop_oldest]._queue] == ["b", "c"]
+    assert [message for _, message, _ in clients[coalesce]._queue] == ["a", "c"]
+    assert drop_oldest.stats()["messages_dropped_total"] == 1
+    assert disconnect.client_count == 0
+
+    for broadcaster in (drop_oldest, coalesce):
+        await broadcaster.disconnect(clients[broadcaster].websocket)
+
+
+async def test_changes_are_routed_by_subscription_filter():
+    broadcaster = WebSocketBroadcaster(max_queue_size=10, overflow_policy=OverflowPolicy.drop_oldest, send_timeout=5)
+    everything, android, device_7 = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+    for websocket in (everything, android, device_7):
+        await broadcaster.connect(websocket)
+    broadcaster.subscribe(android, SubscriptionFilter(device_types=frozenset({"android"})))
+    broadcaster.subscribe(device_7, SubscriptionFilter(device_ids=frozenset({7}), change_types=frozenset({"deleted"})))
+
+    broadcaster.publish([
+        DeviceChange(7, "created", "windows", "active"),
+        DeviceChange(8, "created", "android", "active"),
+    ])
+    broadcaster.publish([DeviceChange(7, "deleted", "windows", "active")])
+    await asyncio.sleep(0.01)
+
+    assert [len(json.loads(message)["changes"]) for message in everything.sent[:1]] == [2]
+    assert [json.loads(message)["device_id"] for message in android.sent] == [8]
+    assert [json.loads(message)["change_type"] for message in device_7.sent] == ["deleted"]
+    assert broadcaster.stats()["subscription_groups"] == 3
+
+
+async def test_micro_batched_subscription_collapses_repeats():
+    broadcaster = WebSocketBroadcaster(max_queue_size=10, overflow_policy=OverflowPolicy.drop_oldest, send_timeout=5)
+    websocket = FakeWebSocket()
+    await broadcaster.connect(websocket)
+    broadcaster.subscribe(websocket, SubscriptionFilter(batch_ms=20))
+
+    broadcaster.publish([DeviceChange(1, "created", "android", "active")])
+    broadcaster.publish([DeviceChange(1, "updated", "android", "offline")])
+    broadcaster.publish([DeviceChange(2, "created", "android", "active")])
+    assert websocket.sent == []
+    await asyncio.sleep(0.05)
+
+    assert len(websocket.sent) == 1
+    changes = json.loads(websocket.sent[0])["changes"]
+    assert [(change["device_id"], change["change_type"]) for change in changes] == [(1, "updated"), (2, "created")]
+
+
+async def test_held_subscription_replays_before_live_changes():
+    broadcaster = WebSocketBroadcaster(max_queue_size=10, overflow_policy=OverflowPolicy.drop_oldest, send_timeout=5)
+    websocket = FakeWebSocket()
+    await broadcaster.connect(websocket)
+    broadcaster.subscribe(websocket, SubscriptionFilter(), hold=True)
+
+    broadcaster.publish([DeviceChange(1, "updated", "android", "offline", seq=11)])
+    await asyncio.sleep(0.01)
+    assert websocket.sent == []
+
+    broadcaster.release(websocket, ["ack", "replay"])
+    await asyncio.sleep(0.01)
+
+    assert websocket.sent[:2] == ["ack", "replay"]
+    assert json.loads(websocket.sent[2])["seq"] == 11
+
+
+def test_websocket_subscribe_is_acknowledged(test_client):
+    with test_client.websocket_connect("/api/v1/devices/ws/devices") as websocket:
+        websocket.send_text(json.dumps({"action": "subscribe", "statuses": ["offline"], "batch_ms": 100}))
+        assert websocket.receive_json()["subscribed"]["statuses"] == ["offline"]
+
+        websocket.send_text(json.dumps({"action": "subscribe", "statuses": ["broken"]}))
+        assert "error" in websocket.receive_json()
+
+
+async def test_connections_are_capped_per_client():
+    broadcaster = WebSocketBroadcaster(
+        max_queue_size=10, overflow_policy=OverflowPolicy.drop_oldest, send_timeout=5, max_connections_per_client=1
+    )
+    first = FakeWebSocket()
+    await broadcaster.connect(first, "10.0.0.1")
+    with pytest.raises(WebSocketException):
+        await broadcaster.connect(FakeWebSocket(), "10.0.0.1")
+    await broadcaster.connect(FakeWebSocket(), "10.0.0.2")
+
+    await broadcaster.disconnect(first)
+    await broadcaster.connect(FakeWebSocket(), "10.0.0.1")
+    assert broadcaster.stats()["clients_rejected_total"] == 1
+
+
+async def test_failed_publish_is_logged_not_raised(monkeypatch):
+    class FailingBus:
+        async def publish(self, changes):
+            raise ConnectionError("bus is down")
+
+    monkeypatch.setattr(websockets_service, "event_bus", FailingBus())
+
+    await notify_device_change(device_id=1, change_type="created", device_type="android", status="active")